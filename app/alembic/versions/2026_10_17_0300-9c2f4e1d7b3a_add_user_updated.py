@@ -0,0 +1,42 @@
+"""add user updated
+
+Revision ID: 9c2f4e1d7b3a
+Revises: 5571a5150089
+Create Date: 2026-10-17 03:00:12.481516
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import aiosqlite
+
+# revision identifiers, used by Alembic.
+revision = "9c2f4e1d7b3a"
+down_revision = "5571a5150089"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if isinstance(op.get_context().dialect, aiosqlite.dialect):
+        now_context = sa.text("(CURRENT_TIMESTAMP)")
+    else:
+        now_context = sa.text("now()")
+
+    updated = sa.Column(
+        "updated",
+        sa.DateTime(timezone=True),
+        server_default=now_context,
+        nullable=True,
+    )
+    if isinstance(op.get_context().dialect, aiosqlite.dialect):
+        # sqlite can't add a column with non-constant default, the table is
+        # copied instead
+        with op.batch_alter_table("user", recreate="always") as batch_op:
+            batch_op.add_column(updated)
+    else:
+        op.add_column("user", updated)
+    op.execute('UPDATE "user" SET updated = created')
+
+
+def downgrade() -> None:
+    op.drop_column("user", "updated")
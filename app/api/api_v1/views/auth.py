@@ -1,25 +1,72 @@
 """
 Authentication handlers module.
 """
+import math
 import uuid
 import json
 from datetime import timedelta
+from functools import lru_cache
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 from starlette.requests import Request
+from starlette.responses import Response
 
-from app import schemas, crud
+from app import schemas, crud, dependencies
 from app.core import auth
-from app.schemas import TokenSubject, TokenPayload
 from app.core.config import settings
-from app.db.redis import set_redis_key, get_redis_key
+from app.db.login_failures import login_failures
+from app.db.refresh_tokens import (
+    revoke_refresh_token,
+    rotate_refresh_token,
+    store_refresh_token,
+)
+from app.db.revocations import token_revocations
 from jose.exceptions import JWTError
+from pydantic import ValidationError
 
 router = APIRouter()
 
+# clients may cache the key set, a new signing key must be published at
+# least this long before it's used
+JWKS_MAX_AGE = 300
+
+
+@lru_cache(maxsize=1)
+def get_jwks_body() -> bytes:
+    """
+    Serialize public signing keys once per process.
+
+    Returns:
+        JWKS JSON document
+    """
+    jwks = auth.key_ring.jwks() if auth.key_ring is not None else {"keys": []}
+    return json.dumps(jwks).encode()
+
+
+@router.get(
+    "/.well-known/jwks.json",
+    name="auth:jwks",
+    summary="Get public token signing keys.",
+    status_code=status.HTTP_200_OK,
+    description="JSON Web Key Set to verify access tokens without this service.",
+)
+async def jwks() -> Response:
+    """
+    Return public keys verifying tokens as JSON Web Key Set.
+
+    Returns:
+        JWKS response, empty for symmetric algorithms
+    """
+    return Response(
+        content=get_jwks_body(),
+        media_type="application/json",
+        headers={"Cache-Control": f"public, max-age={JWKS_MAX_AGE}"},
+    )
+
 
 @router.post(
     "/token",
@@ -28,46 +75,60 @@ router = APIRouter()
     status_code=status.HTTP_200_OK,
     description="User login view.",
     response_model=schemas.Token,
+    dependencies=[
+        Depends(dependencies.limit_credential_attempts),
+        Depends(dependencies.admit_password_hashing),
+    ],
 )
 async def login_access_token(
     request: Request,
+    background_tasks: BackgroundTasks,
     form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(dependencies.get_db),
 ) -> Optional[schemas.Token]:
     """
     OAuth2 compatible token login, get an access token for future requests.
 
     Args:
         request: request instance
+        background_tasks: tasks run after response, password rehash
         form_data: oauth2 form data
+        db: request-scoped database session
 
     Returns:
         token data using token schema with refresh and access token if success,
         None otherwise.
     """
-    db = request.app.state.db
     redis = request.app.state.redis
     username = form_data.username
     password = form_data.password
 
-    user = await crud.user.authenticate_by_email(db, email=username, password=password)
-    if not user:
-        user = await crud.user.authenticate_by_username(
-            db, username=username, password=password
+    user = await crud.user.get_by_login(db, login=username)
+    account = login_failures.account(username, user.id if user else None)
+    locked_for = await login_failures.locked_for(account)
+    if locked_for > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, try again later.",
+            headers={"Retry-After": str(math.ceil(locked_for))},
         )
+    user = await crud.user.check_login_password(
+        db, user=user, password=password, background_tasks=background_tasks
+    )
     if not user:
+        await login_failures.fail(account)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect username or password.",
         )
-    elif not crud.user.is_active(user):
+    await login_failures.reset(account)
+    if not crud.user.is_active(user):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user."
         )
 
     token_subject = {
         "id": user.id,
-        "username": user.username,
-        "email": user.email,
         "jti": uuid.uuid4().hex,
         "token_type": "bearer",
     }
@@ -75,8 +136,12 @@ async def login_access_token(
         token_subject.update({"scope": ["admin"]})
 
     token = auth.create_tokens(token_subject)
-    refresh_token_expires = timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
-    await set_redis_key(redis, token.refresh_token, user.id, refresh_token_expires)
+    await store_refresh_token(
+        redis,
+        user_id=user.id,
+        jti=token_subject["jti"],
+        expire=timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES),
+    )
     return token
 
 
@@ -104,19 +169,62 @@ async def login_refresh_token(
     """
     redis = request.app.state.redis
     try:
-        res = await get_redis_key(redis, token)
-        payload = auth.decode_token(token)
-        token_data = TokenPayload.parse_obj(payload)
-        token_sub = TokenSubject.parse_obj(json.loads(token_data.sub))
-        assert int(res.decode()) == token_sub.id
-        token = auth.create_tokens(token_sub.dict())
-        refresh_token_expires = timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
-        await set_redis_key(
-            redis, token.refresh_token, token_sub.id, refresh_token_expires
+        token_sub = auth.parse_subject(auth.decode_token(token))
+    except (JWTError, ValidationError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid refresh token.",
         )
-    except JWTError:
+    if token_sub.token_type != auth.REFRESH_TOKEN_TYPE:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid refresh token.",
         )
-    return token
+    new_jti = uuid.uuid4().hex
+    rotated = await rotate_refresh_token(
+        redis,
+        user_id=token_sub.id,
+        jti=token_sub.jti,
+        new_jti=new_jti,
+        expire=timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES),
+    )
+    if not rotated:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid refresh token.",
+        )
+    return auth.create_tokens({**token_sub.dict(), "jti": new_jti})
+
+
+@router.post(
+    "/logout",
+    name="auth:logout",
+    summary="Logout and revoke tokens.",
+    status_code=status.HTTP_204_NO_CONTENT,
+    description="Revoke the access token and its refresh token.",
+)
+async def logout(
+    request: Request, token: str = Depends(auth.reusable_oauth2)
+) -> Response:
+    """
+    Revoke access token and refresh token of the same session.
+
+    Args:
+        request: request instance
+        token: jwt access token
+
+    Returns:
+        empty response
+    """
+    try:
+        token_sub = auth.verify_token(token)
+    except (JWTError, ValidationError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Could not validate credentials:\n{e}",
+        )
+    await token_revocations.revoke(token_sub.jti)
+    await revoke_refresh_token(
+        request.app.state.redis, user_id=token_sub.id, jti=token_sub.jti
+    )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
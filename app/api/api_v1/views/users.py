@@ -1,13 +1,28 @@
 """
 Login view handlers.
 """
-from typing import Optional, List
+from datetime import datetime, timezone
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
 
 from app import crud, models, dependencies, schemas
+from app.core import auth
+from app.db.refresh_tokens import list_sessions, revoke_session, revoke_sessions
+from app.db.revocations import token_revocations
+from app.utils.digest import jti_digest
+from app.utils.etag import etag_matches, make_etag, not_modified
+from app.utils.export import MEDIA_TYPES, ExportFormat, export_lines
+from app.utils.pagination import decode_cursor, encode_cursor
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# largest value of the integer primary key
+MAX_CURSOR_ID = 2**31 - 1
 
 router = APIRouter()
 
@@ -19,9 +34,15 @@ router = APIRouter()
     status_code=status.HTTP_200_OK,
     description="Registers new user",
     response_model=schemas.User,
+    dependencies=[
+        Depends(dependencies.limit_credential_attempts),
+        Depends(dependencies.admit_password_hashing),
+    ],
 )
 async def user_register(
-    user_in: schemas.UserCreate, request: Request
+    user_in: schemas.UserCreate,
+    request: Request,
+    db: AsyncSession = Depends(dependencies.get_db),
 ) -> Optional[schemas.User]:
     """
     Create a new user.
@@ -29,26 +50,18 @@ async def user_register(
     Args:
         register: user data (email, username, password)
         request: request instance
+        db: request-scoped database session
 
     Returns:
         optionally a newly registered user from database.
     """
-    db = request.app.state.db
-    found_user = None
-
-    if user_in.email:
-        found_user = await crud.user.get_by_email(db, email=user_in.email)
-    if not found_user and user_in.username:
-        found_user = await crud.user.get_by_username(db, username=user_in.username)
-    if found_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=(
-                f"User with email (username) {user_in.email} ({user_in.username})"
-                " already exists"
-            ),
-        )
-    user_db = await crud.user.create(db, obj_in=user_in)
+    user_db, conflict = await crud.user.create_unique(db, obj_in=user_in)
+    if user_db is None:
+        if conflict is None:
+            detail = "User with this email or username already exists"
+        else:
+            detail = f"User with {conflict} {getattr(user_in, conflict)} already exists"
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
 
     return user_db
 
@@ -58,32 +71,106 @@ async def user_register(
     name="users:read_users",
     summary="Get users list",
     status_code=status.HTTP_200_OK,
-    description="Get all users list",
+    description=(
+        "Get all users list. Pass the cursor from the X-Next-Cursor header of the"
+        " previous page to get the next one, skip is kept for compatibility"
+    ),
     response_model=List[schemas.User],
 )
 async def read_users(
     request: Request,
     skip: int = 0,
     limit: int = 100,
-    current_super_user: models.User = Depends(
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_super_user: schemas.UserSnapshot = Depends(
         dependencies.get_current_active_superuser
     ),
-) -> Optional[List[models.User]]:
+    db: AsyncSession = Depends(dependencies.get_db),
+) -> Response:
     """
     Get list of all users.
 
+    The page is tagged with ids and update times of its users, if the client
+    has the same page it gets 304 and the page isn't serialized. Otherwise
+    users are validated with the user schema and dumped by orjson directly,
+    skipping ``jsonable_encoder``.
+
     Args:
         request: request instance
         skip: number of users that should be skipped
         limit: max number of users
+        cursor: opaque cursor of the next page
+        if_none_match: entity tags of the page cached by client
         current_super_user: superuser auth dependency
+        db: request-scoped database session
 
     Returns:
-        List of users if success, None otherwise
+        JSON response with users of the page, 304 response if it is unchanged
     """
-    db = request.app.state.db
-    users_list = await crud.user.get_multi(db, skip=skip, limit=limit)
-    return users_list
+    after_id = None
+    if cursor is not None:
+        try:
+            after_id = int(decode_cursor(cursor))
+            if not 0 <= after_id <= MAX_CURSOR_ID:
+                raise ValueError("Cursor is out of range.")
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor."
+            )
+    users_list = await crud.user.get_multi(
+        db, skip=skip, limit=limit, after_id=after_id
+    )
+    etag = make_etag(*((user.id, user.updated) for user in users_list))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    headers = {"ETag": etag}
+    if users_list and len(users_list) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(users_list[-1].id)
+    return ORJSONResponse(
+        [schemas.User.from_orm(user).dict() for user in users_list], headers=headers
+    )
+
+
+@router.get(
+    "/export",
+    name="users:export",
+    summary="Export all users",
+    status_code=status.HTTP_200_OK,
+    description="Stream all users as NDJSON or CSV",
+    response_class=StreamingResponse,
+)
+async def export_users(
+    export_format: ExportFormat = ExportFormat.ndjson,
+    current_super_user: schemas.UserSnapshot = Depends(
+        dependencies.get_current_active_superuser
+    ),
+    db: AsyncSession = Depends(dependencies.get_db),
+) -> StreamingResponse:
+    """
+    Stream all users serialized with the user schema.
+
+    Users are read with a server-side cursor and sent as they are
+    serialized, so memory usage doesn't depend on the number of users.
+
+    Args:
+        export_format: ndjson or csv
+        current_super_user: superuser auth dependency
+        db: request-scoped database session
+
+    Returns:
+        streaming response with exported users
+    """
+    users = crud.user.stream_multi(db)
+    return StreamingResponse(
+        export_lines(users, schemas.User, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="users.{export_format.value}"'
+            )
+        },
+    )
 
 
 @router.get(
@@ -95,18 +182,226 @@ async def read_users(
     response_model=schemas.User,
 )
 async def get_user_me(
-    current_user: schemas.User = Depends(dependencies.get_current_active_user),
-) -> models.User:
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: schemas.UserSnapshot = Depends(dependencies.get_current_active_user),
+    db: AsyncSession = Depends(dependencies.get_db),
+) -> Optional[models.User]:
     """
     Return current user by token if it's active.
 
+    The user is tagged with its update time, which the cached snapshot has
+    too, so a client with the current version gets 304 without a query.
+
     Args:
-        current_user: current user get by token.
+        response: response instance to set ETag on
+        if_none_match: entity tags of the user cached by client
+        current_user: snapshot of current user get by token.
+        db: request-scoped database session
 
     Returns:
         current user by token if it's active, None otherwise.
     """
-    return current_user
+    etag = make_etag(current_user.id, current_user.updated)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    user_db = await crud.user.get(db, current_user.id)
+    if not user_db:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User hasn't been found."
+        )
+    response.headers["ETag"] = make_etag(user_db.id, user_db.updated)
+    return user_db
+
+
+async def read_sessions(
+    request: Request, user_id: int, current: Optional[bytes] = None
+) -> List[schemas.Session]:
+    """
+    Return live sessions of user.
+
+    Args:
+        request: request instance
+        user_id: user id
+        current: token id digest of the session making the request
+
+    Returns:
+        list of sessions, oldest first
+    """
+    sessions = await list_sessions(request.app.state.redis, user_id=user_id)
+    return [
+        schemas.Session(
+            id=digest.hex(),
+            expires_at=datetime.fromtimestamp(expires, tz=timezone.utc),
+            current=digest == current,
+        )
+        for digest, expires in sessions
+    ]
+
+
+async def kill_sessions(request: Request, user_id: int) -> None:
+    """
+    Revoke all refresh tokens of user and access tokens issued with them.
+
+    Args:
+        request: request instance
+        user_id: user id
+
+    Returns:
+        None
+    """
+    digests = await revoke_sessions(request.app.state.redis, user_id=user_id)
+    await token_revocations.revoke_digests(digests)
+
+
+@router.get(
+    "/me/sessions",
+    name="users:me-sessions",
+    summary="Get sessions of current user",
+    status_code=status.HTTP_200_OK,
+    description="Get live login sessions of current user",
+    response_model=List[schemas.Session],
+)
+async def read_user_me_sessions(
+    request: Request,
+    token: str = Depends(auth.reusable_oauth2),
+    current_user: schemas.UserSnapshot = Depends(dependencies.get_current_active_user),
+) -> List[schemas.Session]:
+    """
+    Return live sessions of current user.
+
+    Args:
+        request: request instance
+        token: jwt access token
+        current_user: snapshot of current user get by token.
+
+    Returns:
+        list of sessions, the one of the passed token is marked as current
+    """
+    current = jti_digest(auth.verify_token(token).jti)
+    return await read_sessions(request, current_user.id, current)
+
+
+@router.delete(
+    "/me/sessions",
+    name="users:me-sessions-revoke",
+    summary="Revoke sessions of current user",
+    status_code=status.HTTP_204_NO_CONTENT,
+    description="Logout current user everywhere, the current session included",
+)
+async def revoke_user_me_sessions(
+    request: Request,
+    current_user: schemas.UserSnapshot = Depends(dependencies.get_current_active_user),
+) -> Response:
+    """
+    Revoke all sessions of current user.
+
+    Args:
+        request: request instance
+        current_user: snapshot of current user get by token.
+
+    Returns:
+        empty response
+    """
+    await kill_sessions(request, current_user.id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.delete(
+    "/me/sessions/{session_id}",
+    name="users:me-session-revoke",
+    summary="Revoke session of current user",
+    status_code=status.HTTP_204_NO_CONTENT,
+    description="Logout selected session of current user",
+)
+async def revoke_user_me_session(
+    session_id: str,
+    request: Request,
+    current_user: schemas.UserSnapshot = Depends(dependencies.get_current_active_user),
+) -> Response:
+    """
+    Revoke selected session of current user.
+
+    Args:
+        session_id: session id from the sessions list
+        request: request instance
+        current_user: snapshot of current user get by token.
+
+    Returns:
+        empty response
+    """
+    not_found = HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Session <{session_id}> not found",
+    )
+    try:
+        digest = bytes.fromhex(session_id)
+    except ValueError:
+        raise not_found
+    if not await revoke_session(
+        request.app.state.redis, user_id=current_user.id, digest=digest
+    ):
+        raise not_found
+    await token_revocations.revoke_digests([digest])
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get(
+    "/{user_id}/sessions",
+    name="users:sessions",
+    summary="Get sessions of user",
+    status_code=status.HTTP_200_OK,
+    description="Get live login sessions of selected user",
+    response_model=List[schemas.Session],
+)
+async def read_user_sessions(
+    user_id: int,
+    request: Request,
+    current_super_user: schemas.UserSnapshot = Depends(
+        dependencies.get_current_active_superuser
+    ),
+) -> List[schemas.Session]:
+    """
+    Return live sessions of selected user.
+
+    Args:
+        user_id: user id
+        request: request instance
+        current_super_user: snapshot of current superuser get by token.
+
+    Returns:
+        list of sessions, oldest first
+    """
+    return await read_sessions(request, user_id)
+
+
+@router.delete(
+    "/{user_id}/sessions",
+    name="users:sessions-revoke",
+    summary="Revoke sessions of user",
+    status_code=status.HTTP_204_NO_CONTENT,
+    description="Logout selected user everywhere",
+)
+async def revoke_user_sessions(
+    user_id: int,
+    request: Request,
+    current_super_user: schemas.UserSnapshot = Depends(
+        dependencies.get_current_active_superuser
+    ),
+) -> Response:
+    """
+    Revoke all sessions of selected user.
+
+    Args:
+        user_id: user id
+        request: request instance
+        current_super_user: snapshot of current superuser get by token.
+
+    Returns:
+        empty response
+    """
+    await kill_sessions(request, user_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.patch(
@@ -121,7 +416,8 @@ async def user_update(
     user_id: int,
     user_in: schemas.UserUpdate,
     request: Request,
-    current_user: schemas.User = Depends(dependencies.get_current_active_user),
+    current_user: schemas.UserSnapshot = Depends(dependencies.get_current_active_user),
+    db: AsyncSession = Depends(dependencies.get_db),
 ) -> Optional[schemas.User]:
     """
     Update selected user.
@@ -130,10 +426,10 @@ async def user_update(
         user_id: user id
         user_in: user data (email, username or password)
         request: request instance
+        db: request-scoped database session
     Returns:
         optionally an updated user from database.
     """
-    db = request.app.state.db
     found_user = await crud.user.get(db, user_id)
 
     if not found_user:
@@ -142,7 +438,7 @@ async def user_update(
             detail=f"User with id <{user_id}> not found",
         )
 
-    if found_user != current_user and not crud.user.is_superuser(current_user):
+    if found_user.id != current_user.id and not crud.user.is_superuser(current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="The user doesn't have enough privileges.",
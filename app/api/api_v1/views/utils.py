@@ -3,16 +3,26 @@ Endpoints of arbitrary utilities.
 
 Attrs:
     health_check: check connections to databases.
+    metrics: internal runtime metrics.
 """
 import uuid
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy import text
 from sqlalchemy.exc import InterfaceError
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 from starlette.requests import Request
 
+from app import dependencies
+from app.core.auth import token_cache
+from app.core.security import password_hash_pool
+from app.db.login_failures import login_failures
+from app.db.rate_limits import rate_limiter
 from app.db.redis import get_redis_key
+from app.db.session import pool_stats
+from app.db.revocations import token_revocations
+from app.db.snapshots import user_snapshots
 
 router = APIRouter()
 
@@ -26,17 +36,19 @@ router = APIRouter()
         " it's ok"
     ),
 )
-async def health_check(request: Request) -> dict:
+async def health_check(
+    request: Request, db: AsyncSession = Depends(dependencies.get_db)
+) -> dict:
     """
     Check connections to databases.
 
     Args:
         request: request instance
+        db: request-scoped database session
 
     Returns:
         dict with key detail and value OK if success, otherwise None
     """
-    db = request.app.state.db
     redis = request.app.state.redis
     try:
         res = await db.execute(text("SELECT 1"))
@@ -52,3 +64,29 @@ async def health_check(request: Request) -> dict:
         raise HTTPException(
             detail="connection failed", status_code=status.HTTP_503_SERVICE_UNAVAILABLE
         )
+
+
+@router.get(
+    "/metrics",
+    name="metrics",
+    summary="internal runtime metrics",
+    description="connection pools telemetry for monitoring",
+    include_in_schema=False,
+    dependencies=[Depends(dependencies.get_current_active_superuser)],
+)
+async def metrics() -> dict:
+    """
+    Return internal runtime metrics, only superusers can read them.
+
+    Returns:
+        dict of metrics by subsystem
+    """
+    return {
+        "db_pool": pool_stats(),
+        "password_hashing": password_hash_pool.as_dict(),
+        "token_cache": token_cache.as_dict(),
+        "user_snapshots": user_snapshots.as_dict(),
+        "token_revocations": token_revocations.as_dict(),
+        "rate_limits": rate_limiter.as_dict(),
+        "login_failures": login_failures.as_dict(),
+    }
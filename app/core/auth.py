@@ -2,18 +2,32 @@
 Auth utils.
 
 Attrs:
+    key_ring: asymmetric signing keys, None for HS* algorithms.
+    TOKEN_CLAIMS_VERSION: version of token claims layout, ``v`` claim.
+    ACCESS_TOKEN_TYPE: ``typ`` claim of access tokens.
+    REFRESH_TOKEN_TYPE: ``typ`` claim of refresh tokens.
     create_access_token: creates access or refresh JWT token.
     decode_token: decodes and verifies JWT token.
+    parse_subject: returns subject of decoded token of any claims version.
+    token_cache: LRU cache of verified token subjects.
+    verify_token: returns subject of valid token, cached until token expires.
 """
-import json
-from datetime import timedelta, datetime
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
 
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 
 from app import schemas
-from app.core import auth
 from app.core.config import settings
+from app.core.keys import load_key_ring
+
+key_ring = load_key_ring(
+    settings.JWT_KEYS_DIR, settings.JWT_ALGORITHM, settings.JWT_SIGNING_KEY_ID
+)
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_PREFIX}{settings.LOGIN_ACCESS_TOKEN_PATH}",
@@ -24,32 +38,82 @@ reusable_oauth2_refresh = OAuth2PasswordBearer(
 )
 
 
+TOKEN_CLAIMS_VERSION = 1
+ACCESS_TOKEN_TYPE = "access_token"
+REFRESH_TOKEN_TYPE = "refresh_token"
+
+
+def subject_claims(subject: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build compact claims of token subject.
+
+    User id is the ``sub`` claim, empty scope is omitted.
+
+    Args:
+        subject: token subject fields
+
+    Returns:
+        claims dict without ``typ`` and ``exp``
+    """
+    claims = {
+        "v": TOKEN_CLAIMS_VERSION,
+        "sub": str(subject["id"]),
+        "jti": subject["jti"],
+    }
+    if subject.get("scope"):
+        claims["scope"] = list(subject["scope"])
+    return claims
+
+
+def encode_token(claims: Dict[str, Any]) -> str:
+    """
+    Sign claims with the current signing key.
+
+    Args:
+        claims: token claims
+
+    Returns:
+        string containing JWT token
+    """
+    if key_ring is None:
+        return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    kid, key = key_ring.signing_key()
+    return jwt.encode(claims, key, algorithm=key_ring.algorithm, headers={"kid": kid})
+
+
 def create_tokens(token_subject: dict) -> schemas.Token:
     """
     Create token object with access and refresh tokens included.
 
     Args:
-        token_subject: subject dict to be added to tokens
+        token_subject: subject dict to be added to tokens, ``id`` and ``jti``
+            are required, ``scope`` is optional
 
 
     Returns:
         pydantic token object with access and refresh token.
     """
-    access_token = schemas.TokenSubject.parse_obj(
-        {**token_subject, "token_type": "access_token"}
+    claims = subject_claims(token_subject)
+    now = int(time.time())
+    access_token = encode_token(
+        {
+            **claims,
+            "typ": ACCESS_TOKEN_TYPE,
+            "exp": now + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        }
     )
-    refresh_token = schemas.TokenSubject.parse_obj(
-        {**token_subject, "token_type": "refresh_token"}
+    refresh_token = encode_token(
+        {
+            **claims,
+            "typ": REFRESH_TOKEN_TYPE,
+            "exp": now + settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60,
+        }
     )
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    refresh_token_expires = timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
-
-    token = schemas.Token(
-        access_token=auth.create_access_token(access_token, access_token_expires),
-        refresh_token=auth.create_access_token(refresh_token, refresh_token_expires),
+    return schemas.Token(
+        access_token=access_token,
+        refresh_token=refresh_token,
         token_type=token_subject.get("token_type"),
     )
-    return token
 
 
 def create_access_token(
@@ -65,17 +129,12 @@ def create_access_token(
     Returns:
         string containing JWT token
     """
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(
-            minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
-        )
-    to_encode = {"exp": expire, "sub": json.dumps(subject.dict())}
-    encoded_jwt = jwt.encode(
-        to_encode, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM
-    )
-    return encoded_jwt
+    if expires_delta is None:
+        expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    claims = subject_claims(subject.dict())
+    claims["typ"] = subject.token_type
+    claims["exp"] = int(time.time() + expires_delta.total_seconds())
+    return encode_token(claims)
 
 
 def decode_token(token: str) -> dict:
@@ -88,4 +147,167 @@ def decode_token(token: str) -> dict:
     Returns:
         dict of decoded data (key, value)
     """
-    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    if key_ring is None:
+        return jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
+        )
+    key = key_ring.verification_key(jwt.get_unverified_header(token).get("kid"))
+    return jwt.decode(token, key, algorithms=[key_ring.algorithm])
+
+
+def parse_subject(payload: Dict[str, Any]) -> schemas.TokenSubject:
+    """
+    Parse subject of decoded token.
+
+    Tokens without ``v`` claim have the whole subject JSON-encoded in ``sub``,
+    they are accepted until the last of them expires.
+
+    Args:
+        payload: decoded token claims
+
+    Returns:
+        token subject
+
+    Raises:
+        JWTError: if token has no subject
+        ValidationError: if token subject is invalid
+    """
+    if payload.get("v") == TOKEN_CLAIMS_VERSION:
+        return schemas.TokenSubject(
+            id=payload.get("sub"),
+            jti=payload.get("jti"),
+            token_type=payload.get("typ"),
+            scope=payload.get("scope", []),
+        )
+    token_data = schemas.TokenPayload.parse_obj(payload)
+    if token_data.sub is None:
+        raise jwt.JWTError("Token has no subject.")
+    return schemas.TokenSubject.parse_raw(token_data.sub)
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of parsed subjects of verified tokens.
+
+    Keys are token digests, so tokens themselves aren't kept in memory.
+    Entries expire at the token ``exp`` claim.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.entries: "OrderedDict[bytes, Tuple[float, schemas.TokenSubject]]" = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        """
+        Get cache key of token.
+
+        Args:
+            token: JWT token string
+
+        Returns:
+            token digest
+        """
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, token: str) -> Optional[schemas.TokenSubject]:
+        """
+        Get subject of token if it's cached and not expired.
+
+        Args:
+            token: JWT token string
+
+        Returns:
+            token subject or None
+        """
+        key = self.key(token)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, token: str, expire: float, subject: schemas.TokenSubject) -> None:
+        """
+        Cache subject of verified token.
+
+        Args:
+            token: JWT token string
+            expire: token expiration timestamp
+            subject: parsed token subject
+
+        Returns:
+            None
+        """
+        if self.max_size <= 0:
+            return
+        key = self.key(token)
+        self.entries[key] = (expire, subject)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Drop all entries.
+
+        Returns:
+            None
+        """
+        self.entries.clear()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Return cache counters.
+
+        Returns:
+            dict with size and hit, miss and eviction counters
+        """
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+token_cache = TokenCache(settings.ACCESS_TOKEN_CACHE_SIZE)
+
+
+def verify_token(token: str) -> schemas.TokenSubject:
+    """
+    Verify access JWT token and parse its subject, cached until it expires.
+
+    Refresh tokens are rejected, they are only accepted by the refresh view.
+    The returned subject is shared between requests and must not be changed.
+
+    Args:
+        token: input JWT token string.
+
+    Returns:
+        token subject
+
+    Raises:
+        JWTError: if token is invalid, expired or isn't an access token
+        ValidationError: if token payload or subject is invalid
+    """
+    subject = token_cache.get(token)
+    if subject is not None:
+        return subject
+    payload = decode_token(token)
+    subject = parse_subject(payload)
+    if subject.token_type != ACCESS_TOKEN_TYPE:
+        raise jwt.JWTError("Token isn't an access token.")
+    token_cache.set(token, payload["exp"], subject)
+    return subject
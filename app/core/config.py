@@ -5,9 +5,9 @@ Attrs:
     settings: instance of main Settings class.
 """
 import secrets
-from typing import List, Union, Optional, Dict, Any
+from typing import Any, Dict, List, Optional, Union
 
-from pydantic import BaseSettings, AnyHttpUrl, validator, PostgresDsn, RedisDsn
+from pydantic import AnyHttpUrl, BaseSettings, PostgresDsn, RedisDsn, validator
 
 
 class Settings(BaseSettings):
@@ -26,6 +26,8 @@ class Settings(BaseSettings):
     SERVER_NAME: str = "bshr"
     SERVER_HOST: str = "0.0.0.0"
     SERVER_PORT: int = 8000
+    # number of server worker processes, e.g. hypercorn --workers
+    SERVER_WORKERS: int = 1
     BACKEND_CORS_ORIGINS: Union[str, List[AnyHttpUrl]] = []
 
     @validator("BACKEND_CORS_ORIGINS", pre=True)
@@ -87,6 +89,37 @@ class Settings(BaseSettings):
             path=f"/{values.get('SQLALCHEMY_DATABASE_NAME') or ''}",
         )
 
+    SQLALCHEMY_REPLICA_URIS: Union[str, List[str]] = []
+
+    @validator("SQLALCHEMY_REPLICA_URIS", pre=True)
+    def assemble_replica_connections(
+        cls, v: Union[str, List[str]]
+    ) -> Union[str, List[str]]:
+        """
+        Validate and assemble read replica uris from comma separated string.
+
+        Args:
+            v: list of read replica connection uris.
+
+        Returns:
+            list of read replica connection uris.
+        """
+        if isinstance(v, str) and not v.startswith("["):
+            return [i.strip() for i in v.split(",") if i.strip()]
+        else:
+            return v
+
+    SQLALCHEMY_POOL_SIZE: int = 50
+    SQLALCHEMY_MAX_OVERFLOW: int = 10
+    SQLALCHEMY_POOL_RECYCLE: int = 300
+    # size pools from max_connections of the server shared by SERVER_WORKERS
+    SQLALCHEMY_POOL_AUTOSIZE: bool = False
+    SQLALCHEMY_SERVER_MAX_CONNECTIONS: int = 100
+    SQLALCHEMY_RESERVED_CONNECTIONS: int = 5
+
+    # reads of a client go to the primary for this long after its last write
+    SQLALCHEMY_READ_YOUR_WRITES_SECONDS: int = 5
+
     REDIS_HOST: str
     REDIS_PORT: str
 
@@ -114,15 +147,85 @@ class Settings(BaseSettings):
             port=values.get("REDIS_PORT"),
         )
 
+    # user snapshots authorize requests without the database, changes are
+    # seen by other workers after at most local ttl (0 disables memory level)
+    USER_SNAPSHOT_TTL_SECONDS: int = 300
+    USER_SNAPSHOT_LOCAL_TTL_SECONDS: int = 5
+    USER_SNAPSHOT_LOCAL_SIZE: int = 10000
+
     FIRST_SUPERUSER: str
     FIRST_SUPERUSER_EMAIL: str
     FIRST_SUPERUSER_PASSWORD: str
 
+    # processes hashing passwords off the event loop, cpu count if not set,
+    # 0 hashes inline; calls over the queue size wait for a free slot, calls
+    # over max waiting are rejected with 503 and Retry-After
+    PASSWORD_HASH_WORKERS: Optional[int] = None
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+    PASSWORD_HASH_MAX_WAITING: int = 64
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 1
+    # passlib schemes, the first one hashes new passwords, others are
+    # rehashed on login; work factor is calibrated at startup to the target
+    # hash latency if it's set
+    PASSWORD_HASH_SCHEMES: Union[str, List[str]] = ["pbkdf2_sha256"]
+    PASSWORD_HASH_TARGET_MS: Optional[float] = None
+
+    @validator("PASSWORD_HASH_SCHEMES", pre=True)
+    def assemble_password_hash_schemes(
+        cls, v: Union[str, List[str]]
+    ) -> Union[str, List[str]]:
+        """
+        Validate and assemble password hash schemes.
+
+        Args:
+            v: list of passlib scheme names.
+
+        Returns:
+            list of scheme names.
+        """
+        if isinstance(v, str) and not v.startswith("["):
+            return [i.strip() for i in v.split(",")]
+        else:
+            return v
+
     SECRET_KEY: str = secrets.token_urlsafe(32)
     JWT_ALGORITHM: str = "HS256"
+    # RS*/ES* algorithms sign with keys from <kid>.pem files of the directory,
+    # the last private key by name is used unless the kid is set
+    JWT_KEYS_DIR: Optional[str] = None
+    JWT_SIGNING_KEY_ID: Optional[str] = None
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 5
     # 8 days by default
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # expected number of access tokens revoked per ACCESS_TOKEN_EXPIRE_MINUTES
+    # and false positive rate of revocations Bloom filter
+    TOKEN_REVOCATION_CAPACITY: int = 100000
+    TOKEN_REVOCATION_ERROR_RATE: float = 0.001
+    # verified tokens kept parsed in memory of every worker, 0 disables cache
+    ACCESS_TOKEN_CACHE_SIZE: int = 10000
+    # token buckets of credential endpoints (login and registration) per
+    # client address and per submitted username, zero burst or rate per
+    # minute disables a limit
+    RATE_LIMIT_IP_PER_MINUTE: float = 30
+    RATE_LIMIT_IP_BURST: int = 10
+    RATE_LIMIT_USERNAME_PER_MINUTE: float = 10
+    RATE_LIMIT_USERNAME_BURST: int = 5
+    # number of reverse proxies in front of the app, each appends the address
+    # it got the request from to X-Forwarded-For; without them every client
+    # would share the IP bucket of the proxy address
+    RATE_LIMIT_TRUSTED_PROXIES: int = 0
+    # buckets are kept in memory of every worker for RATE_LIMIT_FALLBACK_SECONDS
+    # after redis fails or is slower than RATE_LIMIT_REDIS_TIMEOUT_MS
+    RATE_LIMIT_REDIS_TIMEOUT_MS: int = 50
+    RATE_LIMIT_FALLBACK_SECONDS: int = 5
+    RATE_LIMIT_LOCAL_SIZE: int = 10000
+    # accounts are locked for LOGIN_LOCKOUT_BASE_SECONDS after
+    # LOGIN_LOCKOUT_THRESHOLD failed logins in a row, every next failure
+    # doubles the lockout, zero threshold disables lockouts
+    LOGIN_LOCKOUT_THRESHOLD: int = 5
+    LOGIN_LOCKOUT_BASE_SECONDS: int = 1
+    LOGIN_LOCKOUT_MAX_SECONDS: int = 900
+    LOGIN_FAILURE_WINDOW_SECONDS: int = 900
     LOGIN_ACCESS_TOKEN_PATH: str = "/auth/token"
     LOGIN_REFRESH_TOKEN_PATH: str = "/auth/token/refresh"
 
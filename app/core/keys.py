@@ -0,0 +1,110 @@
+"""
+JWT signing keys.
+
+Attrs:
+    KeyRing: asymmetric keys identified by kid.
+    load_key_ring: loads key ring from directory of PEM files.
+"""
+import pathlib
+from typing import Dict, List, Optional, Tuple
+
+from jose import jwk
+from jose.backends.base import Key
+from jose.exceptions import JWTError
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512")
+
+
+class KeyRing:
+    """
+    Asymmetric JWT keys identified by kid.
+
+    One private key signs new tokens, all keys verify tokens which carry
+    their kid. To rotate keys add a new key file, switch the signing kid and
+    delete the old file after the longest token lifetime.
+    """
+
+    def __init__(self, algorithm: str, keys: Dict[str, Key], signing_kid: str) -> None:
+        if signing_kid not in keys or keys[signing_kid].is_public():
+            raise ValueError(f"No private key with kid <{signing_kid}>.")
+        self.algorithm = algorithm
+        self.keys = keys
+        self.signing_kid = signing_kid
+        self.public_keys = {kid: key.public_key() for kid, key in keys.items()}
+
+    def signing_key(self) -> Tuple[str, Key]:
+        """
+        Get key to sign new tokens.
+
+        Returns:
+            kid and private key
+        """
+        return self.signing_kid, self.keys[self.signing_kid]
+
+    def verification_key(self, kid: Optional[str]) -> Key:
+        """
+        Get key to verify token signed with kid.
+
+        Args:
+            kid: key id from token header
+
+        Returns:
+            public key
+
+        Raises:
+            JWTError: if key is unknown
+        """
+        key = self.public_keys.get(kid) if kid is not None else None
+        if key is None:
+            raise JWTError(f"Unknown signing key <{kid}>.")
+        return key
+
+    def jwks(self) -> Dict[str, List[dict]]:
+        """
+        Get public keys as JSON Web Key Set.
+
+        Returns:
+            JWKS dict
+        """
+        return {
+            "keys": [
+                {**key.to_dict(), "kid": kid, "use": "sig"}
+                for kid, key in sorted(self.public_keys.items())
+            ]
+        }
+
+
+def load_key_ring(
+    keys_dir: Optional[str], algorithm: str, signing_kid: Optional[str] = None
+) -> Optional[KeyRing]:
+    """
+    Load key ring from ``<kid>.pem`` files of the directory.
+
+    Files may hold private keys or public keys of retired signers. Without
+    signing kid the last private key by name signs tokens.
+
+    Args:
+        keys_dir: directory with PEM files
+        algorithm: asymmetric JWT algorithm
+        signing_kid: kid of the key to sign new tokens with
+
+    Returns:
+        key ring, None for symmetric algorithms
+
+    Raises:
+        ValueError: if asymmetric algorithm has no usable keys
+    """
+    if algorithm not in ASYMMETRIC_ALGORITHMS:
+        return None
+    if not keys_dir:
+        raise ValueError(f"{algorithm} needs directory with signing keys.")
+    keys = {
+        path.stem: jwk.construct(path.read_bytes(), algorithm)
+        for path in sorted(pathlib.Path(keys_dir).glob("*.pem"))
+    }
+    if signing_kid is None:
+        private_kids = [kid for kid, key in keys.items() if not key.is_public()]
+        if not private_kids:
+            raise ValueError(f"No private keys in {keys_dir}.")
+        signing_kid = private_kids[-1]
+    return KeyRing(algorithm, keys, signing_kid)
@@ -7,7 +7,23 @@ Attrs:
                        algorithm.
     get_password_hash: returns hashed password.
     verify_password: verified plain and hashed passwords.
+    password_hash_pool: process pool running hashing off the event loop.
+    PasswordHashingBusy: raised when hashing pool rejects a call.
+    hash_password: async variant of get_password_hash.
+    hash_passwords: hashes many passwords concurrently in the pool.
+    check_password: async variant of verify_password.
+    password_needs_rehash: checks if hash is below current policy.
+    dummy_password_hash: hash to verify against when user isn't found.
+    calibrate_rounds: measures scheme work factor for target latency.
+    setup_password_hashing: applies schemes and calibrated work factors.
 """
+import asyncio
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, TypeVar
 
 from passlib.context import CryptContext
 
@@ -17,6 +33,13 @@ password_hash_ctx = CryptContext(
     pbkdf2_sha256__max_rounds=26000,
 )
 
+T = TypeVar("T")
+
+# calibrated linear rounds accept hashes within this share of the target,
+# so noise of calibration doesn't make every login rehash after restart
+ROUNDS_TOLERANCE = 0.25
+CALIBRATION_SAMPLES = 3
+
 
 def get_password_hash(password: str) -> str:
     """
@@ -43,3 +66,314 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         True if password is correct, False otherwise.
     """
     return password_hash_ctx.verify(plain_password, hashed_password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    Check if hash uses deprecated scheme or work factor out of policy.
+
+    Args:
+        hashed_password: hashed password string.
+
+    Returns:
+        True if password should be hashed again, False otherwise.
+    """
+    return password_hash_ctx.needs_update(hashed_password)
+
+
+@lru_cache(maxsize=1)
+def dummy_password_hash() -> str:
+    """
+    Get hash of random password made with current policy.
+
+    Verifying against it costs the same as verifying a real user password,
+    so a missing user can't be told apart by response time.
+
+    Returns:
+        hashed password string.
+    """
+    return get_password_hash(os.urandom(16).hex())
+
+
+def configure_password_hashing(config: Dict[str, Any]) -> None:
+    """
+    Load hashing policy into the context of current process.
+
+    Args:
+        config: CryptContext configuration dict
+
+    Returns:
+        None
+    """
+    password_hash_ctx.load(config)
+    dummy_password_hash.cache_clear()
+
+
+def calibrate_rounds(scheme: str, target_ms: float) -> int:
+    """
+    Measure rounds of scheme hashing password in about target time.
+
+    Args:
+        scheme: passlib scheme name
+        target_ms: target hash latency in milliseconds
+
+    Returns:
+        number of rounds (log2 of it for log2 cost schemes)
+    """
+    handler = password_hash_ctx.handler(scheme)
+    probe_rounds = handler.default_rounds
+    probe = handler.using(rounds=probe_rounds)
+    elapsed = math.inf
+    for _ in range(CALIBRATION_SAMPLES):
+        started = time.perf_counter()
+        probe.hash("calibration")
+        elapsed = min(elapsed, time.perf_counter() - started)
+    ratio = target_ms / 1000 / elapsed
+    if handler.rounds_cost == "log2":
+        rounds = probe_rounds + round(math.log2(ratio))
+    else:
+        rounds = int(round(probe_rounds * ratio, -3))
+    return min(max(rounds, handler.min_rounds), handler.max_rounds)
+
+
+def setup_password_hashing(
+    schemes: List[str], target_ms: Optional[float]
+) -> Dict[str, Any]:
+    """
+    Apply hashing policy: schemes and work factors calibrated to target time.
+
+    The first scheme hashes new passwords, the others are only verified and
+    reported by password_needs_rehash. Without target the current work
+    factors are kept.
+
+    Args:
+        schemes: passlib scheme names
+        target_ms: target hash latency in milliseconds
+
+    Returns:
+        CryptContext configuration dict to load in other processes
+    """
+    config = password_hash_ctx.to_dict()
+    config.update(schemes=schemes, deprecated=["auto"])
+    configure_password_hashing(config)
+    if target_ms:
+        scheme = schemes[0]
+        rounds = calibrate_rounds(scheme, target_ms)
+        tolerance = 0
+        if password_hash_ctx.handler(scheme).rounds_cost != "log2":
+            tolerance = int(rounds * ROUNDS_TOLERANCE)
+        config.update(
+            {
+                f"{scheme}__default_rounds": rounds,
+                f"{scheme}__min_rounds": rounds - tolerance,
+                f"{scheme}__max_rounds": rounds + tolerance,
+            }
+        )
+        configure_password_hashing(config)
+    return config
+
+
+class PasswordHashingBusy(Exception):
+    """
+    Raised when too many password hashing calls are already waiting.
+    """
+
+
+class PasswordHashPool:
+    """
+    Process pool for CPU bound password hashing with admission control.
+
+    At most ``queue_size`` calls are submitted to the workers, up to
+    ``max_waiting`` more wait for a free slot and the rest are rejected with
+    PasswordHashingBusy. Until it's started (or with 0 workers) functions are
+    called inline.
+    """
+
+    def __init__(self) -> None:
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.queue_size = 0
+        self.max_waiting = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def start(
+        self,
+        workers: Optional[int],
+        queue_size: int,
+        config: Optional[Dict[str, Any]] = None,
+        max_waiting: int = 0,
+    ) -> None:
+        """
+        Start worker processes.
+
+        Args:
+            workers: number of processes, cpu count if None, 0 disables pool
+            queue_size: max number of submitted and not finished calls
+            config: hashing policy loaded by every worker
+            max_waiting: max number of calls waiting for a free slot
+
+        Returns:
+            None
+        """
+        workers = (os.cpu_count() or 1) if workers is None else workers
+        if workers <= 0:
+            return
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=configure_password_hashing,
+            initargs=(config or password_hash_ctx.to_dict(),),
+        )
+        self.queue_size = max(queue_size, workers)
+        self.max_waiting = max_waiting
+        self.slots = asyncio.Semaphore(self.queue_size)
+
+    def shutdown(self) -> None:
+        """
+        Stop worker processes.
+
+        Returns:
+            None
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        self.executor = None
+        self.slots = None
+
+    def is_busy(self) -> bool:
+        """
+        Check if new call would be rejected.
+
+        Returns:
+            True if all slots are taken and waiting calls are at the limit.
+        """
+        return (
+            self.slots is not None
+            and self.slots.locked()
+            and self.waiting >= self.max_waiting
+        )
+
+    def admit(self) -> None:
+        """
+        Reject new call if the pool is busy.
+
+        Returns:
+            None
+
+        Raises:
+            PasswordHashingBusy: if all slots and waiting places are taken
+        """
+        if self.is_busy():
+            self.rejected += 1
+            raise PasswordHashingBusy()
+
+    async def run(self, func: Callable[..., T], *args: Any, admit: bool = True) -> T:
+        """
+        Run function in the pool, wait for a free slot first.
+
+        Args:
+            func: picklable module level function
+            args: function arguments
+            admit: reject the call if the pool is busy, internal work passes
+                False to wait for a slot instead
+
+        Returns:
+            function result
+
+        Raises:
+            PasswordHashingBusy: if all slots and waiting places are taken
+        """
+        if self.executor is None or self.slots is None:
+            return func(*args)
+        if admit:
+            self.admit()
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.slots.release()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Return admission counters.
+
+        Returns:
+            dict with slots, queue depth and counters
+        """
+        return {
+            "queue_size": self.queue_size,
+            "max_waiting": self.max_waiting,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_hash_pool = PasswordHashPool()
+
+
+async def hash_password(password: str, admit: bool = True) -> str:
+    """
+    Get hashed password string without blocking the event loop.
+
+    Args:
+        password: password string.
+        admit: reject the call if the pool is busy, otherwise wait for a slot.
+
+    Returns:
+        hashed password string.
+    """
+    return await password_hash_pool.run(get_password_hash, password, admit=admit)
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Get hashed password strings of many passwords concurrently.
+
+    Passwords are hashed in chunks of the pool queue size, so bulk work
+    keeps all workers busy without piling up calls waiting for a slot. Bulk
+    work waits for free slots instead of being rejected by admission control.
+
+    Args:
+        passwords: password strings.
+
+    Returns:
+        hashed password strings in the same order.
+    """
+    chunk_size = max(password_hash_pool.queue_size, 1)
+    hashes: List[str] = []
+    for start in range(0, len(passwords), chunk_size):
+        end = start + chunk_size
+        hashes.extend(
+            await asyncio.gather(
+                *(hash_password(p, admit=False) for p in passwords[start:end])
+            )
+        )
+    return hashes
+
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify password with its hash without blocking the event loop.
+
+    Args:
+        plain_password: plain password string.
+        hashed_password: hashed password string.
+
+    Returns:
+        True if password is correct, False otherwise.
+    """
+    return await password_hash_pool.run(
+        verify_password, plain_password, hashed_password
+    )
@@ -1,10 +1,22 @@
 """
 Common CRUD methods.
 """
-from typing import TypeVar, Type, Generic, Optional, Any, List, Union, Dict
+from datetime import datetime, timezone
+from typing import (
+    TypeVar,
+    Type,
+    Generic,
+    Optional,
+    Any,
+    List,
+    Union,
+    Dict,
+    AsyncIterator,
+)
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import delete, insert, inspect, update
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 
@@ -28,6 +40,36 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             model: SQLAlchemy model class
         """
         self.model = model
+        # mapper column names, cached once per model
+        self.column_keys = frozenset(inspect(model).column_attrs.keys())
+
+    def get_update_data(
+        self, obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Get values to update, fields missing in the model columns are dropped.
+
+        Models with ``updated`` column get it set to the current time, unless
+        there is nothing to update or it's passed explicitly.
+
+        Args:
+            obj_in: pydantic update schema type or dict of values
+
+        Returns:
+            dict of column values
+        """
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_defaults=True)
+        update_data = {
+            field: value
+            for field, value in update_data.items()
+            if field in self.column_keys
+        }
+        if update_data and "updated" in self.column_keys:
+            update_data.setdefault("updated", datetime.now(timezone.utc))
+        return update_data
 
     async def get(self, db: Session, id: Any) -> Optional[ModelType]:
         """
@@ -45,27 +87,69 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         return found_obj
 
     async def get_multi(
-        self, db: Session, *, skip: int = 0, limit: int = 100
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        after_id: Optional[Any] = None,
     ) -> List[ModelType]:
         """
-        Get multiple objects from db if they've been found.
+        Get multiple objects from db ordered by id if they've been found.
+
+        With ``after_id`` keyset pagination is used: objects are read from the
+        primary key index right after the passed id, so deep pages are as
+        cheap as the first one. Otherwise ``skip`` objects are skipped.
 
         Args:
             db: SQLAlchemy session
             skip: ids to skip
             limit: max number of objects to return
+            after_id: id of the last object of the previous page
 
         Returns:
             list of SQLAlchemy model instances
         """
-        res = await db.execute(select(self.model).offset(skip).limit(limit))
+        query = select(self.model).order_by(self.model.id).limit(limit)
+        if after_id is not None:
+            query = query.filter(self.model.id > after_id)
+        else:
+            query = query.offset(skip)
+        res = await db.execute(query)
         found_objs = res.scalars().all()
         return found_objs
 
+    async def stream_multi(
+        self, db: Session, *, batch_size: int = 1000
+    ) -> AsyncIterator[ModelType]:
+        """
+        Stream all objects from db ordered by id using a server-side cursor.
+
+        Rows are fetched in batches, so memory usage doesn't depend on the
+        table size.
+
+        Args:
+            db: SQLAlchemy async session
+            batch_size: number of rows fetched from the cursor at once
+
+        Returns:
+            async iterator of SQLAlchemy model instances
+        """
+        res = await db.stream_scalars(
+            select(self.model)
+            .order_by(self.model.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for obj in res:
+            yield obj
+
     async def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         """
         Create one object.
 
+        Server-generated values (id, defaults) come back with RETURNING,
+        so no refresh query is needed.
+
         Args:
             db: SQLAlchemy session
             obj_in: pydantic create schema type
@@ -74,10 +158,11 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             SQLAlchemy model instance.
         """
         obj_in_data = jsonable_encoder(obj_in)
-        obj_db = self.model(**obj_in_data)
-        db.add(obj_db)
+        res = await db.scalars(
+            insert(self.model).values(**obj_in_data).returning(self.model)
+        )
+        obj_db = res.one()
         await db.commit()
-        await db.refresh(obj_db)
         return obj_db
 
     async def update(
@@ -85,11 +170,14 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db: Session,
         *,
         obj_db: ModelType,
-        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
     ) -> ModelType:
         """
         Update an object with passed data.
 
+        Fields missing in the model columns are ignored. The row is updated
+        with one UPDATE ... RETURNING which also refreshes the object.
+
         Args:
             db: SQLAlchemy session
             obj_db: SQLAlchemy model class
@@ -98,34 +186,126 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         Returns:
             SQLAlchemy model instance
         """
-        obj_data = jsonable_encoder(obj_db)
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            update_data = obj_in.dict(exclude_defaults=True)
-
-        for field in update_data:
-            if field in obj_data:
-                setattr(obj_db, field, update_data[field])
+        update_data = self.get_update_data(obj_in)
+        if not update_data:
+            return obj_db
 
-        db.add(obj_db)
+        res = await db.scalars(
+            update(self.model)
+            .filter(self.model.id == obj_db.id)
+            .values(**update_data)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        obj_db = res.one()
         await db.commit()
-        await db.refresh(obj_db)
         return obj_db
 
-    async def remove(self, db: Session, *, id: int) -> ModelType:
+    async def remove(self, db: Session, *, id: int) -> Optional[ModelType]:
         """
-        Remove object by id.
+        Remove object by id with one DELETE ... RETURNING.
 
         Args:
             db: SQLAlchemy session
             id: object id
 
         Returns:
-            SQLAlchemy model instance
+            removed SQLAlchemy model instance or None if it doesn't exist
         """
-        res = await db.execute(select(self.model).filter(self.model.id == id))
-        found_obj = res.scalar_one_or_none()
-        await db.delete(found_obj)
+        res = await db.scalars(
+            delete(self.model).filter(self.model.id == id).returning(self.model)
+        )
+        obj_db = res.one_or_none()
         await db.commit()
-        return found_obj
+        return obj_db
+
+    async def create_many(
+        self, db: Session, *, objs_in: List[CreateSchemaType]
+    ) -> List[ModelType]:
+        """
+        Create multiple objects with one multi-row INSERT ... RETURNING.
+
+        Args:
+            db: SQLAlchemy session
+            objs_in: list of pydantic create schema type
+
+        Returns:
+            list of SQLAlchemy model instances, order is not guaranteed
+        """
+        if not objs_in:
+            return []
+        res = await db.scalars(
+            insert(self.model).returning(self.model),
+            [jsonable_encoder(obj_in) for obj_in in objs_in],
+        )
+        objs_db = res.all()
+        await db.commit()
+        return objs_db
+
+    async def update_many(
+        self,
+        db: Session,
+        *,
+        ids: List[Any],
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+    ) -> List[ModelType]:
+        """
+        Update multiple objects with one UPDATE ... RETURNING.
+
+        Args:
+            db: SQLAlchemy session
+            ids: ids of objects to update
+            obj_in: pydantic update schema type or dict of values, values
+                    may be SQL expressions
+
+        Returns:
+            list of updated SQLAlchemy model instances
+        """
+        update_data = self.get_update_data(obj_in)
+        if not ids:
+            return []
+        if not update_data:
+            res = await db.scalars(select(self.model).filter(self.model.id.in_(ids)))
+            return res.all()
+
+        res = await db.scalars(
+            update(self.model)
+            .filter(self.model.id.in_(ids))
+            .values(**update_data)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        objs_db = res.all()
+        await db.commit()
+        return objs_db
+
+    async def remove_many(
+        self, db: Session, *, ids: List[Any], batch_size: int = 1000
+    ) -> List[ModelType]:
+        """
+        Remove multiple objects with DELETE ... RETURNING per batch of ids.
+
+        Batches keep the IN list under driver bind parameter limits, all of
+        them are committed in one transaction.
+
+        Args:
+            db: SQLAlchemy session
+            ids: ids of objects to remove
+            batch_size: max number of ids in one statement
+
+        Returns:
+            list of removed SQLAlchemy model instances
+        """
+        if not ids:
+            return []
+        objs_db = []
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            res = await db.scalars(
+                delete(self.model)
+                .filter(self.model.id.in_(ids[start:end]))
+                .returning(self.model)
+            )
+            objs_db.extend(res.all())
+        await db.commit()
+        return objs_db
@@ -1,15 +1,30 @@
 """
 User CRUD methods.
 """
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+from fastapi import BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import case, insert, or_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 
-from app.core.security import verify_password, get_password_hash
+from app.core.security import (
+    check_password,
+    dummy_password_hash,
+    hash_password,
+    hash_passwords,
+    password_needs_rehash,
+)
 from app.crud.base import CRUDBase
+from app.db.snapshots import user_snapshots
 from app.models import User
-from app.schemas import UserCreate, UserUpdate
+from app.schemas import UserCreate, UserSnapshot, UserUpdate
+
+# INSERT constructs supporting ON CONFLICT DO NOTHING by dialect name
+ON_CONFLICT_INSERTS = {"postgresql": pg_insert}
 
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
@@ -49,6 +64,30 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         found_user = res.scalar_one_or_none()
         return found_user
 
+    async def get_by_login(self, db: Session, *, login: str) -> Optional[User]:
+        """
+        Get user by email or username with one query.
+
+        Login is matched against both unique indexed columns in one
+        statement. Usernames stored before they were validated may still
+        contain "@", so a login can match one user's email and another
+        user's username; the email match wins then.
+
+        Args:
+            db: SQLAlchemy session
+            login: user email or username string
+
+        Returns:
+            optionally User model instance
+        """
+        res = await db.scalars(
+            select(self.model)
+            .filter(or_(self.model.email == login, self.model.username == login))
+            .order_by(case((self.model.email == login, 0), else_=1))
+            .limit(1)
+        )
+        return res.first()
+
     async def create(self, db: Session, *, obj_in: UserCreate) -> User:
         """
         Create user.
@@ -60,7 +99,7 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         Returns:
             User model instance
         """
-        obj_in.password = get_password_hash(obj_in.password)
+        obj_in.password = await hash_password(obj_in.password)
         user_db = await super().create(db, obj_in=obj_in)
         return user_db
 
@@ -77,13 +116,233 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             User model instance
         """
         if obj_in.password is not None:
-            obj_in.password = get_password_hash(obj_in.password)
+            obj_in.password = await hash_password(obj_in.password)
 
         obj_db = await super().update(db, obj_db=obj_db, obj_in=obj_in)
+        await user_snapshots.bump(obj_db.id)
         return obj_db
 
+    async def create_unique(
+        self, db: Session, *, obj_in: UserCreate
+    ) -> Tuple[Optional[User], Optional[str]]:
+        """
+        Create user unless its email or username is taken, with one statement.
+
+        On PostgreSQL ``INSERT ... ON CONFLICT DO NOTHING RETURNING`` is used,
+        other databases map IntegrityError of a plain INSERT. Only when the
+        insert conflicts the taken column is looked up, so concurrent
+        registrations can't both succeed.
+
+        Args:
+            db: SQLAlchemy session
+            obj_in: user create schema
+
+        Returns:
+            created User model instance and None if success,
+            None and name of the conflicting column otherwise (the name is
+            None if the conflicting user has been removed in the meantime)
+        """
+        obj_in.password = await hash_password(obj_in.password)
+        values = jsonable_encoder(obj_in)
+        on_conflict_insert = ON_CONFLICT_INSERTS.get(db.get_bind().dialect.name)
+        if on_conflict_insert is not None:
+            res = await db.scalars(
+                on_conflict_insert(self.model)
+                .values(**values)
+                .on_conflict_do_nothing()
+                .returning(self.model)
+            )
+            user_db = res.one_or_none()
+        else:
+            try:
+                res = await db.scalars(
+                    insert(self.model).values(**values).returning(self.model)
+                )
+                user_db = res.one()
+            except IntegrityError:
+                await db.rollback()
+                conflict = await self.get_conflict(db, obj_in=obj_in)
+                if conflict is None:
+                    raise
+                return None, conflict
+
+        if user_db is None:
+            return None, await self.get_conflict(db, obj_in=obj_in)
+        await db.commit()
+        return user_db, None
+
+    async def get_conflict(self, db: Session, *, obj_in: UserCreate) -> Optional[str]:
+        """
+        Find which unique column of the user data is already taken.
+
+        Args:
+            db: SQLAlchemy session
+            obj_in: user create schema
+
+        Returns:
+            "email" or "username" if it's taken, None otherwise
+        """
+        res = await db.execute(
+            select(self.model.email, self.model.username)
+            .filter(
+                or_(
+                    self.model.email == obj_in.email,
+                    self.model.username == obj_in.username,
+                )
+            )
+            .limit(1)
+        )
+        found = res.one_or_none()
+        if found is None:
+            return None
+        if obj_in.email is not None and found.email == obj_in.email:
+            return "email"
+        return "username"
+
+    async def create_many(
+        self, db: Session, *, objs_in: List[UserCreate]
+    ) -> List[User]:
+        """
+        Create multiple users with one statement.
+
+        Passwords are hashed concurrently in the hashing pool.
+
+        Args:
+            db: SQLAlchemy session
+            objs_in: list of user create schemas
+
+        Returns:
+            list of User model instances
+        """
+        hashes = await hash_passwords([obj_in.password for obj_in in objs_in])
+        for obj_in, password_hash in zip(objs_in, hashes):
+            obj_in.password = password_hash
+        users_db = await super().create_many(db, objs_in=objs_in)
+        return users_db
+
+    async def update_many(
+        self, db: Session, *, ids: List[int], obj_in: Union[UserUpdate, Dict[str, Any]]
+    ) -> List[User]:
+        """
+        Update multiple users with one statement.
+
+        Every user gets its own password hash (with its own salt).
+
+        Args:
+            db: SQLAlchemy session
+            ids: ids of users to update
+            obj_in: user update data
+
+        Returns:
+            list of User model instances
+        """
+        if isinstance(obj_in, dict):
+            update_data = dict(obj_in)
+        else:
+            update_data = obj_in.dict(exclude_defaults=True)
+        password = update_data.get("password")
+        if password is not None and ids:
+            hashes = await hash_passwords([password] * len(ids))
+            update_data["password"] = case(dict(zip(ids, hashes)), value=self.model.id)
+        users_db = await super().update_many(db, ids=ids, obj_in=update_data)
+        await user_snapshots.bump(*(user.id for user in users_db))
+        return users_db
+
+    async def remove(self, db: Session, *, id: int) -> Optional[User]:
+        """
+        Remove user by id.
+
+        Args:
+            db: SQLAlchemy session
+            id: user id
+
+        Returns:
+            removed User model instance or None if it doesn't exist
+        """
+        user_db = await super().remove(db, id=id)
+        await user_snapshots.bump(id)
+        return user_db
+
+    async def remove_many(
+        self, db: Session, *, ids: List[int], batch_size: int = 1000
+    ) -> List[User]:
+        """
+        Remove multiple users.
+
+        Args:
+            db: SQLAlchemy session
+            ids: ids of users to remove
+            batch_size: max number of ids in one statement
+
+        Returns:
+            list of removed User model instances
+        """
+        users_db = await super().remove_many(db, ids=ids, batch_size=batch_size)
+        await user_snapshots.bump(*(user.id for user in users_db))
+        return users_db
+
+    async def authenticate(
+        self,
+        db: Session,
+        *,
+        login: str,
+        password: str,
+        background_tasks: Optional[BackgroundTasks] = None,
+    ) -> Optional[User]:
+        """
+        Authenticate user by email or username with one query and one verify.
+
+        Args:
+            db: SQLAlchemy session
+            login: user email or username string
+            password: password
+            background_tasks: tasks to rehash outdated password hash in
+
+        Returns:
+            user if auth is success, None otherwise
+        """
+        user = await self.get_by_login(db, login=login)
+        return await self.check_login_password(
+            db, user=user, password=password, background_tasks=background_tasks
+        )
+
+    async def check_login_password(
+        self,
+        db: Session,
+        *,
+        user: Optional[User],
+        password: str,
+        background_tasks: Optional[BackgroundTasks] = None,
+    ) -> Optional[User]:
+        """
+        Check password of user found by login.
+
+        If no user is found the password is verified against a dummy hash, so
+        response time doesn't tell whether the user exists.
+
+        Args:
+            db: SQLAlchemy session
+            user: user found by login or None
+            password: password
+            background_tasks: tasks to rehash outdated password hash in
+
+        Returns:
+            user if password is correct, None otherwise
+        """
+        if not user:
+            await check_password(password, dummy_password_hash())
+            return None
+        return await self.check_user_password(
+            db, user=user, password=password, background_tasks=background_tasks
+        )
+
     async def authenticate_by_email(
-        self, db: Session, *, email: str, password: str
+        self,
+        db: Session,
+        *,
+        email: str,
+        password: str,
+        background_tasks: Optional[BackgroundTasks] = None,
     ) -> Optional[User]:
         """
         Authenticate user by email.
@@ -92,19 +351,23 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             db: SQLAlchemy session
             email: user email string
             password: password
+            background_tasks: tasks to rehash outdated password hash in
 
         Returns:
             user if auth is success, None otherwise
         """
         user = await self.get_by_email(db, email=email)
-        if not user:
-            return None
-        if not verify_password(password, user.password):
-            return None
-        return user
+        return await self.check_user_password(
+            db, user=user, password=password, background_tasks=background_tasks
+        )
 
     async def authenticate_by_username(
-        self, db: Session, *, username: str, password: str
+        self,
+        db: Session,
+        *,
+        username: str,
+        password: str,
+        background_tasks: Optional[BackgroundTasks] = None,
     ) -> Optional[User]:
         """
         Authenticate user by email.
@@ -113,19 +376,71 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             db: SQLAlchemy session
             username: user email string
             password: password
+            background_tasks: tasks to rehash outdated password hash in
 
         Returns:
             user if auth is success, None otherwise
         """
         user = await self.get_by_username(db, username=username)
+        return await self.check_user_password(
+            db, user=user, password=password, background_tasks=background_tasks
+        )
+
+    async def check_user_password(
+        self,
+        db: Session,
+        *,
+        user: Optional[User],
+        password: str,
+        background_tasks: Optional[BackgroundTasks] = None,
+    ) -> Optional[User]:
+        """
+        Check user password, schedule rehash if its hash is out of policy.
+
+        Args:
+            db: SQLAlchemy session
+            user: found user or None
+            password: password
+            background_tasks: tasks to rehash outdated password hash in
+
+        Returns:
+            user if password is correct, None otherwise
+        """
         if not user:
             return None
-        if not verify_password(password, user.password):
+        if not await check_password(password, user.password):
             return None
+        if background_tasks is not None and password_needs_rehash(user.password):
+            background_tasks.add_task(
+                self.rehash_password, db, user=user, password=password
+            )
         return user
 
+    async def rehash_password(self, db: Session, *, user: User, password: str) -> None:
+        """
+        Hash password with current policy unless it has been changed meanwhile.
+
+        It runs after the response is sent, so it waits for a hashing slot
+        instead of being rejected.
+
+        Args:
+            db: SQLAlchemy session
+            user: authenticated user
+            password: verified plain password
+
+        Returns:
+            None
+        """
+        password_hash = await hash_password(password, admit=False)
+        await db.execute(
+            update(self.model)
+            .filter(self.model.id == user.id, self.model.password == user.password)
+            .values(password=password_hash)
+        )
+        await db.commit()
+
     @staticmethod
-    def is_active(usr: User) -> bool:
+    def is_active(usr: Union[User, UserSnapshot]) -> bool:
         """
         Check if user is active.
 
@@ -138,7 +453,7 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         return usr.is_active
 
     @staticmethod
-    def is_superuser(usr: User) -> bool:
+    def is_superuser(usr: Union[User, UserSnapshot]) -> bool:
         """
         Check if user is superuser.
 
@@ -9,7 +9,7 @@ from fastapi import FastAPI
 
 from app import crud, schemas
 from app.core.config import settings
-from app.db.session import session
+from app.db.session import async_session, engine, replica_engines, use_primary
 
 
 async def app_init_db(app: FastAPI) -> None:
@@ -22,36 +22,45 @@ async def app_init_db(app: FastAPI) -> None:
     Returns:
         None
     """
-    app.state.db = session
-
-    if settings.FIRST_SUPERUSER_EMAIL:
-        user = await crud.user.get_by_email(
-            session, email=settings.FIRST_SUPERUSER_EMAIL
-        )
-    else:
-        user = await crud.user.get_by_username(
-            session, username=settings.FIRST_SUPERUSER
-        )
-
-    if not user:
-        user_in = schemas.UserCreate(
-            username=settings.FIRST_SUPERUSER,
-            email=settings.FIRST_SUPERUSER_EMAIL,
-            password=settings.FIRST_SUPERUSER_PASSWORD,
-            is_superuser=True,
-        )
-        await crud.user.create(session, obj_in=user_in)
+    app.state.async_session = async_session
+    app.state.db_engines = [engine, *replica_engines]
+
+    async with async_session() as session:
+        use_primary(session.sync_session)
+        if settings.FIRST_SUPERUSER_EMAIL:
+            user = await crud.user.get_by_email(
+                session, email=settings.FIRST_SUPERUSER_EMAIL
+            )
+        else:
+            user = await crud.user.get_by_username(
+                session, username=settings.FIRST_SUPERUSER
+            )
+
+        if not user:
+            user_in = schemas.UserCreate(
+                username=settings.FIRST_SUPERUSER,
+                email=settings.FIRST_SUPERUSER_EMAIL,
+                password=settings.FIRST_SUPERUSER_PASSWORD,
+                is_superuser=True,
+            )
+            await crud.user.create(session, obj_in=user_in)
 
 
 async def app_dispose_db(app: FastAPI) -> None:
     """
     Dispose db-connection.
 
+    Sessions are request-scoped and closed by the ``get_db`` dependency,
+    so only connection pools of the primary and replica engines are left
+    to close.
+
     Args:
         app: FastAPI application.
 
     Returns:
         None
     """
-    session = app.state.db
-    await session.close()
+    app.state.async_session = None
+    for db_engine in app.state.db_engines:
+        await db_engine.dispose()
+    app.state.db_engines = []
@@ -0,0 +1,215 @@
+"""
+Failed login counters.
+
+Attrs:
+    login_failures: per-account failure counters with exponential lockout.
+"""
+import time
+from typing import Dict, Optional
+
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
+
+KEY_PREFIX = "lf:"
+USER_PREFIX = "user:"
+LOGIN_PREFIX = "login:"
+
+# KEYS: account counter
+# ARGV: current time, threshold, base delay, max delay, window seconds
+# returns seconds the account is locked for, 0 if it isn't locked
+FAILURE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local threshold = tonumber(ARGV[2])
+local failures = redis.call("HINCRBY", KEYS[1], "n", 1)
+local delay = 0
+if failures >= threshold then
+    local base = tonumber(ARGV[3])
+    delay = math.min(tonumber(ARGV[4]), base * 2 ^ (failures - threshold))
+    redis.call("HSET", KEYS[1], "until", now + delay)
+end
+redis.call("EXPIRE", KEYS[1], math.ceil(math.max(delay, tonumber(ARGV[5]))))
+return math.ceil(delay)
+"""
+
+
+class LoginFailures:
+    """
+    Failed login attempts per account.
+
+    Attempts with email and username of a user share one counter. Logins that
+    don't match any user are counted too, so lockouts don't tell whether an
+    account exists. After ``threshold`` failures in a row the account is
+    locked for ``base`` seconds, every next failure doubles the lockout up to
+    ``max_delay``. Counters are forgotten ``window`` seconds after the last
+    failure or on successful login. Redis errors don't block logins, rate
+    limits still apply then.
+    """
+
+    def __init__(self) -> None:
+        self.redis: Optional[Redis] = None
+        self.failure_script: Optional[AsyncScript] = None
+        self.threshold = 0
+        self.base = 0
+        self.max_delay = 0
+        self.window = 0
+        self.locked = 0
+        self.failures = 0
+        self.errors = 0
+
+    def start(
+        self, redis: Redis, threshold: int, base: int, max_delay: int, window: int
+    ) -> None:
+        """
+        Start using redis.
+
+        Args:
+            redis: redis database connection
+            threshold: failures before the first lockout, 0 disables lockouts
+            base: first lockout seconds
+            max_delay: max lockout seconds
+            window: seconds to keep counter after the last failure
+
+        Returns:
+            None
+        """
+        self.redis = redis
+        self.failure_script = redis.register_script(FAILURE_SCRIPT)
+        self.threshold = threshold
+        self.base = base
+        self.max_delay = max_delay
+        self.window = window
+
+    def stop(self) -> None:
+        """
+        Stop using redis.
+
+        Returns:
+            None
+        """
+        self.redis = None
+
+    @staticmethod
+    def account(login: str, user_id: Optional[int] = None) -> str:
+        """
+        Get account counted for login attempt.
+
+        Args:
+            login: submitted username or email
+            user_id: id of user found by login, None if there is no such user
+
+        Returns:
+            user id if user is found, normalized login otherwise
+        """
+        if user_id is not None:
+            return f"{USER_PREFIX}{user_id}"
+        return f"{LOGIN_PREFIX}{login.lower()}"
+
+    @staticmethod
+    def key(account: str) -> str:
+        """
+        Get redis key of account counter.
+
+        Args:
+            account: account from ``account``
+
+        Returns:
+            redis key
+        """
+        return f"{KEY_PREFIX}{account}"
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Check if lockouts are configured and redis is available.
+
+        Returns:
+            True if counters are used
+        """
+        return self.redis is not None and self.threshold > 0
+
+    async def locked_for(self, account: str) -> float:
+        """
+        Get remaining lockout of account.
+
+        Args:
+            account: account from ``account``
+
+        Returns:
+            seconds the account is locked for, 0 if it isn't locked
+        """
+        if not self.enabled:
+            return 0.0
+        try:
+            until = await self.redis.hget(self.key(account), "until")
+        except RedisError:
+            self.errors += 1
+            return 0.0
+        wait = float(until) - time.time() if until is not None else 0.0
+        if wait > 0:
+            self.locked += 1
+            return wait
+        return 0.0
+
+    async def fail(self, account: str) -> float:
+        """
+        Count failed login attempt.
+
+        Args:
+            account: account from ``account``
+
+        Returns:
+            seconds the account is locked for after this failure
+        """
+        if not self.enabled:
+            return 0.0
+        self.failures += 1
+        try:
+            return float(
+                await self.failure_script(
+                    keys=[self.key(account)],
+                    args=[
+                        time.time(),
+                        self.threshold,
+                        self.base,
+                        self.max_delay,
+                        self.window,
+                    ],
+                )
+            )
+        except RedisError:
+            self.errors += 1
+            return 0.0
+
+    async def reset(self, account: str) -> None:
+        """
+        Forget failures of account after successful attempt.
+
+        Args:
+            account: account from ``account``
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+        try:
+            await self.redis.delete(self.key(account))
+        except RedisError:
+            self.errors += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        """
+        Return counters.
+
+        Returns:
+            dict with locked attempts, failures and redis errors
+        """
+        return {
+            "locked": self.locked,
+            "failures": self.failures,
+            "errors": self.errors,
+        }
+
+
+login_failures = LoginFailures()
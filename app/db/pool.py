@@ -0,0 +1,265 @@
+"""
+Database connection pool sizing and instrumentation.
+
+Attrs:
+    Histogram: cumulative histogram of observed values.
+    PoolMetrics: connection pool telemetry collected from SQLAlchemy pool events.
+    InstrumentedAsyncQueuePool: async queue pool measuring checkout wait time.
+    compute_pool_size: size pool from the server connections budget.
+"""
+import time
+from typing import Any, Dict, Sequence, Tuple, Type
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, PoolProxiedConnection
+from sqlalchemy.pool import ConnectionPoolEntry
+
+# checkout wait time buckets upper bounds, milliseconds
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values.
+    """
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        """
+        Histogram with fixed buckets.
+
+        Args:
+            buckets: sorted upper bounds of buckets
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Add value to the histogram.
+
+        Args:
+            value: observed value
+
+        Returns:
+            None
+        """
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self) -> dict:
+        """
+        Histogram representation with cumulative bucket counters.
+
+        Returns:
+            dict with buckets, total count and sum of values
+        """
+        buckets, total = {}, 0
+        for bound, count in zip((*self.buckets, "inf"), self.counts):
+            total += count
+            buckets[f"le_{bound}"] = total
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+class PoolMetrics:
+    """
+    Connection pool telemetry collected from SQLAlchemy pool events.
+    """
+
+    def __init__(self) -> None:
+        """
+        Pool metrics with zero counters.
+        """
+        self.connects = 0
+        self.recycled = 0
+        self.invalidated = 0
+        self.checkouts = 0
+        self.checkout_wait_ms = Histogram(WAIT_BUCKETS_MS)
+
+    def attach(self, engine: AsyncEngine) -> None:
+        """
+        Listen pool events of the engine.
+
+        Args:
+            engine: async engine to collect metrics of
+
+        Returns:
+            None
+        """
+        event.listen(engine.sync_engine, "connect", self.on_connect)
+        event.listen(engine.sync_engine, "checkout", self.on_checkout)
+        event.listen(engine.sync_engine, "invalidate", self.on_invalidate)
+
+    def on_connect(self, dbapi_connection: Any, record: ConnectionPoolEntry) -> None:
+        """
+        Count new DBAPI connection, reconnect of a pool entry is a recycle.
+
+        Args:
+            dbapi_connection: DBAPI connection
+            record: pool entry of the connection
+
+        Returns:
+            None
+        """
+        self.connects += 1
+        if record.record_info.get("connected"):
+            self.recycled += 1
+        record.record_info["connected"] = True
+
+    def on_checkout(
+        self,
+        dbapi_connection: Any,
+        record: ConnectionPoolEntry,
+        proxy: PoolProxiedConnection,
+    ) -> None:
+        """
+        Count connection checkout.
+
+        Args:
+            dbapi_connection: DBAPI connection
+            record: pool entry of the connection
+            proxy: proxied connection
+
+        Returns:
+            None
+        """
+        self.checkouts += 1
+
+    def on_invalidate(
+        self, dbapi_connection: Any, record: ConnectionPoolEntry, exception: Any
+    ) -> None:
+        """
+        Count invalidated connection.
+
+        Args:
+            dbapi_connection: DBAPI connection
+            record: pool entry of the connection
+            exception: exception caused invalidation if any
+
+        Returns:
+            None
+        """
+        self.invalidated += 1
+
+    def as_dict(self, pool: Pool) -> dict:
+        """
+        Pool state and collected metrics.
+
+        Args:
+            pool: connection pool
+
+        Returns:
+            dict of pool metrics
+        """
+        state = {
+            name: getattr(pool, name)()
+            for name in ("size", "checkedin", "checkedout", "overflow")
+            if hasattr(pool, name)
+        }
+        return {
+            **state,
+            "connects": self.connects,
+            "recycled": self.recycled,
+            "invalidated": self.invalidated,
+            "checkouts": self.checkouts,
+            "checkout_wait_ms": self.checkout_wait_ms.as_dict(),
+        }
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Async queue pool measuring how long checkouts wait for a connection.
+    """
+
+    metrics: PoolMetrics
+
+    def connect(self) -> PoolProxiedConnection:
+        """
+        Check connection out of the pool.
+
+        Returns:
+            proxied DBAPI connection
+        """
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.metrics.checkout_wait_ms.observe(
+                (time.perf_counter() - started) * 1000
+            )
+
+
+def instrumented_pool_class(metrics: PoolMetrics) -> Type[InstrumentedAsyncQueuePool]:
+    """
+    Build pool class reporting to the metrics.
+
+    Pool is recreated by its class on engine dispose, so metrics are bound to
+    the class rather than to the pool instance.
+
+    Args:
+        metrics: pool metrics to report checkout wait time to
+
+    Returns:
+        pool class
+    """
+    return type(
+        InstrumentedAsyncQueuePool.__name__,
+        (InstrumentedAsyncQueuePool,),
+        {"metrics": metrics},
+    )
+
+
+def compute_pool_size(
+    max_connections: int, reserved_connections: int, workers: int
+) -> Tuple[int, int]:
+    """
+    Split the database server connections budget between server workers.
+
+    Every worker process has its own pool, so pools of all workers together
+    must fit into ``max_connections`` of the server minus reserved ones.
+    A fifth of the worker budget is left for overflow connections.
+
+    Args:
+        max_connections: max_connections setting of the database server
+        reserved_connections: connections kept for admin tools and migrations
+        workers: number of server worker processes
+
+    Returns:
+        pool size and max overflow of one worker pool
+    """
+    budget = max(1, (max_connections - reserved_connections) // max(1, workers))
+    max_overflow = budget // 5
+    return budget - max_overflow, max_overflow
+
+
+def get_pool_options(settings: Any) -> Dict[str, int]:
+    """
+    Pool size options from settings.
+
+    Args:
+        settings: application settings
+
+    Returns:
+        dict of pool_size, max_overflow and pool_recycle engine options
+    """
+    pool_size = settings.SQLALCHEMY_POOL_SIZE
+    max_overflow = settings.SQLALCHEMY_MAX_OVERFLOW
+    if settings.SQLALCHEMY_POOL_AUTOSIZE:
+        pool_size, max_overflow = compute_pool_size(
+            settings.SQLALCHEMY_SERVER_MAX_CONNECTIONS,
+            settings.SQLALCHEMY_RESERVED_CONNECTIONS,
+            settings.SERVER_WORKERS,
+        )
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_recycle": settings.SQLALCHEMY_POOL_RECYCLE,
+    }
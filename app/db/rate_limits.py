@@ -0,0 +1,240 @@
+"""
+Request rate limits.
+
+Attrs:
+    rate_limiter: token buckets in redis with in-process fallback.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
+
+KEY_PREFIX = "rl:"
+
+# all buckets are refilled, a token is taken from each only if all of them
+# have one, so rejected requests don't drain buckets of other keys
+# KEYS: buckets
+# ARGV: current time, then rate per second and burst of every bucket
+# returns milliseconds to wait, 0 if request is allowed
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local burst = tonumber(ARGV[i * 2 + 1])
+    local bucket = redis.call("HMGET", key, "t", "ts")
+    local available = tonumber(bucket[1]) or burst
+    local updated_at = tonumber(bucket[2]) or now
+    available = math.min(burst, available + math.max(0, now - updated_at) * rate)
+    if available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local burst = tonumber(ARGV[i * 2 + 1])
+    local available = tokens[i]
+    if wait == 0 then
+        available = available - 1
+    end
+    redis.call("HSET", key, "t", available, "ts", now)
+    redis.call("EXPIRE", key, math.ceil(burst / rate))
+end
+return math.ceil(wait * 1000)
+"""
+
+
+class Limit:
+    """
+    Token bucket parameters.
+    """
+
+    def __init__(self, name: str, per_minute: float, burst: int) -> None:
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = burst
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Check if limit is enabled.
+
+        Returns:
+            True if both burst and rate are positive
+        """
+        return self.burst > 0 and self.rate > 0
+
+    def key(self, value: str) -> str:
+        """
+        Get bucket key of limited value.
+
+        Args:
+            value: limited value, e.g. client address
+
+        Returns:
+            redis key
+        """
+        return f"{KEY_PREFIX}{self.name}:{value}"
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter shared by all processes through redis.
+
+    One script call checks all buckets of a request. If redis errors or
+    doesn't answer in ``timeout`` seconds, buckets in process memory are used
+    for ``fallback`` seconds, so slow redis doesn't slow down rejections.
+    """
+
+    def __init__(self) -> None:
+        self.redis: Optional[Redis] = None
+        self.acquire_script: Optional[AsyncScript] = None
+        self.timeout = 0.0
+        self.fallback = 0.0
+        self.fallback_until = 0.0
+        self.local_size = 0
+        self.local: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+        self.fallbacks = 0
+        self.errors = 0
+
+    def start(
+        self, redis: Redis, timeout: float, fallback: float, local_size: int
+    ) -> None:
+        """
+        Start using redis.
+
+        Args:
+            redis: redis database connection
+            timeout: seconds to wait for redis
+            fallback: seconds to use in-process buckets after redis failure
+            local_size: max number of in-process buckets
+
+        Returns:
+            None
+        """
+        self.redis = redis
+        self.acquire_script = redis.register_script(ACQUIRE_SCRIPT)
+        self.timeout = timeout
+        self.fallback = fallback
+        self.fallback_until = 0.0
+        self.local_size = local_size
+        self.local.clear()
+
+    def stop(self) -> None:
+        """
+        Stop using redis.
+
+        Returns:
+            None
+        """
+        self.redis = None
+
+    async def acquire(self, buckets: Sequence[Tuple[Limit, str]]) -> float:
+        """
+        Take a token from every bucket of request.
+
+        Args:
+            buckets: limits and limited values, limits with zero burst or
+                rate are skipped
+
+        Returns:
+            seconds to wait before retry, 0 if request is allowed
+        """
+        buckets = [(limit, value) for limit, value in buckets if limit.enabled]
+        if not buckets:
+            return 0.0
+        wait = None
+        if self.redis is not None and time.monotonic() >= self.fallback_until:
+            wait = await self.acquire_redis(buckets)
+        if wait is None:
+            self.fallbacks += 1
+            wait = self.acquire_local(buckets)
+        if wait > 0:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    async def acquire_redis(self, buckets: List[Tuple[Limit, str]]) -> Optional[float]:
+        """
+        Take tokens from redis buckets.
+
+        The call is shielded from the timeout, so a late reply is still read
+        from the connection instead of being left for the next command.
+
+        Args:
+            buckets: limits and limited values
+
+        Returns:
+            seconds to wait, None if redis failed or timed out
+        """
+        args: List[float] = [time.time()]
+        for limit, _ in buckets:
+            args += [limit.rate, limit.burst]
+        call = asyncio.ensure_future(
+            self.acquire_script(
+                keys=[limit.key(value) for limit, value in buckets], args=args
+            )
+        )
+        try:
+            wait_ms = await asyncio.wait_for(asyncio.shield(call), self.timeout)
+        except (RedisError, asyncio.TimeoutError):
+            self.errors += 1
+            self.fallback_until = time.monotonic() + self.fallback
+            return None
+        return int(wait_ms) / 1000
+
+    def acquire_local(self, buckets: List[Tuple[Limit, str]]) -> float:
+        """
+        Take tokens from in-process buckets, the same way the script does.
+
+        Args:
+            buckets: limits and limited values
+
+        Returns:
+            seconds to wait
+        """
+        now = time.monotonic()
+        tokens = []
+        wait = 0.0
+        for limit, value in buckets:
+            available, updated_at = self.local.get(limit.key(value), (limit.burst, now))
+            available = min(
+                limit.burst, available + max(0.0, now - updated_at) * limit.rate
+            )
+            if available < 1:
+                wait = max(wait, (1 - available) / limit.rate)
+            tokens.append(available)
+        for (limit, value), available in zip(buckets, tokens):
+            key = limit.key(value)
+            self.local[key] = (available - 1 if wait == 0 else available, now)
+            self.local.move_to_end(key)
+        while len(self.local) > self.local_size:
+            self.local.popitem(last=False)
+        return wait
+
+    def as_dict(self) -> Dict[str, int]:
+        """
+        Return limiter counters.
+
+        Returns:
+            dict with allowed, rejected and redis failure counters
+        """
+        return {
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "fallbacks": self.fallbacks,
+            "errors": self.errors,
+            "local_size": len(self.local),
+        }
+
+
+rate_limiter = RateLimiter()
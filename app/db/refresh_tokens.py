@@ -0,0 +1,243 @@
+"""
+Refresh tokens store.
+
+Attrs:
+    store_refresh_token: saves refresh token of a new session.
+    rotate_refresh_token: replaces used refresh token with a new one.
+    revoke_refresh_token: deletes refresh token.
+    list_sessions: returns live sessions of user.
+    revoke_session: deletes refresh token by its digest.
+    revoke_sessions: deletes all refresh tokens of user.
+
+Every refresh token is saved under a short binary digest of its jti with user
+id as value, ids of live tokens are kept in per-user sorted set scored by
+expiration time. Expired members of the set are trimmed when the set is
+written or listed.
+"""
+import time
+from datetime import timedelta
+from typing import Dict, List, Tuple, Union
+from weakref import WeakKeyDictionary
+
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
+from app.utils.digest import jti_digest
+
+TOKEN_KEY_PREFIX = b"rt:"
+USER_KEY_PREFIX = "ru:"
+
+# KEYS: used token, user index, new token
+# ARGV: user id, used digest, new digest, lifetime seconds, new expiration time,
+#       current time
+ROTATE_SCRIPT = """
+if redis.call("GET", KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call("DEL", KEYS[1])
+redis.call("ZREM", KEYS[2], ARGV[2])
+redis.call("ZREMRANGEBYSCORE", KEYS[2], "-inf", ARGV[6])
+redis.call("SET", KEYS[3], ARGV[1], "EX", ARGV[4])
+redis.call("ZADD", KEYS[2], ARGV[5], ARGV[3])
+redis.call("EXPIRE", KEYS[2], ARGV[4])
+return 1
+"""
+
+# token keys are built from the set members inside the script, so all keys of
+# a user must live on one redis node
+# KEYS: user index
+# ARGV: token key prefix
+REVOKE_ALL_SCRIPT = """
+local digests = redis.call("ZRANGE", KEYS[1], 0, -1)
+for _, digest in ipairs(digests) do
+    redis.call("DEL", ARGV[1] .. digest)
+end
+redis.call("DEL", KEYS[1])
+return digests
+"""
+
+# scripts registered on every redis client, so their digests are computed once
+_scripts: "WeakKeyDictionary[Redis, Dict[str, AsyncScript]]" = WeakKeyDictionary()
+
+
+def registered_script(redis: Redis, script: str) -> AsyncScript:
+    """
+    Get script registered on redis client, registering it on first use.
+
+    Args:
+        redis: redis database connection
+        script: Lua script source
+
+    Returns:
+        callable script
+    """
+    scripts = _scripts.setdefault(redis, {})
+    if script not in scripts:
+        scripts[script] = redis.register_script(script)
+    return scripts[script]
+
+
+def token_key(digest: bytes) -> bytes:
+    """
+    Get redis key of token.
+
+    Args:
+        digest: token id digest
+
+    Returns:
+        redis key
+    """
+    return TOKEN_KEY_PREFIX + digest
+
+
+def user_key(user_id: Union[int, str]) -> str:
+    """
+    Get redis key of user sessions index.
+
+    Args:
+        user_id: user id
+
+    Returns:
+        redis key
+    """
+    return f"{USER_KEY_PREFIX}{user_id}"
+
+
+def add_to_pipeline(pipe: Redis, user_id: int, jti: str, expire: timedelta) -> None:
+    """
+    Queue commands saving token and adding it to user index.
+
+    All sessions live equally long, so the index expires with the last one.
+
+    Args:
+        pipe: redis pipeline
+        user_id: user id
+        jti: token id
+        expire: token lifetime
+
+    Returns:
+        None
+    """
+    digest = jti_digest(jti)
+    pipe.set(token_key(digest), user_id, ex=expire)
+    pipe.zremrangebyscore(user_key(user_id), "-inf", time.time())
+    pipe.zadd(user_key(user_id), {digest: time.time() + expire.total_seconds()})
+    pipe.expire(user_key(user_id), expire)
+
+
+async def store_refresh_token(
+    redis: Redis, *, user_id: int, jti: str, expire: timedelta
+) -> None:
+    """
+    Save refresh token of a new session.
+
+    Args:
+        redis: redis database connection
+        user_id: user id
+        jti: token id
+        expire: token lifetime
+
+    Returns:
+        None
+    """
+    async with redis.pipeline(transaction=True) as pipe:
+        add_to_pipeline(pipe, user_id, jti, expire)
+        await pipe.execute()
+
+
+async def rotate_refresh_token(
+    redis: Redis, *, user_id: int, jti: str, new_jti: str, expire: timedelta
+) -> bool:
+    """
+    Replace used refresh token with a new one.
+
+    The check and the replacement run in one server-side script, so a token
+    can be used only once even by concurrent requests.
+
+    Args:
+        redis: redis database connection
+        user_id: user id from the used token
+        jti: id of the used token
+        new_jti: id of the new token
+        expire: new token lifetime
+
+    Returns:
+        True if used token was live and belonged to the user, False otherwise
+    """
+    digest = jti_digest(jti)
+    new_digest = jti_digest(new_jti)
+    lifetime = int(expire.total_seconds())
+    now = time.time()
+    rotate = registered_script(redis, ROTATE_SCRIPT)
+    rotated = await rotate(
+        keys=[token_key(digest), user_key(user_id), token_key(new_digest)],
+        args=[user_id, digest, new_digest, lifetime, now + lifetime, now],
+    )
+    return bool(rotated)
+
+
+async def revoke_refresh_token(redis: Redis, *, user_id: int, jti: str) -> None:
+    """
+    Delete refresh token.
+
+    Args:
+        redis: redis database connection
+        user_id: user id
+        jti: token id
+
+    Returns:
+        None
+    """
+    await revoke_session(redis, user_id=user_id, digest=jti_digest(jti))
+
+
+async def list_sessions(redis: Redis, *, user_id: int) -> List[Tuple[bytes, float]]:
+    """
+    Get live sessions of user, expired ones are trimmed from the index.
+
+    Args:
+        redis: redis database connection
+        user_id: user id
+
+    Returns:
+        list of token digests and expiration timestamps, oldest first
+    """
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.zremrangebyscore(user_key(user_id), "-inf", time.time())
+        pipe.zrange(user_key(user_id), 0, -1, withscores=True)
+        _, sessions = await pipe.execute()
+    return sessions
+
+
+async def revoke_session(redis: Redis, *, user_id: int, digest: bytes) -> bool:
+    """
+    Delete refresh token of user by its digest.
+
+    Args:
+        redis: redis database connection
+        user_id: user id
+        digest: token id digest
+
+    Returns:
+        True if the session was in user index, False otherwise
+    """
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(token_key(digest))
+        pipe.zrem(user_key(user_id), digest)
+        _, removed = await pipe.execute()
+    return bool(removed)
+
+
+async def revoke_sessions(redis: Redis, *, user_id: int) -> List[bytes]:
+    """
+    Delete all refresh tokens of user.
+
+    Args:
+        redis: redis database connection
+        user_id: user id
+
+    Returns:
+        digests of deleted tokens
+    """
+    revoke_all = registered_script(redis, REVOKE_ALL_SCRIPT)
+    return await revoke_all(keys=[user_key(user_id)], args=[TOKEN_KEY_PREFIX])
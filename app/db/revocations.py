@@ -0,0 +1,218 @@
+"""
+Access tokens revocation list.
+
+Attrs:
+    token_revocations: revoked token ids in redis with in-process Bloom filter.
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.utils.bloom import BloomFilter
+from app.utils.digest import jti_digest
+
+REVOKED_KEY_PREFIX = b"rv:"
+REVOKED_STREAM = "revoked-tokens"
+SYNC_BLOCK_MS = 5000
+SYNC_RETRY_SECONDS = 1
+
+
+class TokenRevocations:
+    """
+    Revoked access token ids.
+
+    Every revoked id is a redis key living as long as the token and an entry
+    of a redis stream. Every process follows the stream and keeps revoked ids
+    in a Bloom filter, so redis is asked only about ids the filter reports.
+    Filters are rotated every token lifetime and the previous one is still
+    checked, so an id stays in memory while its token may be alive.
+    """
+
+    def __init__(self) -> None:
+        self.redis: Optional[Redis] = None
+        self.lifetime = 0
+        self.capacity = 0
+        self.error_rate = 0.0
+        self.filters: List[BloomFilter] = []
+        self.rotated_at = 0.0
+        self.last_id = "0-0"
+        self.task: Optional[asyncio.Task] = None
+        self.filter_hits = 0
+        self.revoked_hits = 0
+        self.synced = 0
+        self.errors = 0
+
+    async def start(
+        self, redis: Redis, lifetime: int, capacity: int, error_rate: float
+    ) -> None:
+        """
+        Load revoked ids from redis and start following new ones.
+
+        Args:
+            redis: redis database connection
+            lifetime: max access token lifetime in seconds
+            capacity: expected number of revocations per lifetime
+            error_rate: Bloom filter false positive rate
+
+        Returns:
+            None
+        """
+        self.redis = redis
+        self.lifetime = lifetime
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.filters = [BloomFilter(capacity, error_rate)]
+        self.rotated_at = time.monotonic()
+        self.last_id = "0-0"
+        try:
+            await self.sync()
+        except RedisError:
+            self.errors += 1
+        self.task = asyncio.create_task(self.follow())
+
+    async def stop(self) -> None:
+        """
+        Stop following revocations.
+
+        Returns:
+            None
+        """
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.task = None
+        self.redis = None
+
+    def add(self, digest: bytes) -> None:
+        """
+        Add revoked id digest to the current filter, rotate filters if due.
+
+        Args:
+            digest: revoked id digest
+
+        Returns:
+            None
+        """
+        if time.monotonic() - self.rotated_at >= self.lifetime:
+            bloom = BloomFilter(self.capacity, self.error_rate)
+            self.filters = [bloom] + self.filters[:1]
+            self.rotated_at = time.monotonic()
+        self.filters[0].add(digest)
+
+    async def sync(self, block: Optional[int] = None) -> None:
+        """
+        Read new stream entries into the filter.
+
+        Args:
+            block: milliseconds to wait for new entries, don't wait if None
+
+        Returns:
+            None
+        """
+        streams = await self.redis.xread({REVOKED_STREAM: self.last_id}, block=block)
+        for _, entries in streams:
+            for entry_id, fields in entries:
+                self.add(fields[b"d"])
+                self.last_id = entry_id
+                self.synced += 1
+
+    async def follow(self) -> None:
+        """
+        Follow the stream until stopped, retry on redis errors.
+
+        Returns:
+            None
+        """
+        while True:
+            try:
+                await self.sync(block=SYNC_BLOCK_MS)
+            except RedisError:
+                self.errors += 1
+                await asyncio.sleep(SYNC_RETRY_SECONDS)
+
+    async def revoke(self, jti: str) -> None:
+        """
+        Revoke token by id for its max lifetime.
+
+        Args:
+            jti: token id
+
+        Returns:
+            None
+        """
+        await self.revoke_digests([jti_digest(jti)])
+
+    async def revoke_digests(self, digests: List[bytes]) -> None:
+        """
+        Revoke tokens by id digests for their max lifetime.
+
+        Digests of refresh token sessions are the same as digests of their
+        access token ids, so all sessions of a user are revoked at once.
+
+        Args:
+            digests: token id digests
+
+        Returns:
+            None
+        """
+        if not digests:
+            return
+        min_id = int((time.time() - self.lifetime) * 1000)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for digest in digests:
+                pipe.set(REVOKED_KEY_PREFIX + digest, 1, ex=self.lifetime)
+                pipe.xadd(REVOKED_STREAM, {"d": digest}, minid=min_id, approximate=True)
+            await pipe.execute()
+        for digest in digests:
+            self.add(digest)
+
+    async def is_revoked(self, jti: str) -> bool:
+        """
+        Check if token is revoked, redis is asked only on filter hit.
+
+        Redis errors are treated as revoked token, they matter only for ids
+        the filter has seen.
+
+        Args:
+            jti: token id
+
+        Returns:
+            True if token is revoked, False otherwise
+        """
+        digest = jti_digest(jti)
+        if not any(digest in bloom for bloom in self.filters):
+            return False
+        self.filter_hits += 1
+        if self.redis is None:
+            return True
+        try:
+            revoked = bool(await self.redis.exists(REVOKED_KEY_PREFIX + digest))
+        except RedisError:
+            self.errors += 1
+            return True
+        self.revoked_hits += revoked
+        return revoked
+
+    def as_dict(self) -> Dict[str, int]:
+        """
+        Return revocation counters.
+
+        Returns:
+            dict with filter and redis check counters
+        """
+        return {
+            "filter_items": sum(bloom.count for bloom in self.filters),
+            "filter_hits": self.filter_hits,
+            "revoked_hits": self.revoked_hits,
+            "synced": self.synced,
+            "errors": self.errors,
+        }
+
+
+token_revocations = TokenRevocations()
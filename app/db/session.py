@@ -1,20 +1,145 @@
 """
 SQLAlchemy async session initialization module.
+
+Attrs:
+    build_engine: create instrumented async engine.
+    engine: async engine of the primary (writer) database.
+    replica_engines: async engines of read replicas.
+    RoutingSession: session routing reads to replicas and writes to primary.
+    async_session: factory of request-scoped async sessions.
+    use_primary: pin session reads to the primary database.
+    pool_stats: connection pools telemetry of all engines.
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+import random
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
+from sqlalchemy.orm import sessionmaker, Session, Mapper
+from sqlalchemy.sql import ClauseElement
+from sqlalchemy.sql.dml import UpdateBase
 
 from app.core.config import settings
+from app.db.pool import PoolMetrics, instrumented_pool_class, get_pool_options
+
+# session info keys
+USE_PRIMARY = "use_primary"
+HAS_WRITES = "has_writes"
+ON_WRITE = "on_write"
+
+engines_metrics: Dict[str, Tuple[AsyncEngine, PoolMetrics]] = {}
+
+
+def build_engine(name: str, url: str) -> AsyncEngine:
+    """
+    Create async engine with instrumented connection pool.
+
+    Args:
+        name: engine name to report pool metrics with
+        url: database connection uri
+
+    Returns:
+        SQLAlchemy async engine
+    """
+    metrics = PoolMetrics()
+    new_engine = create_async_engine(
+        url=url,
+        echo=False,
+        pool_pre_ping=True,
+        poolclass=instrumented_pool_class(metrics),
+        **get_pool_options(settings),
+    )
+    metrics.attach(new_engine)
+    engines_metrics[name] = (new_engine, metrics)
+    return new_engine
+
+
+def pool_stats() -> dict:
+    """
+    Return connection pools telemetry of all engines.
+
+    Returns:
+        dict of pool metrics by engine name
+    """
+    return {
+        name: metrics.as_dict(pool_engine.sync_engine.pool)
+        for name, (pool_engine, metrics) in engines_metrics.items()
+    }
+
+
+engine = build_engine("primary", settings.SQLALCHEMY_DATABASE_URI)
+replica_engines = [
+    build_engine(f"replica-{i}", uri)
+    for i, uri in enumerate(settings.SQLALCHEMY_REPLICA_URIS)
+]
+
+
+def use_primary(session: Session) -> None:
+    """
+    Pin all following reads of the session to the primary database.
+
+    Args:
+        session: SQLAlchemy session
+
+    Returns:
+        None
+    """
+    session.info[USE_PRIMARY] = True
+
+
+class RoutingSession(Session):
+    """
+    Session routing reads to read replicas and writes to the primary.
+
+    Once the session has written anything (or was pinned with ``use_primary``)
+    it reads from the primary too, so it always sees its own writes. Single
+    statements executed with ``bind_arguments={USE_PRIMARY: True}`` read from
+    the primary without pinning the session. The ``on_write`` callback from
+    the session info is called on the first write.
+    """
+
+    def get_bind(
+        self,
+        mapper: Optional[Mapper] = None,
+        clause: Optional[ClauseElement] = None,
+        **kw: Any,
+    ) -> Engine:
+        """
+        Choose database engine for the statement.
+
+        Args:
+            mapper: mapper of the statement entity
+            clause: statement to execute
+            kw: other bind arguments
+
+        Returns:
+            sync engine of the primary or one of the replicas
+        """
+        is_write = (
+            self._flushing
+            or isinstance(clause, UpdateBase)
+            or getattr(clause, "_for_update_arg", None) is not None
+        )
+        if is_write:
+            if not self.info.get(HAS_WRITES):
+                self.info[HAS_WRITES] = True
+                on_write = self.info.get(ON_WRITE)
+                if on_write is not None:
+                    on_write()
+            return engine.sync_engine
+        if kw.get(USE_PRIMARY):
+            return engine.sync_engine
+        if self.info.get(USE_PRIMARY) or self.info.get(HAS_WRITES):
+            return engine.sync_engine
+        if not replica_engines:
+            return engine.sync_engine
+        return random.choice(replica_engines).sync_engine
+
 
-engine = create_async_engine(
-    url=settings.SQLALCHEMY_DATABASE_URI,
-    echo=False,
-    pool_size=50,
-    pool_pre_ping=True,
-    pool_recycle=300,
-)
 async_session = sessionmaker(
-    engine, expire_on_commit=False, autoflush=False, class_=AsyncSession
+    engine,
+    expire_on_commit=False,
+    autoflush=False,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
 )
-
-session = async_session(bind=engine)
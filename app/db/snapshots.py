@@ -0,0 +1,241 @@
+"""
+User snapshots cache.
+
+Attrs:
+    user_snapshots: two level (in-process and redis) cache of user snapshots.
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+
+SNAPSHOT_KEY = "user:{}:snapshot"
+VERSION_KEY = "user:{}:version"
+
+
+class UserSnapshots:
+    """
+    Cache of user snapshots to authorize requests without the database.
+
+    Every user change increments the user version in redis, a snapshot is
+    trusted only while it's tagged with the current version. Snapshots are
+    kept in redis for ``ttl`` seconds and in memory of the process for
+    ``local_ttl`` seconds, so changes made by other processes are seen at
+    most ``local_ttl`` seconds later (``ttl`` if the version bump failed).
+    """
+
+    def __init__(self) -> None:
+        self.redis: Optional[Redis] = None
+        self.ttl = 0
+        self.local_ttl = 0
+        self.local_size = 0
+        self.local: "OrderedDict[int, Tuple[float, schemas.UserSnapshot]]" = (
+            OrderedDict()
+        )
+        self.local_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def start(self, redis: Redis, ttl: int, local_ttl: int, local_size: int) -> None:
+        """
+        Start using redis.
+
+        Args:
+            redis: redis database connection
+            ttl: seconds to keep snapshot in redis
+            local_ttl: seconds to keep snapshot in process memory, 0 disables
+            local_size: max number of snapshots in process memory
+
+        Returns:
+            None
+        """
+        self.redis = redis
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local_size = local_size
+
+    def stop(self) -> None:
+        """
+        Stop using redis and drop in-process snapshots.
+
+        Returns:
+            None
+        """
+        self.redis = None
+        self.local.clear()
+
+    def get_local(self, user_id: int) -> Optional[schemas.UserSnapshot]:
+        """
+        Get not expired snapshot from process memory.
+
+        Args:
+            user_id: user id
+
+        Returns:
+            user snapshot or None
+        """
+        entry = self.local.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self.local[user_id]
+            return None
+        self.local.move_to_end(user_id)
+        return entry[1]
+
+    def set_local(self, snapshot: schemas.UserSnapshot) -> None:
+        """
+        Keep snapshot in process memory.
+
+        Args:
+            snapshot: user snapshot
+
+        Returns:
+            None
+        """
+        if self.local_ttl <= 0 or self.local_size <= 0:
+            return
+        self.local[snapshot.id] = (time.monotonic() + self.local_ttl, snapshot)
+        self.local.move_to_end(snapshot.id)
+        while len(self.local) > self.local_size:
+            self.local.popitem(last=False)
+
+    @staticmethod
+    async def load(
+        db: Session, user_id: int, version: int
+    ) -> Optional[schemas.UserSnapshot]:
+        """
+        Load snapshot from the primary database.
+
+        Replicas may lag behind the change that bumped the version, their row
+        would be cached under the new version for the whole ``ttl``.
+
+        Args:
+            db: SQLAlchemy session
+            user_id: user id
+            version: current user version
+
+        Returns:
+            user snapshot or None if user doesn't exist
+        """
+        # the session module builds engines from settings on import
+        from app.db.session import USE_PRIMARY
+
+        res = await db.execute(
+            select(
+                models.User.id,
+                models.User.is_active,
+                models.User.is_superuser,
+                models.User.updated,
+            ).filter(models.User.id == user_id),
+            bind_arguments={USE_PRIMARY: True},
+        )
+        row = res.one_or_none()
+        if row is None:
+            return None
+        return schemas.UserSnapshot(
+            id=row.id,
+            is_active=bool(row.is_active),
+            is_superuser=bool(row.is_superuser),
+            updated=row.updated,
+            version=version,
+        )
+
+    async def get(self, db: Session, user_id: int) -> Optional[schemas.UserSnapshot]:
+        """
+        Get user snapshot from memory, redis or the database.
+
+        Args:
+            db: SQLAlchemy session, used only on cache miss
+            user_id: user id
+
+        Returns:
+            user snapshot or None if user doesn't exist
+        """
+        snapshot = self.get_local(user_id)
+        if snapshot is not None:
+            self.local_hits += 1
+            return snapshot
+        cached, version = None, None
+        redis = self.redis
+        if redis is not None:
+            try:
+                cached, version = await redis.mget(
+                    SNAPSHOT_KEY.format(user_id), VERSION_KEY.format(user_id)
+                )
+            except RedisError:
+                self.errors += 1
+                redis = None
+        version = int(version or 0)
+        if cached is not None:
+            snapshot = schemas.UserSnapshot.parse_raw(cached)
+            if snapshot.version == version:
+                self.hits += 1
+                self.set_local(snapshot)
+                return snapshot
+
+        self.misses += 1
+        snapshot = await self.load(db, user_id, version)
+        if snapshot is None:
+            return None
+        if redis is not None:
+            try:
+                await redis.set(
+                    SNAPSHOT_KEY.format(user_id), snapshot.json(), ex=self.ttl
+                )
+            except RedisError:
+                self.errors += 1
+        self.set_local(snapshot)
+        return snapshot
+
+    async def bump(self, *user_ids: int) -> None:
+        """
+        Invalidate snapshots of changed users, call after the change is committed.
+
+        The version key outlives any snapshot tagged with it, so a snapshot
+        written by a request racing with the change is never trusted.
+
+        Args:
+            user_ids: ids of changed users
+
+        Returns:
+            None
+        """
+        for user_id in user_ids:
+            self.local.pop(user_id, None)
+        if self.redis is None or not user_ids:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.incr(VERSION_KEY.format(user_id))
+                    pipe.expire(VERSION_KEY.format(user_id), self.ttl * 2)
+                    pipe.delete(SNAPSHOT_KEY.format(user_id))
+                await pipe.execute()
+        except RedisError:
+            self.errors += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        """
+        Return cache counters.
+
+        Returns:
+            dict with local size and hit, miss and error counters
+        """
+        return {
+            "local_size": len(self.local),
+            "local_hits": self.local_hits,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+user_snapshots = UserSnapshots()
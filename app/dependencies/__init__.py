@@ -1,4 +1,6 @@
 """
 Main FastAPI dependencies package.
 """
+from .admission import admit_password_hashing, limit_credential_attempts
 from .auth import get_current_active_superuser, get_current_active_user
+from .db import get_db
@@ -0,0 +1,119 @@
+"""
+Admission control dependencies module.
+"""
+import math
+from typing import Mapping, Optional
+
+from fastapi import HTTPException
+from starlette import status
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.security import PasswordHashingBusy, password_hash_pool
+from app.db.rate_limits import Limit, rate_limiter
+
+BUSY_DETAIL = "Service is busy, try again later."
+RATE_LIMITED_DETAIL = "Too many attempts, try again later."
+FORM_CONTENT_TYPES = ("application/x-www-form-urlencoded", "multipart/form-data")
+
+ip_limit = Limit("ip", settings.RATE_LIMIT_IP_PER_MINUTE, settings.RATE_LIMIT_IP_BURST)
+username_limit = Limit(
+    "username",
+    settings.RATE_LIMIT_USERNAME_PER_MINUTE,
+    settings.RATE_LIMIT_USERNAME_BURST,
+)
+
+
+def busy_exception() -> HTTPException:
+    """
+    Build 503 error asking client to retry later.
+
+    Returns:
+        HTTPException instance with Retry-After header
+    """
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=BUSY_DETAIL,
+        headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+    )
+
+
+async def admit_password_hashing() -> None:
+    """
+    Reject request before any work if password hashing pool is saturated.
+
+    Returns:
+        None
+
+    Raises:
+        HTTPException: 503 with Retry-After if the pool is busy
+    """
+    try:
+        password_hash_pool.admit()
+    except PasswordHashingBusy:
+        raise busy_exception()
+
+
+def client_address(request: Request) -> Optional[str]:
+    """
+    Get address of the client, behind trusted proxies if they are configured.
+
+    Every trusted proxy appends the address it got the request from to
+    X-Forwarded-For, so the client is that many entries from the end and
+    entries sent by the client itself are ignored.
+
+    Args:
+        request: request instance
+
+    Returns:
+        client address or None if it's unknown
+    """
+    proxies = settings.RATE_LIMIT_TRUSTED_PROXIES
+    if proxies > 0:
+        forwarded = [
+            address.strip()
+            for address in request.headers.get("x-forwarded-for", "").split(",")
+            if address.strip()
+        ]
+        if forwarded:
+            return forwarded[-min(proxies, len(forwarded))]
+    return request.client.host if request.client is not None else None
+
+
+async def limit_credential_attempts(request: Request) -> None:
+    """
+    Reject login or registration attempt over rate limit of client or username.
+
+    The username is taken from the already parsed form or JSON body, so the
+    check runs before the database and password hashing are touched.
+
+    Args:
+        request: request instance
+
+    Returns:
+        None
+
+    Raises:
+        HTTPException: 429 with Retry-After if any bucket is empty
+    """
+    buckets = []
+    address = client_address(request)
+    if address is not None:
+        buckets.append((ip_limit, address))
+    if request.headers.get("content-type", "").startswith(FORM_CONTENT_TYPES):
+        body = await request.form()
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+    username = body.get("username") if isinstance(body, Mapping) else None
+    if isinstance(username, str) and username:
+        buckets.append((username_limit, username.lower()))
+    wait = await rate_limiter.acquire(buckets)
+    if wait > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=RATE_LIMITED_DETAIL,
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
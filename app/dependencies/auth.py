@@ -1,44 +1,54 @@
 """
 Auth dependencies module.
 """
-import json
 from typing import Optional
 
 from fastapi import HTTPException, Depends
 from jose import jwt
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 from starlette.requests import Request
 
-from app import models, crud, schemas
+from app import crud, schemas
 from app.core import auth
 from app.core.auth import reusable_oauth2
+from app.db.revocations import token_revocations
+from app.db.snapshots import user_snapshots
+from app.dependencies.db import get_db
 
 
 async def get_current_user(
-    request: Request, token: str = Depends(reusable_oauth2)
-) -> Optional[models.User]:
+    request: Request,
+    token: str = Depends(reusable_oauth2),
+    db: AsyncSession = Depends(get_db),
+) -> Optional[schemas.UserSnapshot]:
     """
-    Return current user using token.
+    Return snapshot of current user using token.
+
+    The snapshot is cached, the database is queried only on cache miss.
 
     Args:
         request: request instance
         token: jwt token
+        db: request-scoped database session
 
     Returns:
-        User model instance if token is valid, None otherwise
+        user snapshot if token is valid, None otherwise
     """
-    db = request.app.state.db
     try:
-        payload = auth.decode_token(token)
-        token_data = schemas.TokenPayload.parse_obj(payload)
+        token_subject = auth.verify_token(token)
     except (jwt.JWTError, ValidationError) as e:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Could not validate credentials:\n{e}",
         )
-    token_subject = schemas.TokenSubject.parse_obj(json.loads(token_data.sub))
-    user = await crud.user.get(db, id=int(token_subject.id))
+    if await token_revocations.is_revoked(token_subject.jti):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials:\nToken has been revoked.",
+        )
+    user = await user_snapshots.get(db, token_subject.id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User hasn't been found."
@@ -48,8 +58,8 @@ async def get_current_user(
 
 async def get_current_active_user(
     request: Request,
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
+    current_user: schemas.UserSnapshot = Depends(get_current_user),
+) -> schemas.UserSnapshot:
     """
     Return current active user using passed token.
 
@@ -69,8 +79,8 @@ async def get_current_active_user(
 
 async def get_current_active_superuser(
     request: Request,
-    current_user: models.User = Depends(get_current_active_user),
-) -> Optional[models.User]:
+    current_user: schemas.UserSnapshot = Depends(get_current_active_user),
+) -> Optional[schemas.UserSnapshot]:
     """
     Return superuser using passed token.
 
@@ -0,0 +1,81 @@
+"""
+Database dependencies module.
+"""
+import time
+from functools import partial
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.config import settings
+from app.db.session import ON_WRITE, use_primary
+
+READ_YOUR_WRITES_COOKIE = "bshr_primary_until"
+
+
+def set_read_your_writes_cookie(response: Response) -> None:
+    """
+    Pin the client reads to the primary database for the read-your-writes window.
+
+    Args:
+        response: response instance
+
+    Returns:
+        None
+    """
+    window = settings.SQLALCHEMY_READ_YOUR_WRITES_SECONDS
+    response.set_cookie(
+        READ_YOUR_WRITES_COOKIE,
+        str(time.time() + window),
+        max_age=window,
+        httponly=True,
+        samesite="lax",
+    )
+
+
+def is_pinned_to_primary(request: Request) -> bool:
+    """
+    Check if the client has written recently and must read from the primary.
+
+    Args:
+        request: request instance
+
+    Returns:
+        True if read-your-writes window of the client is still open
+    """
+    try:
+        primary_until = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0))
+    except ValueError:
+        return False
+    return primary_until > time.time()
+
+
+async def get_db(request: Request, response: Response) -> AsyncIterator[AsyncSession]:
+    """
+    Yield a request-scoped database session.
+
+    Every request checks its own connection out of the engine pool, the
+    transaction is committed when the request succeeds and rolled back
+    otherwise, then the connection is returned to the pool. Reads go to
+    replicas unless the client wrote within the read-your-writes window.
+
+    Args:
+        request: request instance
+        response: response instance to set read-your-writes cookie on
+
+    Returns:
+        SQLAlchemy async session bound to the current request
+    """
+    async with request.app.state.async_session() as session:
+        if is_pinned_to_primary(request):
+            use_primary(session.sync_session)
+        if settings.SQLALCHEMY_READ_YOUR_WRITES_SECONDS > 0:
+            session.info[ON_WRITE] = partial(set_read_your_writes_cookie, response)
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
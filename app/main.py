@@ -4,15 +4,29 @@ Main start module.
 import asyncio
 
 import uvloop
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.exception_handlers import http_exception_handler
+from fastapi.responses import ORJSONResponse
 from hypercorn.asyncio import serve
 from hypercorn.config import Config
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
 
 from app.api.api_v1.api import api_router
+from app.api.api_v1.views.users import NEXT_CURSOR_HEADER
 from app.core.config import settings
+from app.core.security import (
+    PasswordHashingBusy,
+    password_hash_pool,
+    setup_password_hashing,
+)
 from app.db.database import app_init_db, app_dispose_db
+from app.db.login_failures import login_failures
+from app.db.rate_limits import rate_limiter
 from app.db.redis import app_init_redis, app_dispose_redis
+from app.db.revocations import token_revocations
+from app.db.snapshots import user_snapshots
+from app.dependencies.admission import busy_exception
 
 OPENAPI_DESCRIPTION = """
 **API for bashare app**
@@ -32,6 +46,7 @@ app = FastAPI(
     version=OPENAPI_VERSION,
     description=OPENAPI_DESCRIPTION,
     openapi_tags=OPENAPI_TAGS,
+    default_response_class=ORJSONResponse,
     contact={
         "name": settings.API_CONTACT_NAME,
         "url": settings.API_CONTACT_URL,
@@ -47,15 +62,71 @@ app = FastAPI(
 @app.on_event("startup")
 async def startup_event() -> None:
     """Startup events function."""
+    password_hash_config = setup_password_hashing(
+        settings.PASSWORD_HASH_SCHEMES, settings.PASSWORD_HASH_TARGET_MS
+    )
+    password_hash_pool.start(
+        settings.PASSWORD_HASH_WORKERS,
+        settings.PASSWORD_HASH_QUEUE_SIZE,
+        password_hash_config,
+        settings.PASSWORD_HASH_MAX_WAITING,
+    )
     await app_init_db(app)
     await app_init_redis(app)
+    user_snapshots.start(
+        app.state.redis,
+        settings.USER_SNAPSHOT_TTL_SECONDS,
+        settings.USER_SNAPSHOT_LOCAL_TTL_SECONDS,
+        settings.USER_SNAPSHOT_LOCAL_SIZE,
+    )
+    rate_limiter.start(
+        app.state.redis,
+        settings.RATE_LIMIT_REDIS_TIMEOUT_MS / 1000,
+        settings.RATE_LIMIT_FALLBACK_SECONDS,
+        settings.RATE_LIMIT_LOCAL_SIZE,
+    )
+    login_failures.start(
+        app.state.redis,
+        settings.LOGIN_LOCKOUT_THRESHOLD,
+        settings.LOGIN_LOCKOUT_BASE_SECONDS,
+        settings.LOGIN_LOCKOUT_MAX_SECONDS,
+        settings.LOGIN_FAILURE_WINDOW_SECONDS,
+    )
+    await token_revocations.start(
+        app.state.redis,
+        settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        settings.TOKEN_REVOCATION_CAPACITY,
+        settings.TOKEN_REVOCATION_ERROR_RATE,
+    )
 
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
     """Shutdown events function."""
+    await token_revocations.stop()
+    login_failures.stop()
+    rate_limiter.stop()
+    user_snapshots.stop()
     await app_dispose_db(app)
     await app_dispose_redis(app)
+    password_hash_pool.shutdown()
+
+
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(
+    request: Request, exc: PasswordHashingBusy
+) -> Response:
+    """
+    Respond 503 with Retry-After when hashing pool rejects a call.
+
+    Args:
+        request: request instance
+        exc: rejection exception
+
+    Returns:
+        error response
+    """
+    return await http_exception_handler(request, busy_exception())
 
 
 if settings.BACKEND_CORS_ORIGINS:
@@ -65,6 +136,7 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
     )
 
 app.include_router(api_router, prefix=settings.API_PREFIX)
@@ -22,5 +22,6 @@ class User(Base):
     is_active = Column("is_active", Boolean(), default=False)
     is_superuser = Column("is_superuser", Boolean(), default=False)
     created = Column("created", DateTime(timezone=True), server_default=func.now())
+    updated = Column("updated", DateTime(timezone=True), server_default=func.now())
     last_login = Column("last_login", DateTime(timezone=True))
     confirmed = Column("confirmed", Boolean(), default=False)
@@ -1,5 +1,5 @@
 """
 Pydantic schemas package.
 """
-from .user import User, UserCreate, UserUpdate, UserInDB
-from .auth import Token, TokenPayload, TokenSubject
+from .user import User, UserCreate, UserUpdate, UserInDB, UserSnapshot
+from .auth import Session, Token, TokenPayload, TokenSubject
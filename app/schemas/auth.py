@@ -1,6 +1,7 @@
 """
 Pydantic login schemas.
 """
+from datetime import datetime
 from typing import Optional, List
 
 from pydantic import BaseModel
@@ -29,8 +30,6 @@ class TokenSubject(BaseModel):
     """
 
     id: int
-    username: str
-    email: str
     jti: str
     token_type: str
     scope: List[str] = []
@@ -42,3 +41,13 @@ class TokenPayload(BaseModel):
     """
 
     sub: Optional[str] = None
+
+
+class Session(BaseModel):
+    """
+    Login session schema, a live refresh token.
+    """
+
+    id: str
+    expires_at: datetime
+    current: bool = False
@@ -8,6 +8,7 @@ Attrs:
     UserInDBBase: common user db properties.
     User: main user properties to return via API.
     UserInDB: user properties stored in DB.
+    UserSnapshot: user properties needed to authorize requests.
 """
 from datetime import datetime
 from typing import Optional
@@ -63,6 +64,19 @@ class UserUpdate(UserBase):
     password: Optional[constr(min_length=8, max_length=200)]
     is_active: bool = None
 
+    @validator("username", pre=True)
+    def username_is_valid(cls, username: Optional[str]) -> Optional[str]:
+        """
+        Check username is valid if it's changed.
+
+        Args:
+            username: username string or None
+
+        Returns:
+            username string or None
+        """
+        return None if username is None else validate_username(username)
+
 
 class UserInDBBase(UserBase):
     """
@@ -71,6 +85,7 @@ class UserInDBBase(UserBase):
 
     id: Optional[int] = None
     created: Optional[datetime] = None
+    updated: Optional[datetime] = None
     last_login: Optional[datetime] = None
 
     class Config:
@@ -86,7 +101,9 @@ class User(UserInDBBase):
     User properties to return via API.
     """
 
-    pass
+    # emails are validated on input, checking them again on every response
+    # costs more than the rest of serialization
+    email: Optional[str] = None
 
 
 class UserInDB(UserInDBBase):
@@ -95,3 +112,15 @@ class UserInDB(UserInDBBase):
     """
 
     hashed_password: str
+
+
+class UserSnapshot(BaseModel):
+    """
+    User properties needed to authorize requests, cached by user id.
+    """
+
+    id: int
+    is_active: bool
+    is_superuser: bool
+    updated: Optional[datetime] = None
+    version: int = 0
@@ -189,6 +189,10 @@ async def get_app(
                 ):
                     with mock.patch(
                         "app.db.redis.set_redis_key", return_value="0".encode("utf-8")
+                    ), mock.patch(
+                        "app.db.refresh_tokens.store_refresh_token", return_value=None
+                    ), mock.patch(
+                        "app.db.refresh_tokens.rotate_refresh_token", return_value=True
                     ):
                         create_eng.return_value = engine
                         create_redis.return_value = get_redis
@@ -214,14 +218,20 @@ async def get_client(get_app: FastAPI) -> AsyncClient:
 
 
 @pytest.fixture(scope="session")
-def db_test_url() -> str:
+def db_test_url(tmp_path_factory: pytest.TempPathFactory) -> str:
     """
-    Generate in memory sqlite db connect url for test purposes.
+    Generate temporary file sqlite db connect url for test purposes.
+
+    In-memory database would be dropped when app shutdown disposes the engine.
+
+    Args:
+        tmp_path_factory: session temporary directory factory
 
     Returns:
         url string for test database connection
     """
-    return "sqlite+aiosqlite://?cache=shared"  # noqa
+    path = tmp_path_factory.mktemp("db") / "test.db"
+    return f"sqlite+aiosqlite:///{path}"  # noqa
 
 
 @pytest.fixture(scope="session")
@@ -1,9 +1,13 @@
 import json
 import os
+import time
 from datetime import timedelta, datetime, timezone
 from unittest import mock
 from uuid import uuid4
 
+import pytest
+from jose import jwt
+
 from app.schemas import TokenSubject
 from app.tests.utils.utils import random_lower_string, random_email
 
@@ -25,10 +29,16 @@ def test_create_access_token(settings_env_dict_function_scope: dict) -> None:
         token_subject = TokenSubject(**token_subject_dict)
         token = create_access_token(token_subject)
         decoded_token = decode_token(token)
-        decoded_token_sub = json.loads(decoded_token["sub"])
         date_start = datetime.now(timezone.utc)
         expire_date = datetime.fromtimestamp(decoded_token["exp"], tz=timezone.utc)
-        assert token_subject_dict == decoded_token_sub
+        assert decoded_token == {
+            "v": 1,
+            "sub": "1",
+            "jti": token_subject_dict["jti"],
+            "scope": ["admin"],
+            "typ": "bearer",
+            "exp": decoded_token["exp"],
+        }
         assert expire_date > date_start
         assert expire_date <= date_start + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
@@ -58,10 +68,9 @@ def test_create_access_token_with_expires_data(
         )
 
         decoded_token = decode_token(token)
-        decoded_token_sub = json.loads(decoded_token["sub"])
         date_start = datetime.now(timezone.utc)
         expire_date = datetime.fromtimestamp(decoded_token["exp"], tz=timezone.utc)
-        assert token_subject_dict == decoded_token_sub
+        assert decoded_token["sub"] == "1"
         assert expire_date > date_start
         assert expire_date <= date_start + timedelta(
             minutes=custom_expires_delta_in_minutes
@@ -70,7 +79,7 @@ def test_create_access_token_with_expires_data(
 
 def test_create_tokens(settings_env_dict_function_scope: dict) -> None:
     with mock.patch.dict(os.environ, settings_env_dict_function_scope):
-        from app.core.auth import create_tokens
+        from app.core.auth import create_tokens, decode_token
 
         token_subject_dict = {
             "id": 1,
@@ -86,3 +95,106 @@ def test_create_tokens(settings_env_dict_function_scope: dict) -> None:
         assert access_token
         assert refresh_token
         assert token.token_type == token_subject_dict["token_type"]
+        access_payload = decode_token(access_token)
+        refresh_payload = decode_token(refresh_token)
+        assert access_payload["typ"] == "access_token"
+        assert refresh_payload["typ"] == "refresh_token"
+        assert access_payload["jti"] == refresh_payload["jti"]
+        assert access_payload["exp"] < refresh_payload["exp"]
+        assert "username" not in access_payload
+        assert "email" not in access_payload
+
+
+def test_verify_token_cache(settings_env_dict_function_scope: dict) -> None:
+    with mock.patch.dict(os.environ, settings_env_dict_function_scope):
+        from app.core.auth import TokenCache, create_access_token, verify_token
+
+        token_subject = TokenSubject(
+            id=1,
+            username=random_lower_string(8),
+            email=random_email(),
+            jti=uuid4().hex,
+            token_type="access_token",
+        )
+        token = create_access_token(token_subject)
+        cache = TokenCache(max_size=1)
+        with mock.patch("app.core.auth.token_cache", cache):
+            assert verify_token(token) == token_subject
+            assert cache.as_dict()["misses"] == 1
+            with mock.patch("app.core.auth.decode_token") as decode:
+                assert verify_token(token) == token_subject
+                decode.assert_not_called()
+            assert cache.as_dict()["hits"] == 1
+
+            other_token = create_access_token(token_subject, timedelta(minutes=1))
+            verify_token(other_token)
+            assert cache.as_dict()["size"] == 1
+            assert cache.as_dict()["evictions"] == 1
+            assert cache.get(token) is None
+
+            with pytest.raises(jwt.JWTError):
+                verify_token(token[:-2])
+            assert cache.as_dict()["size"] == 1
+
+            with mock.patch("time.time", return_value=time.time() + 120):
+                assert cache.get(other_token) is None
+            assert cache.as_dict()["size"] == 0
+
+            verify_token(token)
+            assert cache.as_dict()["size"] == 1
+            cache.clear()
+            assert cache.as_dict()["size"] == 0
+
+        disabled_cache = TokenCache(max_size=0)
+        disabled_cache.set(token, time.time() + 60, token_subject)
+        assert disabled_cache.get(token) is None
+
+
+def test_verify_token_legacy_claims(settings_env_dict_function_scope: dict) -> None:
+    with mock.patch.dict(os.environ, settings_env_dict_function_scope):
+        from app.core.auth import TokenCache, encode_token, verify_token
+
+        legacy_subject = {
+            "id": 1,
+            "username": random_lower_string(8),
+            "email": random_email(),
+            "jti": uuid4().hex,
+            "token_type": "access_token",
+            "scope": ["admin"],
+        }
+        token = encode_token(
+            {"exp": int(time.time()) + 60, "sub": json.dumps(legacy_subject)}
+        )
+        cache = TokenCache(max_size=10)
+        with mock.patch("app.core.auth.token_cache", cache):
+            assert verify_token(token) == TokenSubject(
+                id=1,
+                jti=legacy_subject["jti"],
+                token_type="access_token",
+                scope=["admin"],
+            )
+
+            legacy_subject["token_type"] = "refresh_token"
+            refresh_token = encode_token(
+                {"exp": int(time.time()) + 60, "sub": json.dumps(legacy_subject)}
+            )
+            with pytest.raises(jwt.JWTError):
+                verify_token(refresh_token)
+            with pytest.raises(jwt.JWTError):
+                verify_token(encode_token({"exp": int(time.time()) + 60}))
+        assert cache.as_dict()["size"] == 1
+
+
+def test_verify_token_rejects_refresh_tokens(
+    settings_env_dict_function_scope: dict,
+) -> None:
+    with mock.patch.dict(os.environ, settings_env_dict_function_scope):
+        from app.core.auth import TokenCache, create_tokens, verify_token
+
+        tokens = create_tokens({"id": 1, "jti": uuid4().hex, "token_type": "bearer"})
+        cache = TokenCache(max_size=10)
+        with mock.patch("app.core.auth.token_cache", cache):
+            assert verify_token(tokens.access_token).id == 1
+            with pytest.raises(jwt.JWTError):
+                verify_token(tokens.refresh_token)
+        assert cache.as_dict()["size"] == 1
@@ -114,3 +114,16 @@ def test_database_uri_set_directly(settings_env_dict_function_scope: dict) -> No
             == settings_env_dict_function_scope["REDIS_DATABASE_URI"]
         )
         settings = None
+
+
+def test_password_hash_schemes_from_comma_separated_string(
+    settings_env_dict_function_scope: dict,
+) -> None:
+    settings_env_dict_function_scope[
+        "PASSWORD_HASH_SCHEMES"
+    ] = "pbkdf2_sha256, sha256_crypt"
+    with mock.patch.dict(os.environ, settings_env_dict_function_scope):
+        from app.core.config import Settings
+
+        settings = Settings()
+        assert settings.PASSWORD_HASH_SCHEMES == ["pbkdf2_sha256", "sha256_crypt"]
@@ -0,0 +1,82 @@
+import os
+import pathlib
+from datetime import timedelta
+from unittest import mock
+from uuid import uuid4
+
+import ecdsa
+import pytest
+import rsa
+from jose import jwt
+from jose.exceptions import JWTError
+
+from app.core.keys import load_key_ring
+from app.schemas import TokenSubject
+from app.tests.utils.utils import random_email, random_lower_string
+
+
+def write_ec_keys(keys_dir: pathlib.Path, kid: str, public_only: bool = False) -> None:
+    signing_key = ecdsa.SigningKey.generate(curve=ecdsa.NIST256p)
+    key = signing_key.get_verifying_key() if public_only else signing_key
+    (keys_dir / f"{kid}.pem").write_bytes(key.to_pem())
+
+
+def test_load_key_ring(tmp_path: pathlib.Path) -> None:
+    assert load_key_ring(None, "HS256") is None
+    with pytest.raises(ValueError):
+        load_key_ring(None, "ES256")
+    with pytest.raises(ValueError):
+        load_key_ring(str(tmp_path), "ES256")
+
+    write_ec_keys(tmp_path, "2023-01", public_only=True)
+    with pytest.raises(ValueError):
+        load_key_ring(str(tmp_path), "ES256")
+
+    write_ec_keys(tmp_path, "2023-02")
+    write_ec_keys(tmp_path, "2023-03")
+    key_ring = load_key_ring(str(tmp_path), "ES256")
+    assert key_ring.signing_kid == "2023-03"
+    assert load_key_ring(str(tmp_path), "ES256", "2023-02").signing_kid == "2023-02"
+    with pytest.raises(ValueError):
+        load_key_ring(str(tmp_path), "ES256", "2023-01")
+
+    kid, key = key_ring.signing_key()
+    token = jwt.encode({"sub": "1"}, key, algorithm="ES256", headers={"kid": kid})
+    assert jwt.decode(token, key_ring.verification_key(kid), algorithms=["ES256"])
+    with pytest.raises(JWTError):
+        key_ring.verification_key("unknown")
+    with pytest.raises(JWTError):
+        key_ring.verification_key(None)
+
+    jwks = key_ring.jwks()
+    assert [key["kid"] for key in jwks["keys"]] == ["2023-01", "2023-02", "2023-03"]
+    for jwk_dict in jwks["keys"]:
+        assert jwk_dict["use"] == "sig"
+        assert jwk_dict["alg"] == "ES256"
+        assert "d" not in jwk_dict
+
+
+def test_access_token_signed_with_key_ring(
+    tmp_path: pathlib.Path, settings_env_dict_function_scope: dict
+) -> None:
+    _, private_key = rsa.newkeys(1024)
+    (tmp_path / "rsa-1.pem").write_bytes(private_key.save_pkcs1())
+    with mock.patch.dict(os.environ, settings_env_dict_function_scope):
+        from app.core.auth import create_access_token, decode_token
+
+        key_ring = load_key_ring(str(tmp_path), "RS256")
+        token_subject = TokenSubject(
+            id=1,
+            username=random_lower_string(8),
+            email=random_email(),
+            jti=uuid4().hex,
+            token_type="access_token",
+        )
+        with mock.patch("app.core.auth.key_ring", key_ring):
+            token = create_access_token(token_subject, timedelta(minutes=1))
+            assert jwt.get_unverified_header(token)["kid"] == "rsa-1"
+            assert decode_token(token)["sub"] == "1"
+
+            forged = jwt.encode({"sub": "{}"}, "secret", algorithm="HS256")
+            with pytest.raises(JWTError):
+                decode_token(forged)
@@ -0,0 +1,168 @@
+import asyncio
+import time
+from unittest import mock
+
+import pytest
+
+from app.core.security import (
+    PasswordHashingBusy,
+    PasswordHashPool,
+    calibrate_rounds,
+    check_password,
+    configure_password_hashing,
+    get_password_hash,
+    hash_password,
+    hash_passwords,
+    password_hash_pool,
+    password_hash_ctx,
+    password_needs_rehash,
+    setup_password_hashing,
+    verify_password,
+)
+from app.tests.utils.utils import random_lower_string
+
+
+@pytest.mark.asyncio
+async def test_password_hash_pool() -> None:
+    pool = PasswordHashPool()
+    pool.start(workers=2, queue_size=1)
+    try:
+        assert pool.executor is not None
+        assert pool.slots._value == 2
+        password = random_lower_string(8)
+        password_hash = await pool.run(get_password_hash, password)
+        assert await pool.run(verify_password, password, password_hash)
+        assert not await pool.run(verify_password, "wrong", password_hash)
+    finally:
+        pool.shutdown()
+    assert pool.executor is None
+
+
+@pytest.mark.asyncio
+async def test_password_hash_pool_admission() -> None:
+    pool = PasswordHashPool()
+    pool.start(workers=1, queue_size=1, max_waiting=1)
+    try:
+        running = asyncio.create_task(pool.run(time.sleep, 0.2))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(pool.run(time.sleep, 0))
+        await asyncio.sleep(0)
+        assert pool.as_dict()["in_flight"] == 1
+        assert pool.as_dict()["waiting"] == 1
+        assert pool.is_busy()
+        with pytest.raises(PasswordHashingBusy):
+            await pool.run(time.sleep, 0)
+        # internal work waits for a slot instead of being rejected
+        internal = asyncio.create_task(pool.run(time.sleep, 0, admit=False))
+        await asyncio.gather(running, waiting, internal)
+        assert pool.as_dict() == {
+            "queue_size": 1,
+            "max_waiting": 1,
+            "in_flight": 0,
+            "waiting": 0,
+            "completed": 3,
+            "rejected": 1,
+        }
+        assert not pool.is_busy()
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_password_hash_pool_disabled() -> None:
+    pool = PasswordHashPool()
+    pool.start(workers=0, queue_size=8)
+    assert pool.executor is None
+    password = random_lower_string(8)
+    assert verify_password(password, await pool.run(get_password_hash, password))
+
+
+@pytest.mark.asyncio
+async def test_hash_and_check_password() -> None:
+    password = random_lower_string(8)
+    password_hash = await hash_password(password)
+    assert verify_password(password, password_hash)
+    assert await check_password(password, password_hash)
+    assert not await check_password(random_lower_string(8), password_hash)
+
+
+@pytest.mark.asyncio
+async def test_hash_passwords() -> None:
+    passwords = [random_lower_string(8) for _ in range(5)]
+    with mock.patch.object(password_hash_pool, "queue_size", 2):
+        with mock.patch(
+            "app.core.security.asyncio.gather", wraps=asyncio.gather
+        ) as gather:
+            hashes = await hash_passwords(passwords)
+    assert gather.call_count == 3
+    assert len(set(hashes)) == len(passwords)
+    for password, password_hash in zip(passwords, hashes):
+        assert verify_password(password, password_hash)
+
+
+@pytest.mark.asyncio
+async def test_hash_passwords_waits_for_busy_pool() -> None:
+    pool = PasswordHashPool()
+    pool.start(workers=1, queue_size=1)
+    try:
+        with mock.patch("app.core.security.password_hash_pool", pool):
+            running = asyncio.create_task(pool.run(time.sleep, 0.1))
+            await asyncio.sleep(0)
+            assert pool.is_busy()
+            passwords = [random_lower_string(8) for _ in range(3)]
+            hashes = await hash_passwords(passwords)
+            await running
+        assert pool.as_dict()["rejected"] == 0
+        assert pool.as_dict()["completed"] == 4
+        assert all(map(verify_password, passwords, hashes))
+    finally:
+        pool.shutdown()
+
+
+def test_calibrate_rounds() -> None:
+    handler = password_hash_ctx.handler("pbkdf2_sha256")
+    fast_rounds = calibrate_rounds("pbkdf2_sha256", 1)
+    slow_rounds = calibrate_rounds("pbkdf2_sha256", 50)
+    assert handler.min_rounds <= fast_rounds < slow_rounds <= handler.max_rounds
+
+
+def test_calibrate_log2_rounds() -> None:
+    initial_config = password_hash_ctx.to_dict()
+    try:
+        configure_password_hashing({"schemes": ["phpass"], "phpass__default_rounds": 8})
+        handler = password_hash_ctx.handler("phpass")
+        fast_rounds = calibrate_rounds("phpass", 0.01)
+        slow_rounds = calibrate_rounds("phpass", 100)
+        assert handler.min_rounds <= fast_rounds < slow_rounds <= handler.max_rounds
+    finally:
+        configure_password_hashing(initial_config)
+
+
+def test_setup_password_hashing() -> None:
+    initial_config = password_hash_ctx.to_dict()
+    password = random_lower_string(8)
+    old_hash = get_password_hash(password)
+    try:
+        with mock.patch("app.core.security.calibrate_rounds", return_value=4000):
+            config = setup_password_hashing(["pbkdf2_sha256"], 5)
+        assert config["pbkdf2_sha256__default_rounds"] == 4000
+        assert config["pbkdf2_sha256__min_rounds"] == 3000
+        assert config["pbkdf2_sha256__max_rounds"] == 5000
+        assert password_needs_rehash(old_hash)
+        new_hash = get_password_hash(password)
+        assert "$4000$" in new_hash
+        assert not password_needs_rehash(new_hash)
+        assert verify_password(password, old_hash)
+
+        config = setup_password_hashing(["pbkdf2_sha256"], None)
+        assert "pbkdf2_sha256__default_rounds" in config
+        assert not password_needs_rehash(new_hash)
+
+        # log2 cost work factors are exact, a step is already twice the work
+        with mock.patch("app.core.security.calibrate_rounds", return_value=10):
+            config = setup_password_hashing(["phpass", "pbkdf2_sha256"], 5)
+        assert config["phpass__min_rounds"] == config["phpass__max_rounds"] == 10
+        assert password_needs_rehash(new_hash)
+        assert not password_needs_rehash(get_password_hash(password))
+    finally:
+        configure_password_hashing(initial_config)
@@ -1,9 +1,12 @@
+from unittest import mock
+
 import pytest
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import models
+from app import models, schemas
 from app.crud.base import CRUDBase
 from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_email, random_lower_string
 
 
 @pytest.mark.asyncio
@@ -70,6 +73,37 @@ async def test_update_obj_with_dict(
     assert updated_user.is_superuser == some_user_for_function.is_superuser
 
 
+@pytest.mark.asyncio
+async def test_update_sets_updated_time(
+    db: AsyncSession, some_user_for_function: models.User
+) -> None:
+    """
+    Test update sets updated column only when something is updated.
+
+    Args:
+        db: SQLAlchemy session
+        some_user_for_function: user created in db with function scope
+    Returns:
+        None
+    """
+    crud_user = CRUDBase(models.User)
+    updated_user = await crud_user.update(
+        db, obj_db=some_user_for_function, obj_in={"confirmed": True}
+    )
+    updated = updated_user.updated
+    assert updated is not None
+
+    updated_user = await crud_user.update(
+        db, obj_db=updated_user, obj_in={"some_field": "some_value"}
+    )
+    assert updated_user.updated == updated
+
+    updated_user = await crud_user.update(
+        db, obj_db=updated_user, obj_in={"confirmed": False}
+    )
+    assert updated_user.updated != updated
+
+
 @pytest.mark.asyncio
 async def test_remove_obj(
     db: AsyncSession, some_user_for_function: models.User
@@ -84,6 +118,143 @@ async def test_remove_obj(
         None
     """
     user_id = some_user_for_function.id
-    await CRUDBase(models.User).remove(db, id=user_id)
+    removed = await CRUDBase(models.User).remove(db, id=user_id)
+    assert removed.id == user_id
+    assert removed.username == some_user_for_function.username
     user_in_db = await CRUDBase(models.User).get(db, user_id)
     assert not user_in_db
+    assert await CRUDBase(models.User).remove(db, id=user_id) is None
+
+
+@pytest.mark.asyncio
+async def test_get_multi_after_id(db: AsyncSession) -> None:
+    """
+    Test keyset pagination of objects list crud operation.
+
+    Args:
+        db: SQLAlchemy session
+
+    Returns:
+        None
+    """
+    for i in range(3):
+        await create_random_user(db)
+    crud_base = CRUDBase(models.User)
+    all_users = await crud_base.get_multi(db, limit=1000)
+
+    first_page = await crud_base.get_multi(db, limit=2)
+    second_page = await crud_base.get_multi(db, limit=2, after_id=first_page[-1].id)
+    assert first_page == all_users[:2]
+    assert second_page == all_users[2:4]
+    assert second_page == await crud_base.get_multi(db, skip=2, limit=2)
+    assert not await crud_base.get_multi(db, after_id=all_users[-1].id)
+
+
+@pytest.mark.asyncio
+async def test_stream_multi(db: AsyncSession) -> None:
+    """
+    Test streaming all objects crud operation.
+
+    Args:
+        db: SQLAlchemy session
+
+    Returns:
+        None
+    """
+    await create_random_user(db)
+    crud_base = CRUDBase(models.User)
+    all_users = await crud_base.get_multi(db, limit=1000)
+    streamed_users = [user async for user in crud_base.stream_multi(db, batch_size=2)]
+    assert streamed_users == all_users
+
+
+@pytest.mark.asyncio
+async def test_create_update_remove_many(db: AsyncSession) -> None:
+    """
+    Test bulk create, update and remove crud operations.
+
+    Args:
+        db: SQLAlchemy session
+
+    Returns:
+        None
+    """
+    crud_base = CRUDBase(models.User)
+    objs_in = [
+        schemas.UserCreate(
+            username=random_lower_string(8),
+            email=random_email(),
+            password=random_lower_string(8),
+        )
+        for i in range(3)
+    ]
+    created = await crud_base.create_many(db, objs_in=objs_in)
+    assert sorted(user.username for user in created) == sorted(
+        obj_in.username for obj_in in objs_in
+    )
+    assert all(user.id and user.created for user in created)
+    ids = [user.id for user in created]
+
+    updated = await crud_base.update_many(
+        db, ids=ids, obj_in={"is_active": False, "some_field": "some_value"}
+    )
+    assert sorted(user.id for user in updated) == sorted(ids)
+    assert not any(user.is_active for user in updated)
+    not_updated = await crud_base.update_many(
+        db, ids=ids, obj_in={"some_field": "some_value"}
+    )
+    assert sorted(user.id for user in not_updated) == sorted(ids)
+
+    removed = await crud_base.remove_many(db, ids=ids, batch_size=2)
+    assert sorted(user.id for user in removed) == sorted(ids)
+    assert not await crud_base.update_many(db, ids=ids, obj_in={"is_active": True})
+    for user_id in ids:
+        assert not await crud_base.get(db, user_id)
+
+
+@pytest.mark.asyncio
+async def test_many_with_empty_ids(db: AsyncSession) -> None:
+    """
+    Test bulk crud operations with nothing to do.
+
+    Args:
+        db: SQLAlchemy session
+
+    Returns:
+        None
+    """
+    crud_base = CRUDBase(models.User)
+    assert await crud_base.create_many(db, objs_in=[]) == []
+    assert await crud_base.update_many(db, ids=[], obj_in={"is_active": True}) == []
+    assert await crud_base.remove_many(db, ids=[]) == []
+
+
+@pytest.mark.asyncio
+async def test_create_and_update_return_server_values(db: AsyncSession) -> None:
+    """
+    Test create and update get server generated values with RETURNING.
+
+    Args:
+        db: SQLAlchemy session
+
+    Returns:
+        None
+    """
+    crud_base = CRUDBase(models.User)
+    user_in = schemas.UserCreate(
+        username=random_lower_string(8),
+        email=random_email(),
+        password=random_lower_string(8),
+    )
+    with mock.patch.object(db, "refresh") as refresh:
+        user = await crud_base.create(db, obj_in=user_in)
+        assert user.id and user.created
+        assert user.is_active
+
+        updated_user = await crud_base.update(
+            db, obj_db=user, obj_in={"email": random_email(), "confirmed": True}
+        )
+        refresh.assert_not_called()
+    assert updated_user is user
+    assert user.confirmed
+    assert user == await crud_base.get(db, user.id)
@@ -1,8 +1,14 @@
+from unittest import mock
+
 import pytest
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import BackgroundTasks
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
 from app import crud, models, schemas
-from app.core.security import verify_password
+from app.core.security import check_password, dummy_password_hash, verify_password
+from app.crud.crud_user import ON_CONFLICT_INSERTS
 from app.tests.utils.utils import random_email, random_lower_string
 
 
@@ -26,6 +32,9 @@ async def test_create_user(db: AsyncSession) -> None:
     assert user.email == email
     assert hasattr(user, "password")
     assert verify_password(password, user.password)
+    # the database fills both timestamps of a new user
+    assert user.created is not None
+    assert user.updated is not None
 
 
 @pytest.mark.asyncio
@@ -234,6 +243,115 @@ async def test_authenticate_by_username_success(db: AsyncSession) -> None:
     assert user_db == user_auth
 
 
+@pytest.mark.asyncio
+async def test_authenticate(db: AsyncSession) -> None:
+    """
+    Test authentication by email or username with one password verify.
+
+    Args:
+        db: SQLAlchemy async session
+
+    Returns:
+        None
+    """
+    password = random_lower_string(8)
+    user_data = schemas.UserCreate(
+        email=random_email(), username=random_lower_string(8), password=password
+    )
+    user_db = await crud.user.create(db, obj_in=user_data)
+
+    with mock.patch("app.crud.crud_user.check_password", wraps=check_password) as check:
+        for login in (user_data.email, user_data.username):
+            check.reset_mock()
+            user_auth = await crud.user.authenticate(db, login=login, password=password)
+            assert user_auth == user_db
+            check.assert_called_once()
+
+        check.reset_mock()
+        assert not await crud.user.authenticate(
+            db, login=user_data.email, password=random_lower_string(8)
+        )
+        check.assert_called_once()
+
+        check.reset_mock()
+        assert not await crud.user.authenticate(
+            db, login=random_email(), password=password
+        )
+        check.assert_called_once_with(password, dummy_password_hash())
+
+    # usernames stored before they were validated may contain "@"
+    legacy_username = f"{random_lower_string(8)}@x"
+    await crud.user.update_many(
+        db, ids=[user_db.id], obj_in={"username": legacy_username}
+    )
+    with mock.patch.object(db, "scalars", wraps=db.scalars) as scalars:
+        user_auth = await crud.user.authenticate(
+            db, login=legacy_username, password=password
+        )
+    assert user_auth.id == user_db.id
+    scalars.assert_called_once()
+
+    # a login matching one user's email and another's username is the email
+    other_password = random_lower_string(8)
+    other_db = await crud.user.create(
+        db,
+        obj_in=schemas.UserCreate(
+            email=random_email(),
+            username=random_lower_string(8),
+            password=other_password,
+        ),
+    )
+    await crud.user.update_many(
+        db, ids=[user_db.id], obj_in={"username": other_db.email}
+    )
+    user_auth = await crud.user.authenticate(
+        db, login=other_db.email, password=other_password
+    )
+    assert user_auth.id == other_db.id
+
+
+@pytest.mark.asyncio
+async def test_authenticate_rehashes_outdated_password(db: AsyncSession) -> None:
+    """
+    Test successful authentication schedules rehash of outdated password hash.
+
+    Args:
+        db: SQLAlchemy async session
+
+    Returns:
+        None
+    """
+    password = random_lower_string(8)
+    username = random_lower_string(8)
+    user_data = schemas.UserCreate(
+        email=random_email(), username=username, password=password
+    )
+    user_db = await crud.user.create(db, obj_in=user_data)
+    old_hash = user_db.password
+
+    background_tasks = BackgroundTasks()
+    await crud.user.authenticate_by_username(
+        db, username=username, password=password, background_tasks=background_tasks
+    )
+    assert not background_tasks.tasks
+
+    with mock.patch("app.crud.crud_user.password_needs_rehash", return_value=True):
+        await crud.user.authenticate_by_username(
+            db, username=username, password="wrong", background_tasks=background_tasks
+        )
+        assert not background_tasks.tasks
+        user_auth = await crud.user.authenticate_by_username(
+            db, username=username, password=password, background_tasks=background_tasks
+        )
+    assert user_auth == user_db
+    assert len(background_tasks.tasks) == 1
+
+    await background_tasks()
+    user_db = await crud.user.get(db, user_db.id)
+    assert user_db.password != old_hash
+    assert verify_password(password, user_db.password)
+
+
 @pytest.mark.asyncio
 async def test_authenticate_by_username_fail_invalid_password(db: AsyncSession) -> None:
     """
@@ -278,3 +396,141 @@ async def test_authenticate_by_email_fail_invalid_username(db: AsyncSession) ->
         db, username="wrong_username", password=password
     )
     assert user_auth is None
+
+
+@pytest.mark.asyncio
+async def test_create_and_update_many_users(db: AsyncSession) -> None:
+    """
+    Test bulk user create and update crud operations hash every password.
+
+    Args:
+        db: SQLAlchemy session
+
+    Returns:
+        None
+    """
+    passwords = [random_lower_string(8) for i in range(3)]
+    users_in = [
+        schemas.UserCreate(
+            username=random_lower_string(12), email=random_email(), password=password
+        )
+        for password in passwords
+    ]
+    users = await crud.user.create_many(db, objs_in=users_in)
+    users_by_name = {user.username: user for user in users}
+    for user_in, password in zip(users_in, passwords):
+        assert verify_password(password, users_by_name[user_in.username].password)
+
+    ids = [user.id for user in users]
+    new_password = random_lower_string(8)
+    users_upd = await crud.user.update_many(
+        db, ids=ids, obj_in=schemas.UserUpdate(password=new_password)
+    )
+    assert len(users_upd) == len(ids)
+    assert len({user.password for user in users_upd}) == len(ids)
+    for user in users_upd:
+        assert verify_password(new_password, user.password)
+
+    users_upd = await crud.user.update_many(db, ids=ids, obj_in={"confirmed": True})
+    assert all(user.confirmed for user in users_upd)
+
+
+@pytest.mark.asyncio
+async def test_create_unique_user(engine: AsyncEngine) -> None:
+    """
+    Test conflict-aware user create crud operation.
+
+    Conflicts roll the session back, so the test uses its own session.
+
+    Args:
+        engine: SQLAlchemy async engine
+
+    Returns:
+        None
+    """
+    user_in = schemas.UserCreate(
+        username=random_lower_string(12),
+        email=random_email(),
+        password=random_lower_string(8),
+    )
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        user, conflict = await crud.user.create_unique(db, obj_in=user_in.copy())
+        assert conflict is None
+        assert user.id and user.created
+        assert user.username == user_in.username
+
+        taken_email = user_in.copy(update={"username": random_lower_string(12)})
+        user, conflict = await crud.user.create_unique(db, obj_in=taken_email)
+        assert user is None
+        assert conflict == "email"
+
+        taken_username = user_in.copy(update={"email": random_email()})
+        user, conflict = await crud.user.create_unique(db, obj_in=taken_username)
+        assert user is None
+        assert conflict == "username"
+
+        free = user_in.copy(
+            update={"username": random_lower_string(12), "email": random_email()}
+        )
+        assert await crud.user.get_conflict(db, obj_in=free) is None
+
+
+@pytest.mark.asyncio
+async def test_create_unique_user_on_conflict_do_nothing(
+    db: AsyncSession, some_user_for_session: models.User
+) -> None:
+    """
+    Test conflict-aware user create crud operation with ON CONFLICT insert.
+
+    Args:
+        db: SQLAlchemy session
+        some_user_for_session: random user created in db
+
+    Returns:
+        None
+    """
+    with mock.patch.dict(ON_CONFLICT_INSERTS, {"sqlite": sqlite_insert}):
+        user_in = schemas.UserCreate(
+            username=random_lower_string(12),
+            email=random_email(),
+            password=random_lower_string(8),
+        )
+        user, conflict = await crud.user.create_unique(db, obj_in=user_in)
+        assert conflict is None
+        assert user.username == user_in.username
+
+        user_in = schemas.UserCreate(
+            username=some_user_for_session.username,
+            email=random_email(),
+            password=random_lower_string(8),
+        )
+        user, conflict = await crud.user.create_unique(db, obj_in=user_in)
+        assert user is None
+        assert conflict == "username"
+
+
+@pytest.mark.asyncio
+async def test_create_unique_user_reraises_other_errors(engine: AsyncEngine) -> None:
+    """
+    Test conflict-aware user create keeps errors other than unique violations.
+
+    Args:
+        engine: SQLAlchemy async engine
+
+    Returns:
+        None
+    """
+    user_in = schemas.UserCreate(
+        username=random_lower_string(12),
+        email=random_email(),
+        password=random_lower_string(8),
+    )
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        with mock.patch.object(
+            crud.user, "get_conflict", mock.AsyncMock(return_value=None)
+        ):
+            with mock.patch.object(
+                db, "scalars", mock.AsyncMock(side_effect=IntegrityError("", {}, None))
+            ):
+                with pytest.raises(IntegrityError):
+                    await crud.user.create_unique(db, obj_in=user_in)
@@ -20,6 +20,25 @@ async def test_init_db_without_first_user_email(
         with mock.patch.object(app.db.database, "settings", settings):
             from app.db.database import app_init_db
 
+            from app.db.session import engine
+
             app = FastAPI()
             await app_init_db(app)
-            assert isinstance(app.state.db, AsyncSession)
+            assert app.state.db_engines[0] is engine
+            async with app.state.async_session() as session:
+                assert isinstance(session, AsyncSession)
+
+
+@pytest.mark.asyncio
+async def test_dispose_db(settings_env_dict_function_scope: dict) -> None:
+    with mock.patch.dict(os.environ, settings_env_dict_function_scope):
+        from app.db.database import app_dispose_db
+
+        app = FastAPI()
+        engines = [mock.AsyncMock(), mock.AsyncMock()]
+        app.state.db_engines = list(engines)
+        await app_dispose_db(app)
+        assert app.state.async_session is None
+        assert app.state.db_engines == []
+        for engine in engines:
+            engine.dispose.assert_awaited_once()
@@ -0,0 +1,63 @@
+import random
+import time
+from unittest import mock
+
+import pytest
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.db.login_failures import FAILURE_SCRIPT, LoginFailures
+
+
+@pytest.mark.asyncio
+async def test_login_failures_with_redis_mock() -> None:
+    redis = mock.MagicMock()
+    redis.hget = mock.AsyncMock(return_value=str(time.time() + 30).encode())
+    redis.delete = mock.AsyncMock()
+    script = redis.register_script.return_value = mock.AsyncMock(return_value=4)
+    failures = LoginFailures()
+    account = failures.account("User")
+    assert account == "login:user"
+    assert failures.account("User", 42) == "user:42"
+    assert await failures.locked_for(account) == 0
+
+    failures.start(redis, threshold=3, base=1, max_delay=60, window=600)
+    redis.register_script.assert_called_once_with(FAILURE_SCRIPT)
+    assert 29 < await failures.locked_for(account) <= 30
+    redis.hget.assert_awaited_once_with("lf:login:user", "until")
+    assert await failures.fail(account) == 4
+    assert script.call_args.kwargs["keys"] == ["lf:login:user"]
+    assert script.call_args.kwargs["args"][1:] == [3, 1, 60, 600]
+    await failures.reset(account)
+    redis.delete.assert_awaited_once_with("lf:login:user")
+
+    redis.hget.return_value = str(time.time() - 1).encode()
+    assert await failures.locked_for(account) == 0
+    redis.hget.side_effect = RedisConnectionError()
+    script.side_effect = RedisConnectionError()
+    assert await failures.locked_for(account) == 0
+    assert await failures.fail(account) == 0
+    redis.delete.side_effect = RedisConnectionError()
+    await failures.reset(account)
+    assert failures.as_dict() == {"locked": 1, "failures": 2, "errors": 3}
+    redis.register_script.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_login_lockout_backoff(get_redis: Redis) -> None:
+    try:
+        await get_redis.ping()
+    except RedisConnectionError:
+        pytest.skip("Redis server isn't available.")
+
+    failures = LoginFailures()
+    failures.start(get_redis, threshold=3, base=2, max_delay=5, window=60)
+    login = failures.account(f"test-{random.randint(10**9, 10**10)}")
+    try:
+        assert [await failures.fail(login) for _ in range(6)] == [0, 0, 2, 4, 5, 5]
+        assert 4 < await failures.locked_for(login) <= 5
+        assert 0 < await get_redis.ttl(failures.key(login)) <= 60
+        await failures.reset(login)
+        assert await failures.locked_for(login) == 0
+    finally:
+        await get_redis.delete(failures.key(login))
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.db.pool import (
+    Histogram,
+    PoolMetrics,
+    compute_pool_size,
+    get_pool_options,
+    instrumented_pool_class,
+)
+
+
+def test_histogram() -> None:
+    histogram = Histogram([1, 10])
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    assert histogram.as_dict() == {
+        "buckets": {"le_1": 2, "le_10": 3, "le_inf": 4},
+        "count": 4,
+        "sum": 56.5,
+    }
+
+
+def test_compute_pool_size() -> None:
+    pool_size, max_overflow = compute_pool_size(
+        max_connections=100, reserved_connections=5, workers=4
+    )
+    assert pool_size + max_overflow == 23
+    assert pool_size > max_overflow
+    assert compute_pool_size(10, 5, 16) == (1, 0)
+
+
+def test_get_pool_options() -> None:
+    settings = SimpleNamespace(
+        SQLALCHEMY_POOL_SIZE=50,
+        SQLALCHEMY_MAX_OVERFLOW=10,
+        SQLALCHEMY_POOL_RECYCLE=300,
+        SQLALCHEMY_POOL_AUTOSIZE=False,
+        SQLALCHEMY_SERVER_MAX_CONNECTIONS=100,
+        SQLALCHEMY_RESERVED_CONNECTIONS=0,
+        SERVER_WORKERS=2,
+    )
+    assert get_pool_options(settings) == {
+        "pool_size": 50,
+        "max_overflow": 10,
+        "pool_recycle": 300,
+    }
+    settings.SQLALCHEMY_POOL_AUTOSIZE = True
+    assert get_pool_options(settings) == {
+        "pool_size": 40,
+        "max_overflow": 10,
+        "pool_recycle": 300,
+    }
+
+
+def test_instrumented_pool_measures_checkout_wait() -> None:
+    metrics = PoolMetrics()
+    pool_class = instrumented_pool_class(metrics)
+    pool = pool_class(creator=mock.MagicMock, pool_size=1, max_overflow=0)
+    connection = pool.connect()
+    connection.close()
+    assert metrics.checkout_wait_ms.count == 1
+    recreated = pool.recreate()
+    recreated.connect().close()
+    assert metrics.checkout_wait_ms.count == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_metrics_events() -> None:
+    engine = create_async_engine(
+        "sqlite+aiosqlite://", poolclass=AsyncAdaptedQueuePool, pool_size=1
+    )
+    metrics = PoolMetrics()
+    metrics.attach(engine)
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        await conn.invalidate()
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+    stats = metrics.as_dict(engine.sync_engine.pool)
+    assert stats["checkouts"] == 2
+    assert stats["connects"] == 2
+    assert stats["invalidated"] == 1
+    assert stats["recycled"] == 1
+    assert stats["checkedout"] == 0
+    assert stats["checkout_wait_ms"]["count"] == 0
+    await engine.dispose()
@@ -0,0 +1,101 @@
+import asyncio
+import random
+from unittest import mock
+
+import pytest
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.db.rate_limits import ACQUIRE_SCRIPT, Limit, RateLimiter
+
+
+def test_limit_key() -> None:
+    limit = Limit("ip", 60, 5)
+    assert limit.rate == 1
+    assert limit.key("127.0.0.1") == "rl:ip:127.0.0.1"
+
+
+@pytest.mark.asyncio
+async def test_local_buckets() -> None:
+    limiter = RateLimiter()
+    limiter.local_size = 2
+    ip_limit = Limit("ip", 60, 3)
+    username_limit = Limit("username", 60, 2)
+    buckets = [(ip_limit, "1.1.1.1"), (username_limit, "user")]
+
+    assert await limiter.acquire(buckets) == 0
+    assert await limiter.acquire(buckets) == 0
+    wait = await limiter.acquire(buckets)
+    assert 0 < wait <= 1
+    # rejected attempt doesn't take tokens from the other bucket
+    assert limiter.local[ip_limit.key("1.1.1.1")][0] == pytest.approx(1, abs=0.01)
+    assert await limiter.acquire([(ip_limit, "1.1.1.1")]) == 0
+    # zero burst or rate disables a limit
+    assert await limiter.acquire([(Limit("ip", 60, 0), "1.1.1.1")]) == 0
+    for _ in range(3):
+        assert await limiter.acquire([(Limit("ip", 0, 1), "3.3.3.3")]) == 0
+    assert Limit("ip", 0, 1).key("3.3.3.3") not in limiter.local
+
+    await limiter.acquire([(ip_limit, "2.2.2.2")])
+    assert len(limiter.local) == 2
+    assert limiter.as_dict()["rejected"] == 1
+    assert limiter.as_dict()["allowed"] == 4
+
+
+@pytest.mark.asyncio
+async def test_redis_buckets_fallback() -> None:
+    redis = mock.MagicMock()
+    acquire = redis.register_script.return_value = mock.AsyncMock(return_value=1500)
+    limiter = RateLimiter()
+    limiter.start(redis, timeout=0.05, fallback=60, local_size=10)
+    limit = Limit("ip", 30, 10)
+
+    assert await limiter.acquire([(limit, "1.1.1.1")]) == 1.5
+    assert acquire.call_args.kwargs["keys"] == ["rl:ip:1.1.1.1"]
+    assert acquire.call_args.kwargs["args"][1:] == [0.5, 10]
+
+    acquire.side_effect = RedisConnectionError()
+    assert await limiter.acquire([(limit, "1.1.1.1")]) == 0
+    assert limiter.as_dict()["errors"] == 1
+    # redis isn't asked again until fallback period ends
+    assert await limiter.acquire([(limit, "1.1.1.1")]) == 0
+    assert acquire.await_count == 2
+    assert limiter.as_dict()["fallbacks"] == 2
+    # the script is registered once when the limiter starts
+    redis.register_script.assert_called_once_with(ACQUIRE_SCRIPT)
+
+    async def slow(**kwargs: dict) -> int:
+        await asyncio.sleep(0.05)
+        return 0
+
+    limiter.start(redis, timeout=0.01, fallback=60, local_size=10)
+    acquire.side_effect = slow
+    assert await limiter.acquire([(limit, "1.1.1.1")]) == 0
+    assert limiter.as_dict()["errors"] == 2
+    # the late reply is still read
+    await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_redis_token_bucket(get_redis: Redis) -> None:
+    try:
+        await get_redis.ping()
+    except RedisConnectionError:
+        pytest.skip("Redis server isn't available.")
+
+    limiter = RateLimiter()
+    limiter.start(get_redis, timeout=1, fallback=60, local_size=10)
+    ip = f"test-{random.randint(10**9, 10**10)}"
+    ip_limit = Limit("ip", 60, 3)
+    username_limit = Limit("username", 60, 2)
+    buckets = [(ip_limit, ip), (username_limit, ip)]
+    try:
+        results = await asyncio.gather(*(limiter.acquire(buckets) for _ in range(5)))
+        assert results.count(0) == 2
+        assert all(0 < wait <= 1 for wait in results if wait)
+        assert float(await get_redis.hget(ip_limit.key(ip), "t")) == pytest.approx(
+            1, abs=0.01
+        )
+        assert limiter.as_dict()["errors"] == 0
+    finally:
+        await get_redis.delete(ip_limit.key(ip), username_limit.key(ip))
@@ -0,0 +1,186 @@
+import asyncio
+import random
+from datetime import timedelta
+from unittest import mock
+from uuid import uuid4
+
+import pytest
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.db.refresh_tokens import (
+    REVOKE_ALL_SCRIPT,
+    ROTATE_SCRIPT,
+    list_sessions,
+    revoke_refresh_token,
+    revoke_session,
+    revoke_sessions,
+    rotate_refresh_token,
+    store_refresh_token,
+    token_key,
+    user_key,
+)
+from app.utils.digest import DIGEST_SIZE, jti_digest
+
+
+def get_redis_mock() -> mock.MagicMock:
+    """
+    Create redis mock with async commands and pipeline.
+
+    Returns:
+        redis mock
+    """
+    redis = mock.MagicMock()
+    redis.get = mock.AsyncMock(return_value=None)
+    pipe = mock.MagicMock()
+    pipe.execute = mock.AsyncMock(return_value=[])
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    return redis
+
+
+def test_jti_digest() -> None:
+    digest = jti_digest("jti")
+    assert len(digest) == DIGEST_SIZE
+    assert digest == jti_digest("jti") != jti_digest("other jti")
+    assert token_key(digest) == b"rt:" + digest
+    assert user_key(1) == "ru:1"
+
+
+@pytest.mark.asyncio
+async def test_store_refresh_token() -> None:
+    redis = get_redis_mock()
+    expire = timedelta(days=8)
+    await store_refresh_token(redis, user_id=1, jti="jti", expire=expire)
+    pipe = redis.pipeline.return_value.__aenter__.return_value
+    digest = jti_digest("jti")
+    pipe.set.assert_called_once_with(token_key(digest), 1, ex=expire)
+    assert pipe.zremrangebyscore.call_args.args[:2] == (user_key(1), "-inf")
+    assert list(pipe.zadd.call_args.args[1]) == [digest]
+    pipe.expire.assert_called_once_with(user_key(1), expire)
+    pipe.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_rotate_refresh_token() -> None:
+    redis = get_redis_mock()
+    rotate = redis.register_script.return_value = mock.AsyncMock(return_value=1)
+    expire = timedelta(days=8)
+
+    assert await rotate_refresh_token(
+        redis, user_id=1, jti="old", new_jti="new", expire=expire
+    )
+    keys = rotate.call_args.kwargs["keys"]
+    args = rotate.call_args.kwargs["args"]
+    assert keys == [
+        token_key(jti_digest("old")),
+        user_key(1),
+        token_key(jti_digest("new")),
+    ]
+    assert args[:4] == [1, jti_digest("old"), jti_digest("new"), 8 * 24 * 3600]
+
+    rotate.return_value = 0
+    assert not await rotate_refresh_token(
+        redis, user_id=1, jti="old", new_jti="new", expire=expire
+    )
+    # the script is registered on the client once
+    redis.register_script.assert_called_once_with(ROTATE_SCRIPT)
+
+
+@pytest.mark.asyncio
+async def test_list_and_revoke_sessions() -> None:
+    redis = get_redis_mock()
+    pipe = redis.pipeline.return_value.__aenter__.return_value
+    sessions = [(jti_digest("jti"), 1700000000.0)]
+    pipe.execute.return_value = [2, sessions]
+    assert await list_sessions(redis, user_id=1) == sessions
+    assert pipe.zremrangebyscore.call_args.args[:2] == (user_key(1), "-inf")
+    pipe.zrange.assert_called_once_with(user_key(1), 0, -1, withscores=True)
+
+    pipe.execute.return_value = [1, 1]
+    assert await revoke_session(redis, user_id=1, digest=jti_digest("jti"))
+    pipe.delete.assert_called_once_with(token_key(jti_digest("jti")))
+    pipe.zrem.assert_called_once_with(user_key(1), jti_digest("jti"))
+    pipe.execute.return_value = [0, 0]
+    assert not await revoke_session(redis, user_id=1, digest=jti_digest("jti"))
+
+    pipe.delete.reset_mock()
+    await revoke_refresh_token(redis, user_id=1, jti="jti")
+    pipe.delete.assert_called_once_with(token_key(jti_digest("jti")))
+
+    revoke_all = redis.register_script.return_value = mock.AsyncMock(
+        return_value=[jti_digest("jti")]
+    )
+    assert await revoke_sessions(redis, user_id=1) == [jti_digest("jti")]
+    revoke_all.assert_awaited_once_with(keys=[user_key(1)], args=[b"rt:"])
+    await revoke_sessions(redis, user_id=1)
+    # the script is registered on the client once
+    redis.register_script.assert_called_once_with(REVOKE_ALL_SCRIPT)
+
+
+@pytest.mark.asyncio
+async def test_parallel_refreshes_rotate_once(get_redis: Redis) -> None:
+    try:
+        await get_redis.ping()
+    except RedisConnectionError:
+        pytest.skip("Redis server isn't available.")
+
+    user_id = random.randint(10**9, 10**10)
+    jti = uuid4().hex
+    expire = timedelta(minutes=1)
+    await store_refresh_token(get_redis, user_id=user_id, jti=jti, expire=expire)
+    new_jtis = [uuid4().hex for _ in range(20)]
+    try:
+        results = await asyncio.gather(
+            *(
+                rotate_refresh_token(
+                    get_redis, user_id=user_id, jti=jti, new_jti=new_jti, expire=expire
+                )
+                for new_jti in new_jtis
+            )
+        )
+        assert results.count(True) == 1
+        winner = new_jtis[results.index(True)]
+        assert await get_redis.zrange(user_key(user_id), 0, -1) == [jti_digest(winner)]
+        assert await get_redis.get(token_key(jti_digest(jti))) is None
+        assert not await rotate_refresh_token(
+            get_redis, user_id=user_id + 1, jti=winner, new_jti=jti, expire=expire
+        )
+    finally:
+        await get_redis.delete(
+            user_key(user_id), *(token_key(jti_digest(j)) for j in new_jtis)
+        )
+
+
+@pytest.mark.asyncio
+async def test_sessions_trimmed_and_revoked(get_redis: Redis) -> None:
+    try:
+        await get_redis.ping()
+    except RedisConnectionError:
+        pytest.skip("Redis server isn't available.")
+
+    user_id = random.randint(10**9, 10**10)
+    jtis = [uuid4().hex for _ in range(3)]
+    try:
+        for jti in jtis:
+            await store_refresh_token(
+                get_redis, user_id=user_id, jti=jti, expire=timedelta(minutes=1)
+            )
+        await get_redis.zadd(user_key(user_id), {b"expired": 1})
+        sessions = await list_sessions(get_redis, user_id=user_id)
+        assert sorted(digest for digest, _ in sessions) == sorted(
+            jti_digest(jti) for jti in jtis
+        )
+        assert await get_redis.zcard(user_key(user_id)) == len(jtis)
+
+        assert await revoke_session(
+            get_redis, user_id=user_id, digest=jti_digest(jtis[0])
+        )
+        revoked = await revoke_sessions(get_redis, user_id=user_id)
+        assert sorted(revoked) == sorted(jti_digest(jti) for jti in jtis[1:])
+        assert not await get_redis.exists(
+            user_key(user_id), *(token_key(jti_digest(jti)) for jti in jtis)
+        )
+    finally:
+        await get_redis.delete(
+            user_key(user_id), *(token_key(jti_digest(jti)) for jti in jtis)
+        )
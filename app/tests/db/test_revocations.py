@@ -0,0 +1,106 @@
+import asyncio
+import time
+from unittest import mock
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from app.db.revocations import (
+    REVOKED_KEY_PREFIX,
+    REVOKED_STREAM,
+    TokenRevocations,
+)
+from app.utils.bloom import BloomFilter
+from app.utils.digest import jti_digest
+
+
+def get_redis_mock() -> mock.MagicMock:
+    """
+    Create redis mock with async commands and pipeline.
+
+    Returns:
+        redis mock
+    """
+    redis = mock.MagicMock()
+    redis.xread = mock.AsyncMock(return_value=[])
+    redis.exists = mock.AsyncMock(return_value=1)
+    pipe = mock.MagicMock()
+    pipe.execute = mock.AsyncMock(return_value=[])
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    return redis
+
+
+def test_bloom_filter() -> None:
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [str(i).encode() for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(str(-i).encode() in bloom for i in range(1, 10001))
+    assert false_positives < 300
+    assert bloom.count == 1000
+
+
+@pytest.mark.asyncio
+async def test_token_revocations() -> None:
+    redis = get_redis_mock()
+    revoked = jti_digest("revoked")
+    redis.xread.side_effect = [
+        [[REVOKED_STREAM.encode(), [(b"1-0", {b"d": revoked})]]],
+        ConnectionError(),
+    ]
+    revocations = TokenRevocations()
+    with mock.patch("app.db.revocations.SYNC_RETRY_SECONDS", 0):
+        await revocations.start(redis, lifetime=60, capacity=100, error_rate=0.01)
+        redis.xread.assert_awaited_once_with({REVOKED_STREAM: "0-0"}, block=None)
+        assert revocations.last_id == b"1-0"
+        await asyncio.sleep(0)
+        await revocations.stop()
+    assert revocations.task is None
+
+    revocations.redis = redis
+    assert not await revocations.is_revoked("live")
+    redis.exists.assert_not_awaited()
+    assert await revocations.is_revoked("revoked")
+    redis.exists.assert_awaited_once_with(REVOKED_KEY_PREFIX + revoked)
+    redis.exists.return_value = 0
+    assert not await revocations.is_revoked("revoked")
+    redis.exists.side_effect = ConnectionError()
+    assert await revocations.is_revoked("revoked")
+
+    # without redis filter hits are trusted
+    revocations.redis = None
+    assert await revocations.is_revoked("revoked")
+    revocations.redis = redis
+
+    await revocations.revoke("other")
+    pipe = redis.pipeline.return_value.__aenter__.return_value
+    pipe.set.assert_called_once_with(REVOKED_KEY_PREFIX + jti_digest("other"), 1, ex=60)
+    assert pipe.xadd.call_args.args == (REVOKED_STREAM, {"d": jti_digest("other")})
+    assert jti_digest("other") in revocations.filters[0]
+
+    with mock.patch("time.monotonic", return_value=time.monotonic() + 61):
+        revocations.add(jti_digest("new"))
+    assert len(revocations.filters) == 2
+    assert jti_digest("other") in revocations.filters[1]
+    assert jti_digest("new") in revocations.filters[0]
+    assert revocations.as_dict() == {
+        "filter_items": 3,
+        "filter_hits": 4,
+        "revoked_hits": 1,
+        "synced": 1,
+        "errors": 2,
+    }
+
+
+@pytest.mark.asyncio
+async def test_token_revocations_start_without_sync() -> None:
+    redis = get_redis_mock()
+    redis.xread.side_effect = ConnectionError()
+    revocations = TokenRevocations()
+    with mock.patch("app.db.revocations.SYNC_RETRY_SECONDS", 0):
+        await revocations.start(redis, lifetime=60, capacity=100, error_rate=0.01)
+        assert revocations.last_id == "0-0"
+        assert revocations.as_dict()["errors"] >= 1
+        await revocations.stop()
+    assert revocations.task is None
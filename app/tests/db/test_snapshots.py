@@ -0,0 +1,171 @@
+import os
+import time
+from unittest import mock
+
+import pytest
+from redis.exceptions import ConnectionError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models, schemas
+from app.db.snapshots import SNAPSHOT_KEY, VERSION_KEY, UserSnapshots
+
+
+def get_redis_mock() -> mock.MagicMock:
+    """
+    Create redis mock with async commands.
+
+    Returns:
+        redis mock
+    """
+    redis = mock.MagicMock()
+    redis.mget = mock.AsyncMock(return_value=[None, None])
+    redis.set = mock.AsyncMock(return_value=True)
+    pipe = mock.MagicMock()
+    pipe.execute = mock.AsyncMock(return_value=[])
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    return redis
+
+
+@pytest.mark.asyncio
+async def test_get_snapshot_without_redis(
+    db: AsyncSession, some_user_for_function: models.User
+) -> None:
+    user_id = some_user_for_function.id
+    snapshots = UserSnapshots()
+    snapshot = await snapshots.get(db, user_id)
+    assert snapshot == schemas.UserSnapshot(
+        id=user_id,
+        is_active=some_user_for_function.is_active,
+        is_superuser=some_user_for_function.is_superuser,
+        updated=some_user_for_function.updated,
+    )
+    assert snapshot.updated is not None
+    assert not snapshots.local
+
+    snapshots.local_ttl = 5
+    snapshots.local_size = 1
+    await snapshots.get(db, user_id)
+    with mock.patch.object(snapshots, "load") as load:
+        assert await snapshots.get(db, user_id) == snapshot
+        load.assert_not_called()
+    assert snapshots.as_dict()["local_hits"] == 1
+
+    with mock.patch("time.monotonic", return_value=time.monotonic() + 10):
+        assert snapshots.get_local(user_id) is None
+    assert not snapshots.local
+    snapshots.set_local(snapshot.copy(update={"id": -1}))
+    snapshots.set_local(snapshot)
+    assert list(snapshots.local) == [user_id]
+
+    await snapshots.bump(user_id)
+    assert not snapshots.local
+    assert await snapshots.get(db, -1) is None
+
+
+@pytest.mark.asyncio
+async def test_get_snapshot_with_redis(
+    db: AsyncSession, some_user_for_function: models.User
+) -> None:
+    user_id = some_user_for_function.id
+    redis = get_redis_mock()
+    snapshots = UserSnapshots()
+    snapshots.start(redis, ttl=60, local_ttl=0, local_size=0)
+
+    redis.mget.return_value = [None, b"3"]
+    snapshot = await snapshots.get(db, user_id)
+    assert snapshot.version == 3
+    redis.mget.assert_awaited_once_with(
+        SNAPSHOT_KEY.format(user_id), VERSION_KEY.format(user_id)
+    )
+    redis.set.assert_awaited_once_with(
+        SNAPSHOT_KEY.format(user_id), snapshot.json(), ex=60
+    )
+
+    redis.mget.return_value = [snapshot.json().encode(), b"3"]
+    with mock.patch.object(snapshots, "load") as load:
+        assert await snapshots.get(db, user_id) == snapshot
+        load.assert_not_called()
+
+    redis.mget.return_value = [snapshot.json().encode(), b"4"]
+    assert (await snapshots.get(db, user_id)).version == 4
+    assert snapshots.as_dict() == {
+        "local_size": 0,
+        "local_hits": 0,
+        "hits": 1,
+        "misses": 2,
+        "errors": 0,
+    }
+
+    redis.mget.side_effect = ConnectionError()
+    assert (await snapshots.get(db, user_id)).version == 0
+    assert snapshots.as_dict()["errors"] == 1
+    assert redis.set.await_count == 2
+
+    redis.mget.side_effect = None
+    redis.set.side_effect = ConnectionError()
+    assert (await snapshots.get(db, user_id)).version == 4
+    assert snapshots.as_dict()["errors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_load_snapshot_from_primary(
+    db: AsyncSession, some_user_for_function: models.User
+) -> None:
+    from app.tests.utils.utils import get_settings_env_dict
+
+    with mock.patch.dict(os.environ, get_settings_env_dict()):
+        from app.db.session import USE_PRIMARY
+
+    with mock.patch.object(db, "execute", wraps=db.execute) as execute:
+        snapshot = await UserSnapshots().get(db, some_user_for_function.id)
+    assert snapshot.id == some_user_for_function.id
+    assert execute.call_args.kwargs["bind_arguments"] == {USE_PRIMARY: True}
+
+
+@pytest.mark.asyncio
+async def test_bump_snapshot() -> None:
+    redis = get_redis_mock()
+    snapshots = UserSnapshots()
+    snapshots.start(redis, ttl=60, local_ttl=5, local_size=10)
+    snapshots.set_local(schemas.UserSnapshot(id=1, is_active=True, is_superuser=False))
+
+    await snapshots.bump(1, 2)
+    assert not snapshots.local
+    pipe = redis.pipeline.return_value.__aenter__.return_value
+    pipe.incr.assert_has_calls(
+        [mock.call(VERSION_KEY.format(1)), mock.call(VERSION_KEY.format(2))]
+    )
+    pipe.expire.assert_any_call(VERSION_KEY.format(1), 120)
+    pipe.delete.assert_any_call(SNAPSHOT_KEY.format(2))
+    pipe.execute.assert_awaited_once()
+
+    pipe.execute.side_effect = ConnectionError()
+    await snapshots.bump(1)
+    assert snapshots.as_dict()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_user_changes_bump_snapshots(
+    db: AsyncSession, some_user_for_function: models.User
+) -> None:
+    user_id = some_user_for_function.id
+    with mock.patch("app.crud.crud_user.user_snapshots") as snapshots:
+        snapshots.bump = mock.AsyncMock()
+        await crud.user.update(
+            db,
+            obj_db=some_user_for_function,
+            obj_in=schemas.UserUpdate(is_active=False),
+        )
+        snapshots.bump.assert_awaited_once_with(user_id)
+
+        snapshots.bump.reset_mock()
+        await crud.user.update_many(db, ids=[user_id], obj_in={"is_active": True})
+        snapshots.bump.assert_awaited_once_with(user_id)
+
+        snapshots.bump.reset_mock()
+        await crud.user.remove_many(db, ids=[user_id])
+        snapshots.bump.assert_awaited_once_with(user_id)
+
+        snapshots.bump.reset_mock()
+        await crud.user.remove(db, id=user_id)
+        snapshots.bump.assert_awaited_once_with(user_id)
@@ -0,0 +1,67 @@
+import os
+from unittest import mock
+
+import pytest
+
+from app.tests.utils.utils import get_settings_env_dict
+
+
+def get_request(headers: dict, host: str = "10.0.0.1") -> mock.MagicMock:
+    """
+    Build request mock with JSON body.
+
+    Args:
+        headers: request headers
+        host: address of the peer, None if it's unknown
+
+    Returns:
+        request mock
+    """
+    request = mock.MagicMock()
+    request.headers = headers
+    request.client = mock.MagicMock(host=host) if host else None
+    request.json = mock.AsyncMock(return_value={})
+    return request
+
+
+def test_client_address_behind_proxies() -> None:
+    with mock.patch.dict(os.environ, get_settings_env_dict()):
+        from app.core.config import settings
+        from app.dependencies.admission import client_address
+
+    forwarded = {"x-forwarded-for": "6.6.6.6, 1.1.1.1 ,10.0.0.2"}
+    assert client_address(get_request(forwarded)) == "10.0.0.1"
+    assert client_address(get_request({}, host=None)) is None
+    with mock.patch.object(settings, "RATE_LIMIT_TRUSTED_PROXIES", 2):
+        assert client_address(get_request(forwarded)) == "1.1.1.1"
+        assert client_address(get_request({})) == "10.0.0.1"
+    with mock.patch.object(settings, "RATE_LIMIT_TRUSTED_PROXIES", 5):
+        assert client_address(get_request(forwarded)) == "6.6.6.6"
+
+
+@pytest.mark.asyncio
+async def test_limit_credential_attempts_buckets() -> None:
+    with mock.patch.dict(os.environ, get_settings_env_dict()):
+        from app.dependencies.admission import (
+            ip_limit,
+            limit_credential_attempts,
+            username_limit,
+        )
+
+    with mock.patch(
+        "app.dependencies.admission.rate_limiter.acquire", return_value=0
+    ) as acquire:
+        request = get_request({"content-type": "application/json"})
+        request.json.return_value = {"username": "User"}
+        await limit_credential_attempts(request)
+        acquire.assert_awaited_with([(ip_limit, "10.0.0.1"), (username_limit, "user")])
+
+        request = get_request({}, host=None)
+        request.json.side_effect = ValueError()
+        await limit_credential_attempts(request)
+        acquire.assert_awaited_with([])
+
+        request = get_request({})
+        request.json.return_value = ["not", "a", "form"]
+        await limit_credential_attempts(request)
+        acquire.assert_awaited_with([(ip_limit, "10.0.0.1")])
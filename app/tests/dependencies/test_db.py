@@ -0,0 +1,119 @@
+import os
+import time
+from typing import Optional
+from unittest import mock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import Response
+
+from app.tests.utils.utils import get_settings_env_dict
+
+
+def get_request(cookies: Optional[dict] = None) -> mock.MagicMock:
+    """
+    Build request mock with the application session factory.
+
+    Args:
+        cookies: request cookies
+
+    Returns:
+        request mock
+    """
+    from app.db.session import async_session
+
+    request = mock.MagicMock()
+    request.app.state.async_session = async_session
+    request.cookies = cookies or {}
+    return request
+
+
+@pytest.mark.asyncio
+async def test_get_db_commits_and_closes() -> None:
+    with mock.patch.dict(os.environ, get_settings_env_dict()):
+        from app.dependencies.db import get_db
+
+    db_gen = get_db(get_request(), Response())
+    session = await db_gen.__anext__()
+    assert isinstance(session, AsyncSession)
+    with mock.patch.object(session, "commit", wraps=session.commit) as commit:
+        with pytest.raises(StopAsyncIteration):
+            await db_gen.__anext__()
+        commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_db_rollbacks_on_error() -> None:
+    with mock.patch.dict(os.environ, get_settings_env_dict()):
+        from app.dependencies.db import get_db
+
+    db_gen = get_db(get_request(), Response())
+    session = await db_gen.__anext__()
+    with mock.patch.object(session, "rollback", wraps=session.rollback) as rollback:
+        with pytest.raises(RuntimeError):
+            await db_gen.athrow(RuntimeError("request failed"))
+        rollback.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_db_sessions_are_request_scoped() -> None:
+    with mock.patch.dict(os.environ, get_settings_env_dict()):
+        from app.dependencies.db import get_db
+
+    request = get_request()
+    first_gen = get_db(request, Response())
+    second_gen = get_db(request, Response())
+    first, second = await first_gen.__anext__(), await second_gen.__anext__()
+    assert first is not second
+    await first_gen.aclose()
+    await second_gen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_get_db_pins_recent_writer_to_primary() -> None:
+    with mock.patch.dict(os.environ, get_settings_env_dict()):
+        from app.db.session import USE_PRIMARY
+        from app.dependencies.db import get_db, READ_YOUR_WRITES_COOKIE
+
+    cookies = {READ_YOUR_WRITES_COOKIE: str(time.time() + 60)}
+    db_gen = get_db(get_request(cookies), Response())
+    session = await db_gen.__anext__()
+    assert session.info.get(USE_PRIMARY)
+    await db_gen.aclose()
+
+    for value in (str(time.time() - 1), "invalid"):
+        db_gen = get_db(get_request({READ_YOUR_WRITES_COOKIE: value}), Response())
+        session = await db_gen.__anext__()
+        assert not session.info.get(USE_PRIMARY)
+        await db_gen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_get_db_sets_read_your_writes_cookie_on_write() -> None:
+    with mock.patch.dict(os.environ, get_settings_env_dict()):
+        from app.dependencies.db import get_db, READ_YOUR_WRITES_COOKIE
+
+    response = Response()
+    db_gen = get_db(get_request(), response)
+    session = await db_gen.__anext__()
+    session.sync_session.get_bind()
+    assert READ_YOUR_WRITES_COOKIE not in response.headers.get("set-cookie", "")
+    session.sync_session._flushing = True
+    session.sync_session.get_bind()
+    session.sync_session._flushing = False
+    assert READ_YOUR_WRITES_COOKIE in response.headers["set-cookie"]
+    await db_gen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_get_db_without_read_your_writes_window() -> None:
+    with mock.patch.dict(os.environ, get_settings_env_dict()):
+        from app.core.config import settings
+        from app.db.session import ON_WRITE
+        from app.dependencies.db import get_db
+
+    with mock.patch.object(settings, "SQLALCHEMY_READ_YOUR_WRITES_SECONDS", 0):
+        db_gen = get_db(get_request(), Response())
+        session = await db_gen.__anext__()
+        assert ON_WRITE not in session.info
+        await db_gen.aclose()
@@ -9,7 +9,7 @@ from fastapi import FastAPI
 from httpx import AsyncClient
 from pydantic import BaseSettings
 from redis import Redis
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from starlette import status
 from starlette.middleware.cors import CORSMiddleware
 
@@ -56,3 +56,42 @@ async def test_read_main_without_cors(
                                 lambda x: isinstance(x, CORSMiddleware),
                                 app.user_middleware,
                             )
+
+
+@pytest.mark.asyncio
+async def test_read_metrics(
+    db: AsyncSession,
+    get_client: AsyncClient,
+    get_app: FastAPI,
+    settings_with_test_env: BaseSettings,
+) -> None:
+    from app import crud
+    from app.core.auth import create_tokens
+
+    await get_client.get(get_app.url_path_for("health-check"))
+    response = await get_client.get(get_app.url_path_for("metrics"))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    superuser = await crud.user.get_by_username(
+        db, username=settings_with_test_env.FIRST_SUPERUSER
+    )
+    token = create_tokens({"id": superuser.id, "jti": "jti", "token_type": "bearer"})
+    response = await get_client.get(
+        get_app.url_path_for("metrics"),
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["db_pool"]["primary"]["checkouts"] > 0
+    assert response.json()["password_hashing"]["rejected"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_cors_exposes_pagination_headers(
+    get_client: AsyncClient, get_app: FastAPI
+) -> None:
+    response = await get_client.get(
+        get_app.url_path_for("health-check"), headers={"Origin": "http://localhost"}
+    )
+    exposed = response.headers["access-control-expose-headers"].lower().split(", ")
+    assert "x-next-cursor" in exposed
+    assert "etag" in exposed
@@ -39,6 +39,8 @@ def get_settings_env_dict() -> dict:
         "FIRST_SUPERUSER": "admin",
         "FIRST_SUPERUSER_EMAIL": "admin@example.com",
         "FIRST_SUPERUSER_PASSWORD": "secretpwd",
+        "RATE_LIMIT_IP_BURST": "1000",
+        "RATE_LIMIT_USERNAME_BURST": "1000",
         "REDIS_HOST": "localhost",
         "REDIS_PORT": "6379",
         "SQLALCHEMY_DATABASE_DRIVER": "postgresql+asyncpg",
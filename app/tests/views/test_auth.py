@@ -1,5 +1,6 @@
 import json
 import uuid
+from unittest import mock
 
 import pytest
 from fastapi import FastAPI
@@ -11,7 +12,10 @@ from starlette import status
 from app import schemas, crud
 from app.core import auth
 from app.core.auth import create_access_token
-from app.schemas import TokenSubject, TokenPayload
+from app.core.security import PasswordHashingBusy, password_hash_pool
+from app.db.login_failures import login_failures
+from app.db.rate_limits import Limit
+from app.db.revocations import token_revocations
 from app.tests.utils.utils import random_lower_string, random_email
 
 
@@ -89,18 +93,16 @@ async def test_login_access_token_email(
     ), "JWT token should have 3 segments"
     access_payload = auth.decode_token(token.get("access_token"))
     assert "exp" in access_payload
-    access_sub = TokenSubject.parse_obj(json.loads(access_payload.get("sub")))
-    assert access_sub.email == user_data.email
-    assert access_sub.username == user_data.username
+    assert "email" not in access_payload
+    access_sub = auth.parse_subject(access_payload)
     assert access_sub.id == user_db.id
     assert access_sub.jti
     assert access_sub.scope == []
     assert access_sub.token_type == "access_token"
     refresh_payload = auth.decode_token(token.get("refresh_token"))
     assert "exp" in refresh_payload
-    refresh_sub = TokenSubject.parse_obj(json.loads(refresh_payload.get("sub")))
-    assert refresh_sub.email == user_data.email
-    assert refresh_sub.username == user_data.username
+    assert "email" not in refresh_payload
+    refresh_sub = auth.parse_subject(refresh_payload)
     assert refresh_sub.id == user_db.id
     assert refresh_sub.jti
     assert refresh_sub.scope == []
@@ -186,21 +188,53 @@ async def test_login_refresh_token(
     token = response.json()
     assert "refresh_token" in token
     refresh_token = token["refresh_token"]
-    payload = auth.decode_token(refresh_token)
-    token_data = TokenPayload.parse_obj(payload)
-    token_sub = TokenSubject.parse_obj(json.loads(token_data.sub))
-    token_sub.id = 0
-    refresh_token = create_access_token(token_sub)
+    token_sub = auth.parse_subject(auth.decode_token(refresh_token))
 
-    response = await get_client.post(
-        get_app.url_path_for("auth:token-refresh"),
+    # refresh tokens aren't accepted as bearer tokens of other views
+    response = await get_client.get(
+        get_app.url_path_for("users:me"),
         headers={"Authorization": f"Bearer {refresh_token}"},
     )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    response = await get_client.get(
+        get_app.url_path_for("users:me"),
+        headers={"Authorization": f"Bearer {token['access_token']}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    with mock.patch(
+        "app.api.api_v1.views.auth.rotate_refresh_token", return_value=True
+    ) as rotate:
+        response = await get_client.post(
+            get_app.url_path_for("auth:token-refresh"),
+            headers={"Authorization": f"Bearer {refresh_token}"},
+        )
     assert response.status_code == status.HTTP_200_OK
     token = response.json()
     assert "access_token" in token
     assert "refresh_token" in token
     assert token.get("token_type") == "refresh_token"
+    new_sub = auth.decode_token(token["refresh_token"])
+    assert rotate.call_args.kwargs["user_id"] == token_sub.id
+    assert rotate.call_args.kwargs["jti"] == token_sub.jti
+    assert rotate.call_args.kwargs["new_jti"] == new_sub["jti"] != token_sub.jti
+
+    with mock.patch(
+        "app.api.api_v1.views.auth.rotate_refresh_token", return_value=False
+    ):
+        response = await get_client.post(
+            get_app.url_path_for("auth:token-refresh"),
+            headers={"Authorization": f"Bearer {refresh_token}"},
+        )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Invalid refresh token." in response.content.decode()
+
+    response = await get_client.post(
+        get_app.url_path_for("auth:token-refresh"),
+        headers={"Authorization": f"Bearer {token['access_token']}"},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Invalid refresh token." in response.content.decode()
 
 
 @pytest.mark.asyncio
@@ -226,9 +260,7 @@ async def test_login_refresh_token_with_jwt_error(
     token = response.json()
     assert "refresh_token" in token
     refresh_token = token["refresh_token"]
-    payload = auth.decode_token(refresh_token)
-    token_data = TokenPayload.parse_obj(payload)
-    token_sub = TokenSubject.parse_obj(json.loads(token_data.sub))
+    token_sub = auth.parse_subject(auth.decode_token(refresh_token))
     token_sub.id = 0
     refresh_token = create_access_token(token_sub)[:-2]
     response = await get_client.post(
@@ -323,3 +355,165 @@ async def test_get_user_me_inactive_user(
     )
     assert response.status_code == status.HTTP_400_BAD_REQUEST
     assert "Inactive user." in response.content.decode()
+
+
+@pytest.mark.asyncio
+async def test_login_rejected_when_hashing_busy(
+    get_client: AsyncClient,
+    get_app: FastAPI,
+) -> None:
+    data = {"username": random_lower_string(8), "password": random_lower_string(8)}
+    rejected = password_hash_pool.rejected
+    with mock.patch.object(password_hash_pool, "is_busy", return_value=True):
+        response = await get_client.post(get_app.url_path_for("auth:token"), data=data)
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+    assert password_hash_pool.rejected == rejected + 1
+
+    with mock.patch(
+        "app.crud.user.check_login_password", side_effect=PasswordHashingBusy()
+    ):
+        response = await get_client.post(get_app.url_path_for("auth:token"), data=data)
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_login_rate_limited(
+    get_client: AsyncClient,
+    get_app: FastAPI,
+) -> None:
+    username = random_lower_string(8)
+    data = {"username": username, "password": random_lower_string(8)}
+    with mock.patch(
+        "app.dependencies.admission.username_limit", Limit("username", 1, 2)
+    ), mock.patch("app.crud.user.check_login_password", return_value=None) as check:
+        for _ in range(2):
+            response = await get_client.post(
+                get_app.url_path_for("auth:token"), data=data
+            )
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = await get_client.post(
+            get_app.url_path_for("auth:token"),
+            data={**data, "username": username.upper()},
+        )
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert 0 < int(response.headers["Retry-After"]) <= 60
+        assert check.await_count == 2
+
+        response = await get_client.post(
+            get_app.url_path_for("auth:token"),
+            data={**data, "username": random_lower_string(8)},
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        user_data = {"username": username, "email": random_email(), "password": "x"}
+        response = await get_client.post(
+            get_app.url_path_for("users:register"), json=user_data
+        )
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+@pytest.mark.asyncio
+async def test_login_locked_account(
+    db: AsyncSession,
+    get_client: AsyncClient,
+    get_app: FastAPI,
+) -> None:
+    password = random_lower_string(8)
+    user_data = schemas.UserCreate(
+        username=random_lower_string(8),
+        email=random_email(),
+        password=password,
+    )
+    user_db = await crud.user.create(db, obj_in=user_data)
+    account = login_failures.account(user_data.username, user_db.id)
+    data = {"username": user_data.username, "password": password}
+    with mock.patch.object(
+        login_failures, "locked_for", return_value=4.2
+    ) as locked_for, mock.patch("app.crud.user.check_login_password") as check:
+        response = await get_client.post(get_app.url_path_for("auth:token"), data=data)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["Retry-After"] == "5"
+    check.assert_not_called()
+    # email and username of the account share one counter
+    locked_for.assert_awaited_once_with(account)
+    with mock.patch.object(
+        login_failures, "locked_for", return_value=4.2
+    ) as locked_for:
+        response = await get_client.post(
+            get_app.url_path_for("auth:token"),
+            data={**data, "username": user_data.email},
+        )
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    locked_for.assert_awaited_once_with(account)
+
+    with mock.patch.object(login_failures, "fail") as fail, mock.patch.object(
+        login_failures, "reset"
+    ) as reset:
+        response = await get_client.post(
+            get_app.url_path_for("auth:token"), data={**data, "password": "wrong"}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        fail.assert_awaited_once_with(account)
+        response = await get_client.post(get_app.url_path_for("auth:token"), data=data)
+        assert response.status_code == status.HTTP_200_OK
+        reset.assert_awaited_once_with(account)
+
+
+@pytest.mark.asyncio
+async def test_jwks(get_client: AsyncClient, get_app: FastAPI) -> None:
+    response = await get_client.get(get_app.url_path_for("auth:jwks"))
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"keys": []}
+    assert "max-age" in response.headers["Cache-Control"]
+
+
+@pytest.mark.asyncio
+async def test_logout(
+    db: AsyncSession,
+    get_client: AsyncClient,
+    get_app: FastAPI,
+) -> None:
+    password = random_lower_string(8)
+    user_data = schemas.UserCreate(
+        username=random_lower_string(8),
+        email=random_email(),
+        password=password,
+    )
+    user_db = await crud.user.create(db, obj_in=user_data)
+    response = await get_client.post(
+        get_app.url_path_for("auth:token"),
+        data={"username": user_data.username, "password": password},
+    )
+    access_token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response = await get_client.get(get_app.url_path_for("users:me"), headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    redis = mock.MagicMock()
+    redis.exists = mock.AsyncMock(return_value=1)
+    pipe = mock.MagicMock()
+    pipe.execute = mock.AsyncMock()
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    with mock.patch.object(token_revocations, "redis", redis), mock.patch(
+        "app.api.api_v1.views.auth.revoke_refresh_token"
+    ) as revoke_refresh:
+        response = await get_client.post(
+            get_app.url_path_for("auth:logout"), headers=headers
+        )
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        jti = auth.verify_token(access_token).jti
+        assert revoke_refresh.call_args.kwargs == {"user_id": user_db.id, "jti": jti}
+
+        response = await get_client.get(
+            get_app.url_path_for("users:me"), headers=headers
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert "Token has been revoked." in response.content.decode()
+
+    response = await get_client.post(
+        get_app.url_path_for("auth:logout"),
+        headers={"Authorization": f"Bearer {access_token[:-2]}"},
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -1,4 +1,7 @@
+import csv
+import io
 import json
+from unittest import mock
 
 import pytest
 from fastapi import FastAPI
@@ -8,7 +11,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 from app import schemas, crud, models
-from app.core.security import verify_password
+from app.core.security import password_hash_pool, verify_password
 from app.tests.utils.utils import random_lower_string, random_email
 
 
@@ -58,6 +61,26 @@ async def test_user_register_success(
     assert verify_password(user_data.password, user_db.password)
 
 
+@pytest.mark.asyncio
+async def test_user_register_rejected_when_hashing_busy(
+    db: AsyncSession,
+    get_client: AsyncClient,
+    get_app: FastAPI,
+) -> None:
+    user_data = schemas.UserCreate(
+        username=random_lower_string(8),
+        email=random_email(),
+        password=random_lower_string(8),
+    )
+    with mock.patch.object(password_hash_pool, "is_busy", return_value=True):
+        response = await get_client.post(
+            get_app.url_path_for("users:register"), content=user_data.json()
+        )
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "Retry-After" in response.headers
+    assert not await crud.user.get_by_email(db, email=user_data.email)
+
+
 @pytest.mark.asyncio
 async def test_user_register_username_success(
     db: AsyncSession,
@@ -122,10 +145,28 @@ async def test_user_register_twice(
         get_app.url_path_for("users:register"), content=user_data.json()
     )
     assert response.status_code == status.HTTP_400_BAD_REQUEST
-    assert (
-        f"User with email (username) {user_data.email} "
-        f"({user_data.username}) already exists"
-        in response.content.decode()
+    assert response.json()["detail"] == (
+        f"User with email {user_data.email} already exists"
+    )
+
+    taken_username = user_data.copy(update={"email": random_email()})
+    response = await get_client.post(
+        get_app.url_path_for("users:register"), content=taken_username.json()
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == (
+        f"User with username {user_data.username} already exists"
+    )
+
+    with mock.patch.object(
+        crud.user, "create_unique", mock.AsyncMock(return_value=(None, None))
+    ):
+        response = await get_client.post(
+            get_app.url_path_for("users:register"), content=user_data.json()
+        )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == (
+        "User with this email or username already exists"
     )
 
 
@@ -197,7 +238,10 @@ async def test_read_users_list_success(
     )
     users_list = await crud.user.get_multi(db)
     assert response.status_code == status.HTTP_200_OK
-    assert len(json.loads(response.content.decode())) == len(users_list)
+    assert response.headers["content-type"] == "application/json"
+    assert [schemas.User.parse_obj(user) for user in response.json()] == [
+        schemas.User.from_orm(user) for user in users_list
+    ]
 
 
 @pytest.mark.asyncio
@@ -273,6 +317,13 @@ async def test_update_with_superuser(
     user_updated = json.loads(response.content.decode())
     assert some_user_for_function.email == user_updated.get("email")
 
+    response = await get_client.patch(
+        get_app.url_path_for("users:update", user_id=user_id),
+        headers={"Authorization": f"Bearer {token.get('access_token')}"},
+        json={"username": "xxxxx@x"},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
 
 @pytest.mark.asyncio
 async def test_update_with_another_user(
@@ -396,3 +447,346 @@ async def test_get_user_me_sucess(
     assert response.status_code == status.HTTP_200_OK
     user_me_data = json.loads(response.content.decode())
     assert user_reg_data.get("id") == user_me_data.get("id")
+
+
+@pytest.mark.asyncio
+async def test_user_register_pins_reads_to_primary(
+    get_client: AsyncClient,
+    get_app: FastAPI,
+) -> None:
+    from app.dependencies.db import READ_YOUR_WRITES_COOKIE
+
+    user_data = schemas.UserCreate(
+        username=random_lower_string(8),
+        email=random_email(),
+        password=random_lower_string(8),
+    )
+    response = await get_client.post(
+        get_app.url_path_for("users:register"), content=user_data.json()
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert READ_YOUR_WRITES_COOKIE in response.cookies
+
+
+@pytest.mark.asyncio
+async def test_read_users_list_cursor_pagination(
+    db: AsyncSession,
+    get_client: AsyncClient,
+    get_app: FastAPI,
+    settings_with_test_env: BaseSettings,
+) -> None:
+    from app.api.api_v1.views.users import NEXT_CURSOR_HEADER
+    from app.utils.pagination import encode_cursor
+
+    for i in range(3):
+        await crud.user.create(
+            db,
+            obj_in=schemas.UserCreate(
+                username=random_lower_string(8),
+                email=random_email(),
+                password=random_lower_string(8),
+            ),
+        )
+    response = await get_client.post(
+        get_app.url_path_for("auth:token"),
+        data={
+            "username": settings_with_test_env.FIRST_SUPERUSER,
+            "password": settings_with_test_env.FIRST_SUPERUSER_PASSWORD,
+        },
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+    headers = {"Authorization": f"Bearer {response.json().get('access_token')}"}
+    users_list = await crud.user.get_multi(db, limit=1000)
+
+    seen_ids, cursor = [], None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await get_client.get(
+            get_app.url_path_for("users:read_users"), params=params, headers=headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        seen_ids.extend(user["id"] for user in response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+    assert seen_ids == [user.id for user in users_list]
+
+    for invalid in ("invalid", encode_cursor(2**63), encode_cursor(-1)):
+        response = await get_client.get(
+            get_app.url_path_for("users:read_users"),
+            params={"cursor": invalid},
+            headers=headers,
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "Invalid cursor." in response.content.decode()
+
+
+@pytest.mark.asyncio
+async def test_export_users(
+    db: AsyncSession,
+    get_client: AsyncClient,
+    get_app: FastAPI,
+    settings_with_test_env: BaseSettings,
+) -> None:
+    response = await get_client.post(
+        get_app.url_path_for("auth:token"),
+        data={
+            "username": settings_with_test_env.FIRST_SUPERUSER,
+            "password": settings_with_test_env.FIRST_SUPERUSER_PASSWORD,
+        },
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+    headers = {"Authorization": f"Bearer {response.json().get('access_token')}"}
+    users_list = await crud.user.get_multi(db, limit=10000)
+
+    response = await get_client.get(
+        get_app.url_path_for("users:export"), headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert [user["id"] for user in exported] == [user.id for user in users_list]
+    assert exported[0] == json.loads(schemas.User.from_orm(users_list[0]).json())
+
+    with mock.patch("app.utils.export.CHUNK_SIZE", 1):
+        response = await get_client.get(
+            get_app.url_path_for("users:export"),
+            params={"export_format": "csv"},
+            headers=headers,
+        )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["id"]) for row in rows] == [user.id for user in users_list]
+    assert rows[0]["username"] == users_list[0].username
+
+
+@pytest.mark.asyncio
+async def test_export_users_permission_denied(
+    some_user_for_function: models.User,
+    get_client: AsyncClient,
+    get_app: FastAPI,
+) -> None:
+    from app.core.auth import create_tokens
+
+    token = create_tokens(
+        {
+            "id": some_user_for_function.id,
+            "username": some_user_for_function.username,
+            "email": some_user_for_function.email,
+            "jti": "jti",
+            "token_type": "bearer",
+        }
+    )
+    response = await get_client.get(
+        get_app.url_path_for("users:export"),
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_user_me_sessions(
+    some_user_for_function: models.User,
+    get_client: AsyncClient,
+    get_app: FastAPI,
+) -> None:
+    from app.core.auth import create_tokens
+    from app.utils.digest import jti_digest
+
+    token = create_tokens(
+        {"id": some_user_for_function.id, "jti": "current", "token_type": "bearer"}
+    )
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+    sessions = [(jti_digest("other"), 1700000000.0), (jti_digest("current"), 0)]
+    with mock.patch(
+        "app.api.api_v1.views.users.list_sessions", return_value=sessions
+    ) as list_sessions:
+        response = await get_client.get(
+            get_app.url_path_for("users:me-sessions"), headers=headers
+        )
+    assert response.status_code == status.HTTP_200_OK
+    assert list_sessions.call_args.kwargs == {"user_id": some_user_for_function.id}
+    assert response.json() == [
+        {
+            "id": jti_digest("other").hex(),
+            "expires_at": "2023-11-14T22:13:20+00:00",
+            "current": False,
+        },
+        {
+            "id": jti_digest("current").hex(),
+            "expires_at": "1970-01-01T00:00:00+00:00",
+            "current": True,
+        },
+    ]
+
+    with mock.patch(
+        "app.api.api_v1.views.users.revoke_session", return_value=True
+    ) as revoke_session, mock.patch(
+        "app.api.api_v1.views.users.token_revocations.revoke_digests"
+    ) as revoke_digests:
+        response = await get_client.delete(
+            get_app.url_path_for(
+                "users:me-session-revoke", session_id=jti_digest("other").hex()
+            ),
+            headers=headers,
+        )
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert revoke_session.call_args.kwargs == {
+            "user_id": some_user_for_function.id,
+            "digest": jti_digest("other"),
+        }
+        revoke_digests.assert_awaited_once_with([jti_digest("other")])
+
+        revoke_session.return_value = False
+        response = await get_client.delete(
+            get_app.url_path_for("users:me-session-revoke", session_id="other"),
+            headers=headers,
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        response = await get_client.delete(
+            get_app.url_path_for("users:me-session-revoke", session_id="00"),
+            headers=headers,
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    digests = [jti_digest("current"), jti_digest("other")]
+    with mock.patch(
+        "app.api.api_v1.views.users.revoke_sessions", return_value=digests
+    ) as revoke_sessions, mock.patch(
+        "app.api.api_v1.views.users.token_revocations.revoke_digests"
+    ) as revoke_digests:
+        response = await get_client.delete(
+            get_app.url_path_for("users:me-sessions-revoke"), headers=headers
+        )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert revoke_sessions.call_args.kwargs == {"user_id": some_user_for_function.id}
+    revoke_digests.assert_awaited_once_with(digests)
+
+
+@pytest.mark.asyncio
+async def test_user_sessions_by_superuser(
+    db: AsyncSession,
+    some_user_for_function: models.User,
+    get_client: AsyncClient,
+    get_app: FastAPI,
+    settings_with_test_env: BaseSettings,
+) -> None:
+    from app.core.auth import create_tokens
+
+    superuser = await crud.user.get_by_username(
+        db, username=settings_with_test_env.FIRST_SUPERUSER
+    )
+    user_id = some_user_for_function.id
+    user_token = create_tokens({"id": user_id, "jti": "jti", "token_type": "bearer"})
+    super_token = create_tokens(
+        {"id": superuser.id, "jti": "jti", "token_type": "bearer"}
+    )
+    with mock.patch(
+        "app.api.api_v1.views.users.list_sessions", return_value=[]
+    ), mock.patch(
+        "app.api.api_v1.views.users.revoke_sessions", return_value=[]
+    ) as revoke_sessions:
+        response = await get_client.get(
+            get_app.url_path_for("users:sessions", user_id=user_id),
+            headers={"Authorization": f"Bearer {user_token.access_token}"},
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = await get_client.get(
+            get_app.url_path_for("users:sessions", user_id=user_id),
+            headers={"Authorization": f"Bearer {super_token.access_token}"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == []
+
+        response = await get_client.delete(
+            get_app.url_path_for("users:sessions-revoke", user_id=user_id),
+            headers={"Authorization": f"Bearer {super_token.access_token}"},
+        )
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert revoke_sessions.call_args.kwargs == {"user_id": user_id}
+
+
+@pytest.mark.asyncio
+async def test_get_user_me_not_modified(
+    db: AsyncSession,
+    some_user_for_function: models.User,
+    get_client: AsyncClient,
+    get_app: FastAPI,
+) -> None:
+    from app.core.auth import create_tokens
+
+    token = create_tokens(
+        {"id": some_user_for_function.id, "jti": "jti", "token_type": "bearer"}
+    )
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+    response = await get_client.get(get_app.url_path_for("users:me"), headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    with mock.patch("app.crud.user.get") as get:
+        response = await get_client.get(
+            get_app.url_path_for("users:me"),
+            headers={**headers, "If-None-Match": f'"other", {etag}'},
+        )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    get.assert_not_called()
+
+    await crud.user.update(
+        db,
+        obj_db=some_user_for_function,
+        obj_in=schemas.UserUpdate(confirmed=True),
+    )
+    response = await get_client.get(
+        get_app.url_path_for("users:me"), headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+
+    response = await get_client.get(
+        get_app.url_path_for("users:me"), headers={**headers, "If-None-Match": "*"}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # the user is removed after its snapshot has been read
+    with mock.patch("app.crud.user.get", return_value=None):
+        response = await get_client.get(
+            get_app.url_path_for("users:me"), headers=headers
+        )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_read_users_list_not_modified(
+    db: AsyncSession,
+    get_client: AsyncClient,
+    get_app: FastAPI,
+    settings_with_test_env: BaseSettings,
+) -> None:
+    from app.core.auth import create_tokens
+
+    superuser = await crud.user.get_by_username(
+        db, username=settings_with_test_env.FIRST_SUPERUSER
+    )
+    token = create_tokens({"id": superuser.id, "jti": "jti", "token_type": "bearer"})
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+    url = get_app.url_path_for("users:read_users")
+    response = await get_client.get(url, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+
+    response = await get_client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    user = (await crud.user.get_multi(db))[0]
+    await crud.user.update(db, obj_db=user, obj_in=schemas.UserUpdate(confirmed=True))
+    response = await get_client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
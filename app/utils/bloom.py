@@ -0,0 +1,66 @@
+"""
+Bloom filter utils.
+
+Attrs:
+    BloomFilter: set membership test with false positives only.
+"""
+import hashlib
+import math
+from typing import List
+
+
+class BloomFilter:
+    """
+    Bloom filter of byte strings sized for capacity and false positive rate.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item: bytes) -> List[int]:
+        """
+        Get bit positions of item using double hashing.
+
+        Args:
+            item: byte string
+
+        Returns:
+            bit positions
+        """
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item: bytes) -> None:
+        """
+        Add item to the filter.
+
+        Args:
+            item: byte string
+
+        Returns:
+            None
+        """
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: bytes) -> bool:
+        """
+        Check if item might have been added.
+
+        Args:
+            item: byte string
+
+        Returns:
+            False if item surely hasn't been added, True otherwise
+        """
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(item)
+        )
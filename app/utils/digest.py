@@ -0,0 +1,25 @@
+"""
+Token id digests.
+
+Attrs:
+    jti_digest: short binary digest of token id.
+
+Refresh sessions and access token revocations are keyed by the same digest,
+so revoking all sessions of a user can revoke their access tokens too.
+"""
+import hashlib
+
+DIGEST_SIZE = 12
+
+
+def jti_digest(jti: str) -> bytes:
+    """
+    Get short digest of token id.
+
+    Args:
+        jti: token id
+
+    Returns:
+        binary digest
+    """
+    return hashlib.blake2b(jti.encode(), digest_size=DIGEST_SIZE).digest()
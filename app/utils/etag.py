@@ -0,0 +1,66 @@
+"""
+Conditional request utils.
+
+Attrs:
+    make_etag: build weak entity tag of resource version parts.
+    etag_matches: check If-None-Match header against entity tag.
+    not_modified: build 304 response.
+"""
+import hashlib
+from typing import Any, Optional
+
+from starlette import status
+from starlette.responses import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build weak entity tag of resource version parts, e.g. ids and timestamps.
+
+    Args:
+        parts: values identifying resource version
+
+    Returns:
+        weak entity tag
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check If-None-Match header against entity tag with weak comparison.
+
+    Args:
+        if_none_match: If-None-Match header value
+        etag: current entity tag
+
+    Returns:
+        True if client has the current version
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Build empty 304 response.
+
+    Args:
+        etag: current entity tag
+
+    Returns:
+        not modified response
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -0,0 +1,84 @@
+"""
+Utils for streaming exports of database objects.
+
+Attrs:
+    ExportFormat: supported export formats.
+    export_lines: serialize stream of objects in chunks.
+"""
+import csv
+import io
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, Any, Type
+
+from pydantic import BaseModel
+
+# flush serialized rows to the client in chunks of about this size, bytes
+CHUNK_SIZE = 64 * 1024
+
+
+class ExportFormat(str, Enum):
+    """
+    Supported export formats.
+    """
+
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def csv_row(values: list) -> str:
+    """
+    Serialize values as one CSV row.
+
+    Args:
+        values: row values
+
+    Returns:
+        CSV row string
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    )
+    return buffer.getvalue()
+
+
+async def export_lines(
+    objs: AsyncIterator[Any], schema: Type[BaseModel], export_format: ExportFormat
+) -> AsyncIterator[str]:
+    """
+    Serialize stream of objects with the schema in chunks.
+
+    Only the current chunk is kept in memory, so memory usage doesn't depend
+    on the number of exported objects.
+
+    Args:
+        objs: async iterator of ORM objects
+        schema: pydantic schema to serialize objects with
+        export_format: ndjson or csv
+
+    Returns:
+        async iterator of serialized chunks
+    """
+    chunk, size = [], 0
+    if export_format == ExportFormat.csv:
+        chunk.append(csv_row(list(schema.__fields__)))
+    async for obj in objs:
+        obj_schema = schema.from_orm(obj)
+        if export_format == ExportFormat.csv:
+            line = csv_row(list(obj_schema.dict().values()))
+        else:
+            line = obj_schema.json() + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
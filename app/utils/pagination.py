@@ -0,0 +1,45 @@
+"""
+Pagination utils.
+
+Attrs:
+    encode_cursor: build opaque keyset pagination cursor.
+    decode_cursor: read last seen id from pagination cursor.
+"""
+import base64
+import binascii
+import json
+from typing import Any
+
+
+def encode_cursor(last_id: Any) -> str:
+    """
+    Build opaque keyset pagination cursor.
+
+    Args:
+        last_id: primary key of the last object of the page
+
+    Returns:
+        url-safe cursor string
+    """
+    data = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Any:
+    """
+    Read last seen primary key from pagination cursor.
+
+    Args:
+        cursor: cursor string built by encode_cursor
+
+    Returns:
+        primary key of the last object of the previous page
+
+    Raises:
+        ValueError: if cursor is malformed
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return json.loads(data)["id"]
+    except (binascii.Error, UnicodeDecodeError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor.") from e
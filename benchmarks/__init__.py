@@ -0,0 +1,6 @@
+"""
+Performance benchmarks package.
+
+Benchmarks are plain scripts, run them as modules from the project root,
+e.g. ``python -m benchmarks.bench_db_sessions --help``.
+"""
@@ -0,0 +1,169 @@
+"""
+Latency of CRUDBase create/update: RETURNING vs commit and refresh.
+
+The legacy path adds the object, commits and refreshes it with a second
+SELECT, and update encodes the whole row with jsonable_encoder to learn its
+column names. The current path gets server values with INSERT/UPDATE ...
+RETURNING and uses column names cached per model.
+
+    python -m benchmarks.bench_crud_writes --url postgresql+asyncpg://... -n 500
+
+Tables are created if they don't exist, so a scratch sqlite file works too:
+
+    python -m benchmarks.bench_crud_writes --url sqlite+aiosqlite:///bench.db
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import Awaitable, Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app import models, schemas
+from app.crud.base import CRUDBase
+
+crud_user = CRUDBase(models.User)
+
+
+async def legacy_create(db: AsyncSession, obj_in: schemas.UserCreate) -> models.User:
+    """
+    Create user the legacy way: add, commit and refresh.
+
+    Args:
+        db: SQLAlchemy session
+        obj_in: user create schema
+
+    Returns:
+        User model instance
+    """
+    obj_db = models.User(**jsonable_encoder(obj_in))
+    db.add(obj_db)
+    await db.commit()
+    await db.refresh(obj_db)
+    return obj_db
+
+
+async def legacy_update(db: AsyncSession, obj_db: models.User, obj_in: dict) -> None:
+    """
+    Update user the legacy way: encode row, set attributes, commit and refresh.
+
+    Args:
+        db: SQLAlchemy session
+        obj_db: user model instance
+        obj_in: values to update
+
+    Returns:
+        None
+    """
+    obj_data = jsonable_encoder(obj_db)
+    for field in obj_in:
+        if field in obj_data:
+            setattr(obj_db, field, obj_in[field])
+    db.add(obj_db)
+    await db.commit()
+    await db.refresh(obj_db)
+
+
+def user_in() -> schemas.UserCreate:
+    """
+    Build unique user create schema.
+
+    Returns:
+        user create schema
+    """
+    name = uuid.uuid4().hex[:20]
+    return schemas.UserCreate(
+        username=name, email=f"{name}@example.com", password="password"
+    )
+
+
+async def measure(op: Callable[[], Awaitable[None]], n: int) -> List[float]:
+    """
+    Run operation sequentially and collect latencies.
+
+    Args:
+        op: coroutine function to measure
+        n: number of runs
+
+    Returns:
+        latencies in milliseconds
+    """
+    latencies = []
+    for _ in range(n):
+        started = time.perf_counter()
+        await op()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def report(name: str, latencies: List[float]) -> None:
+    """
+    Print latency summary.
+
+    Args:
+        name: operation name
+        latencies: latencies in milliseconds
+
+    Returns:
+        None
+    """
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    print(
+        f"{name:>16}: mean {statistics.mean(latencies):7.3f} ms,"
+        f" median {statistics.median(latencies):7.3f} ms, p99 {p99:7.3f} ms"
+    )
+
+
+async def main(url: str, n: int) -> None:
+    """
+    Run benchmark and print results.
+
+    Args:
+        url: database connection uri
+        n: number of operations of each kind
+
+    Returns:
+        None
+    """
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        users: List[models.User] = []
+
+        async def create_legacy() -> None:
+            users.append(await legacy_create(db, user_in()))
+
+        async def create_returning() -> None:
+            users.append(await crud_user.create(db, obj_in=user_in()))
+
+        report("create legacy", await measure(create_legacy, n))
+        report("create returning", await measure(create_returning, n))
+
+        legacy_users, returning_users = iter(users[:n]), iter(users[n:])
+
+        async def update_legacy() -> None:
+            await legacy_update(db, next(legacy_users), {"confirmed": True})
+
+        async def update_returning() -> None:
+            await crud_user.update(
+                db, obj_db=next(returning_users), obj_in={"confirmed": True}
+            )
+
+        report("update legacy", await measure(update_legacy, n))
+        report("update returning", await measure(update_returning, n))
+
+        await crud_user.remove_many(db, ids=[user.id for user in users])
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", required=True, help="database connection uri")
+    parser.add_argument("-n", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.n))
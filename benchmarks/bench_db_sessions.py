@@ -0,0 +1,106 @@
+"""
+Throughput of the shared app-wide session vs request-scoped sessions.
+
+Every simulated request runs one query. In ``shared`` mode all requests go
+through a single AsyncSession (serialized by a lock, as one session can't run
+statements concurrently), in ``scoped`` mode each request opens its own session
+from the pool, the same way the ``get_db`` dependency does.
+
+The database is taken from the application settings (env variables), e.g.:
+
+    python -m benchmarks.bench_db_sessions --requests 2000 --sleep-ms 2 \
+        --concurrency 1 8 32 64
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import async_session, engine
+
+
+def get_query(sleep_ms: float) -> str:
+    """
+    Build benchmark query emulating server side latency.
+
+    Args:
+        sleep_ms: query latency in milliseconds (postgresql only)
+
+    Returns:
+        SQL query string
+    """
+    if sleep_ms and engine.dialect.name == "postgresql":
+        return f"SELECT pg_sleep({sleep_ms / 1000})"
+    return "SELECT 1"
+
+
+async def run(
+    request: Callable[[], Awaitable[None]], requests: int, concurrency: int
+) -> float:
+    """
+    Fire requests with limited number of in-flight ones.
+
+    Args:
+        request: coroutine function emulating one request
+        requests: total number of requests
+        concurrency: max number of in-flight requests
+
+    Returns:
+        requests per second
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited() -> None:
+        async with semaphore:
+            await request()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited() for _ in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+async def main(requests: int, concurrency_levels: List[int], sleep_ms: float) -> None:
+    """
+    Run benchmark for every concurrency level and print results.
+
+    Args:
+        requests: total number of requests per run
+        concurrency_levels: numbers of in-flight requests
+        sleep_ms: query latency in milliseconds
+
+    Returns:
+        None
+    """
+    query = text(get_query(sleep_ms))
+    shared: AsyncSession = async_session()
+    lock = asyncio.Lock()
+
+    async def shared_request() -> None:
+        async with lock:
+            await shared.execute(query)
+
+    async def scoped_request() -> None:
+        async with async_session() as session:
+            await session.execute(query)
+            await session.commit()
+
+    print(f"{'in-flight':>10} {'shared rps':>12} {'scoped rps':>12}")
+    for concurrency in concurrency_levels:
+        shared_rps = await run(shared_request, requests, concurrency)
+        scoped_rps = await run(scoped_request, requests, concurrency)
+        print(f"{concurrency:>10} {shared_rps:>12.1f} {scoped_rps:>12.1f}")
+
+    await shared.close()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--sleep-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.sleep_ms))
@@ -0,0 +1,153 @@
+"""
+Latency of ``/users/me`` while the worker is hit by a login storm.
+
+Start the server once with hashing inline and once with the process pool,
+then compare the p99 of ``/users/me`` between the runs:
+
+    PASSWORD_HASH_WORKERS=0 python -m app.main
+    python -m benchmarks.bench_login_storm --username admin --password secret
+
+    python -m app.main
+    python -m benchmarks.bench_login_storm --username admin --password secret
+
+With hashing inline every login blocks the event loop for the whole PBKDF2
+run, so ``/users/me`` latency grows with the number of concurrent logins.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+from app.core.config import settings
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    """
+    Get access token.
+
+    Args:
+        client: http client
+        username: user name
+        password: user password
+
+    Returns:
+        access token
+    """
+    response = await client.post(
+        f"{settings.API_PREFIX}{settings.LOGIN_ACCESS_TOKEN_PATH}",
+        data={"username": username, "password": password},
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def probe(client: httpx.AsyncClient, token: str, seconds: float) -> List[float]:
+    """
+    Request ``/users/me`` one by one and collect latencies.
+
+    Args:
+        client: http client
+        token: access token
+        seconds: how long to probe
+
+    Returns:
+        latencies in milliseconds
+    """
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get(f"{settings.API_PREFIX}/users/me", headers=headers)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def storm(
+    client: httpx.AsyncClient, username: str, password: str, stop: asyncio.Event
+) -> None:
+    """
+    Log in again and again until stopped.
+
+    Args:
+        client: http client
+        username: user name
+        password: user password
+        stop: event to stop on
+
+    Returns:
+        None
+    """
+    while not stop.is_set():
+        await login(client, username, password)
+
+
+def report(name: str, latencies: List[float]) -> None:
+    """
+    Print latency summary.
+
+    Args:
+        name: phase name
+        latencies: latencies in milliseconds
+
+    Returns:
+        None
+    """
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    print(
+        f"{name:>16}: {len(latencies):6} requests,"
+        f" median {statistics.median(latencies):8.2f} ms, p99 {p99:8.2f} ms"
+    )
+
+
+async def main(
+    base_url: str, username: str, password: str, logins: List[int], seconds: float
+) -> None:
+    """
+    Run benchmark and print results.
+
+    Args:
+        base_url: server url
+        username: user name
+        password: user password
+        logins: numbers of concurrent logins
+        seconds: duration of every phase
+
+    Returns:
+        None
+    """
+    limits = httpx.Limits(max_connections=max(logins) + 1)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        token = await login(client, username, password)
+        for concurrency in logins:
+            stop = asyncio.Event()
+            tasks = [
+                asyncio.create_task(storm(client, username, password, stop))
+                for _ in range(concurrency)
+            ]
+            latencies = await probe(client, token, seconds)
+            stop.set()
+            await asyncio.gather(*tasks)
+            report(f"{concurrency} logins", latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--base-url",
+        default=f"http://127.0.0.1:{settings.SERVER_PORT}",
+    )
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, nargs="+", default=[0, 8, 32])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(
+        main(args.base_url, args.username, args.password, args.logins, args.seconds)
+    )
@@ -0,0 +1,139 @@
+"""
+Redis memory of refresh token sessions: legacy vs jti digest store.
+
+``legacy`` stores the whole refresh JWT as a key with user id as value, the
+way login did before, with the JSON subject in ``sub`` that tokens had then.
+``digest`` uses ``app.db.refresh_tokens``: a 12 byte jti digest key plus an
+entry in the per-user sorted set.
+
+The benchmark needs an empty redis database, it refuses to run otherwise and
+flushes the database after every phase:
+
+    python -m benchmarks.bench_refresh_store --url redis://localhost:6379/15 \
+        --sessions 1000000 --users 200000
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import timedelta
+
+import redis.asyncio as async_redis
+from redis.asyncio import Redis
+
+from app.core import auth
+from app.db.refresh_tokens import add_to_pipeline
+
+BATCH_SIZE = 10000
+EXPIRE = timedelta(days=8)
+
+
+def sample_refresh_token() -> str:
+    """
+    Create refresh token of realistic size in the legacy claims layout.
+
+    Returns:
+        JWT refresh token
+    """
+    subject = {
+        "id": 123456,
+        "username": "some_username",
+        "email": "some.user@example.com",
+        "jti": uuid.uuid4().hex,
+        "token_type": auth.REFRESH_TOKEN_TYPE,
+        "scope": [],
+    }
+    expire = int(time.time() + EXPIRE.total_seconds())
+    return auth.encode_token({"exp": expire, "sub": json.dumps(subject)})
+
+
+async def used_memory(redis: Redis) -> int:
+    """
+    Get memory used by redis.
+
+    Args:
+        redis: redis connection
+
+    Returns:
+        bytes
+    """
+    return (await redis.info("memory"))["used_memory"]
+
+
+async def fill_legacy(redis: Redis, sessions: int, users: int) -> None:
+    """
+    Store sessions the legacy way.
+
+    Args:
+        redis: redis connection
+        sessions: number of sessions
+        users: number of users
+
+    Returns:
+        None
+    """
+    token = sample_refresh_token()
+    for start in range(0, sessions, BATCH_SIZE):
+        async with redis.pipeline(transaction=False) as pipe:
+            for i in range(start, min(start + BATCH_SIZE, sessions)):
+                # same length as a real token, unique per session
+                pipe.set(f"{token[:-12]}{i:012d}", i % users, ex=EXPIRE)
+            await pipe.execute()
+
+
+async def fill_digest(redis: Redis, sessions: int, users: int) -> None:
+    """
+    Store sessions with jti digests and per-user indexes.
+
+    Args:
+        redis: redis connection
+        sessions: number of sessions
+        users: number of users
+
+    Returns:
+        None
+    """
+    for start in range(0, sessions, BATCH_SIZE):
+        async with redis.pipeline(transaction=False) as pipe:
+            for i in range(start, min(start + BATCH_SIZE, sessions)):
+                add_to_pipeline(pipe, i % users, uuid.uuid4().hex, EXPIRE)
+            await pipe.execute()
+
+
+async def main(url: str, sessions: int, users: int) -> None:
+    """
+    Run benchmark and print results.
+
+    Args:
+        url: redis url of an empty database
+        sessions: number of sessions
+        users: number of users
+
+    Returns:
+        None
+    """
+    redis = async_redis.from_url(url)
+    if await redis.dbsize():
+        raise SystemExit(f"Database {url} isn't empty.")
+    try:
+        for name, fill in (("legacy", fill_legacy), ("digest", fill_digest)):
+            before = await used_memory(redis)
+            await fill(redis, sessions, users)
+            used = await used_memory(redis) - before
+            print(
+                f"{name:>8}: {used / 2 ** 20:8.1f} MiB,"
+                f" {used / sessions:6.1f} bytes per session"
+            )
+            await redis.flushdb()
+    finally:
+        await redis.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="redis://localhost:6379/15")
+    parser.add_argument("--sessions", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=200000)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.sessions, args.users))
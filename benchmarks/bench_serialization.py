@@ -0,0 +1,140 @@
+"""
+Cost of serializing a page of users into a response body.
+
+``json`` is the FastAPI default: validation with the response model,
+``jsonable_encoder`` and ``JSONResponse``. ``orjson`` is the same path with
+``ORJSONResponse``, the app default response class. ``orjson direct`` is what
+``read_users`` does: validation with the user schema and ``ORJSONResponse``
+dumping datetimes natively, without ``jsonable_encoder``:
+
+    python -m benchmarks.bench_serialization --rows 100 1000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import models, schemas
+
+response_field = create_response_field(name="users", type_=List[schemas.User])
+
+
+def make_users(rows: int) -> List[models.User]:
+    """
+    Build user rows the way they are loaded from the database.
+
+    Args:
+        rows: number of users
+
+    Returns:
+        list of user models
+    """
+    created = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    return [
+        models.User(
+            id=i,
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            password="hash",
+            is_active=True,
+            is_superuser=False,
+            confirmed=True,
+            created=created + timedelta(minutes=i),
+            updated=created + timedelta(minutes=i, seconds=30),
+            last_login=None,
+        )
+        for i in range(rows)
+    ]
+
+
+async def model_response(
+    users: List[models.User], response_class: type = JSONResponse
+) -> bytes:
+    """
+    Serialize users through the response model.
+
+    Args:
+        users: user rows
+        response_class: response class rendering the encoded content
+
+    Returns:
+        response body
+    """
+    content = await serialize_response(field=response_field, response_content=users)
+    return response_class(content).body
+
+
+async def direct_response(users: List[models.User]) -> bytes:
+    """
+    Serialize users the way ``read_users`` does.
+
+    Args:
+        users: user rows
+
+    Returns:
+        response body
+    """
+    return ORJSONResponse([schemas.User.from_orm(user).dict() for user in users]).body
+
+
+async def measure(
+    serialize: Callable[[List[models.User]], Awaitable[bytes]],
+    users: List[models.User],
+    repeat: int,
+) -> float:
+    """
+    Serialize users several times.
+
+    Args:
+        serialize: serialization function
+        users: user rows
+        repeat: number of runs
+
+    Returns:
+        milliseconds per run
+    """
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await serialize(users)
+    return (time.perf_counter() - started) / repeat * 1e3
+
+
+async def main(rows: List[int], repeat: int) -> None:
+    """
+    Run benchmark and print results.
+
+    Args:
+        rows: page sizes
+        repeat: number of runs per page size
+
+    Returns:
+        None
+    """
+    variants = {
+        "json": model_response,
+        "orjson": lambda users: model_response(users, ORJSONResponse),
+        "orjson direct": direct_response,
+    }
+    for size in rows:
+        users = make_users(size)
+        baseline = None
+        for name, serialize in variants.items():
+            ms = await measure(serialize, users, repeat)
+            baseline = baseline or ms
+            print(
+                f"{size:>5} rows {name:>14}: {ms:8.2f} ms/page "
+                f"{baseline / ms:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
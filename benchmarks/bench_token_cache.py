@@ -0,0 +1,86 @@
+"""
+Cost of token verification in the auth dependency with and without cache.
+
+``uncached`` is what ``get_current_user`` did per request: verify HMAC,
+parse claims and subject. ``cached`` is ``verify_token`` served by the
+verified-token LRU. Clients reuse a token for its whole lifetime, so the
+benchmark replays a set of live tokens many times:
+
+    python -m benchmarks.bench_token_cache --tokens 1000 --requests 200000
+"""
+import argparse
+import random
+import time
+import uuid
+from typing import Callable, List
+
+from app import schemas
+from app.core import auth
+
+
+def uncached(token: str) -> schemas.TokenSubject:
+    """
+    Verify token and parse its subject the way it was done before the cache.
+
+    Args:
+        token: JWT token string
+
+    Returns:
+        token subject
+    """
+    return auth.parse_subject(auth.decode_token(token))
+
+
+def measure(verify: Callable[[str], schemas.TokenSubject], tokens: List[str]) -> float:
+    """
+    Verify every token of the list.
+
+    Args:
+        verify: verification function
+        tokens: tokens to verify
+
+    Returns:
+        microseconds per token
+    """
+    started = time.perf_counter()
+    for token in tokens:
+        verify(token)
+    return (time.perf_counter() - started) / len(tokens) * 1e6
+
+
+def main(tokens: int, requests: int) -> None:
+    """
+    Run benchmark and print results.
+
+    Args:
+        tokens: number of distinct live tokens
+        requests: number of verifications
+
+    Returns:
+        None
+    """
+    live_tokens = [
+        auth.create_access_token(
+            schemas.TokenSubject(
+                id=i, jti=uuid.uuid4().hex, token_type=auth.ACCESS_TOKEN_TYPE
+            )
+        )
+        for i in range(tokens)
+    ]
+    replay = random.choices(live_tokens, k=requests)
+
+    auth.token_cache.clear()
+    uncached_us = measure(uncached, replay)
+    cached_us = measure(auth.verify_token, replay)
+    print(f"{'uncached':>10}: {uncached_us:8.2f} us/request")
+    print(f"{'cached':>10}: {cached_us:8.2f} us/request")
+    print(f"{'speedup':>10}: {uncached_us / cached_us:8.1f}x")
+    print(auth.token_cache.as_dict())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.tokens, args.requests)
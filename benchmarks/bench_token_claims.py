@@ -0,0 +1,126 @@
+"""
+Cost of minting and verifying tokens with legacy and compact claims.
+
+``legacy`` is what ``create_tokens`` did before claims version 1: build
+the subject twice with ``parse_obj`` and embed it JSON-encoded into ``sub``.
+``compact`` is the current layout with numeric ``sub`` and top-level
+``jti``, ``scope`` and ``typ``. Verification is measured without the token
+cache, as on the first request with a token:
+
+    python -m benchmarks.bench_token_claims --tokens 20000
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from app import schemas
+from app.core import auth
+from app.core.config import settings
+
+
+def legacy_create_tokens(token_subject: dict) -> schemas.Token:
+    """
+    Create tokens the way it was done before compact claims.
+
+    Args:
+        token_subject: subject dict to be added to tokens
+
+    Returns:
+        pydantic token object with access and refresh token
+    """
+    tokens = []
+    for token_type, minutes in (
+        ("access_token", settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+        ("refresh_token", settings.REFRESH_TOKEN_EXPIRE_MINUTES),
+    ):
+        subject = schemas.TokenSubject.parse_obj(
+            {**token_subject, "token_type": token_type}
+        )
+        sub = json.dumps(
+            {
+                **subject.dict(),
+                "username": token_subject["username"],
+                "email": token_subject["email"],
+            }
+        )
+        expire = datetime.utcnow() + timedelta(minutes=minutes)
+        tokens.append(auth.encode_token({"exp": expire, "sub": sub}))
+    return schemas.Token(
+        access_token=tokens[0],
+        refresh_token=tokens[1],
+        token_type=token_subject.get("token_type"),
+    )
+
+
+def verify(token: str) -> schemas.TokenSubject:
+    """
+    Verify token and parse its subject bypassing the cache.
+
+    Args:
+        token: JWT token string
+
+    Returns:
+        token subject
+    """
+    return auth.parse_subject(auth.decode_token(token))
+
+
+def measure(function: Callable, items: List) -> float:
+    """
+    Call function with every item of the list.
+
+    Args:
+        function: measured function
+        items: function arguments
+
+    Returns:
+        microseconds per call
+    """
+    started = time.perf_counter()
+    for item in items:
+        function(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+def main(tokens: int) -> None:
+    """
+    Run benchmark and print results.
+
+    Args:
+        tokens: number of minted token pairs
+
+    Returns:
+        None
+    """
+    subjects = [
+        {
+            "id": i,
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "jti": uuid.uuid4().hex,
+            "token_type": "bearer",
+        }
+        for i in range(tokens)
+    ]
+    for name, create in (
+        ("legacy", legacy_create_tokens),
+        ("compact", auth.create_tokens),
+    ):
+        mint_us = measure(create, subjects)
+        access_tokens = [create(subject).access_token for subject in subjects]
+        verify_us = measure(verify, access_tokens)
+        size = sum(map(len, access_tokens)) / len(access_tokens)
+        print(
+            f"{name:>8}: mint {mint_us:7.2f} us/pair, "
+            f"verify {verify_us:7.2f} us/token, {size:6.1f} bytes/token"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.tokens)